@@ -1,23 +1,26 @@
 import streamlit as st
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import asyncio
+import queue
+import threading
 
 os.environ['STREAMLIT'] = '1'
 
 from optimizer import (
-    extract_keywords,
-    calculate_similarity,
-    rewrite_cv,
-    gap_analysis,
-    skills_matching_analysis,
-    analyze_achievements,
-    analyze_action_verbs,
-    analyze_experience_level,
-    analyze_format_structure,
-    get_overall_recommendations,
-    initialize_api_key
+    initialize_api_key,
+    warm_up,
+    run_report_async,
+    analyze_cv_incremental_async,
+    report_analysis_key,
+    compare_keyword_coverage
 )
 
+# Minimum seconds between repaints of a section while its tokens stream in
+STREAM_REPAINT_SECONDS = 0.1
+# Per-analysis results kept in each browser session across reruns (oldest dropped first)
+SESSION_CACHE_MAX_ENTRIES = 64
+
 st.set_page_config(
     page_title="ATS Resume Optimizer PRO", 
     layout="wide",
@@ -72,6 +75,21 @@ if not st.session_state.api_initialized:
     
     st.stop()
 
+@st.cache_resource
+def report_loop():
+    # One event loop for the whole server process: its AsyncClient, and the keep-alive
+    # connections in it, outlive each report instead of being reopened on every click
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="ats-reports", daemon=True).start()
+    return loop
+
+@st.cache_resource(show_spinner="⏳ Cargando modelo de embeddings...")
+def warm_up_once():
+    # Once per server process: load the embedding model and connect the reports' AsyncClient
+    return warm_up(loop=report_loop())
+
+warm_up_once()
+
 # Sidebar for configuration
 with st.sidebar:
     st.header("⚙️ Configuración")
@@ -86,9 +104,32 @@ with st.sidebar:
     lang_code = "es" if report_language == "Español" else "en"
     st.markdown("---")
     st.markdown("### 📋 Análisis a realizar")
+    combined_mode = st.checkbox(
+        "⚡ Modo combinado (menos llamadas)",
+        value=False,
+        help="Envía el CV y la oferta una sola vez para varios análisis a la vez; reduce tokens y llamadas a la API"
+    )
+    
+    incremental_mode = st.checkbox(
+        "🧩 Re-análisis por secciones",
+        value=False,
+        help="Divide el CV en secciones (perfil, cada experiencia, educación, habilidades) y analiza logros y verbos sección por sección. "
+             "La primera ejecución hace una llamada por sección para cada uno (más tokens que el análisis normal); "
+             "al editar el CV solo se recalculan las secciones que cambiaron"
+    )
     
     run_keywords = st.checkbox("🔑 Extracción de Keywords", value=True)
+    local_keywords = st.checkbox(
+        "⚡ Keywords locales (sin API)",
+        value=False,
+        help="Extrae las keywords al instante con TF-IDF y un diccionario de sinónimos ES/EN, sin llamar a la API"
+    )
     run_similarity = st.checkbox("📊 Score de Similitud", value=True)
+    chunked_similarity = st.checkbox(
+        "🧩 Similitud por secciones",
+        value=False,
+        help="Compara todas las secciones del CV y la oferta, no solo el inicio (recomendado para documentos largos)"
+    )
     run_skills = st.checkbox("🎯 Análisis de Habilidades", value=True)
     run_gaps = st.checkbox("🧠 Análisis de Brechas", value=True)
     run_achievements = st.checkbox("📈 Análisis de Logros", value=True)
@@ -119,7 +160,20 @@ with col2:
         label_visibility="collapsed"
     )
 
-if st.button("🔎 Iniciar Análisis Completo", type="primary", use_container_width=True):
+if 'analysis_cache' not in st.session_state:
+    # report_analysis_key(...) -> result, so reruns only compute new or changed analyses
+    st.session_state.analysis_cache = {}
+
+start_report = st.button("🔎 Iniciar Análisis Completo", type="primary", use_container_width=True)
+if start_report and cv_text and jd_text:
+    st.session_state.report_inputs = (cv_text, jd_text, lang_code)
+
+# After the first click, reruns (a sidebar toggle, a download) keep the report on screen
+report_inputs = st.session_state.get('report_inputs')
+if not start_report and report_inputs not in (None, (cv_text, jd_text, lang_code)):
+    st.info("✏️ Cambiaste el CV, la oferta o el idioma: pulsa «Iniciar Análisis Completo» para actualizar el reporte. Los análisis sin cambios se reutilizan.")
+
+if start_report or report_inputs == (cv_text, jd_text, lang_code):
     if not cv_text or not jd_text:
         st.error("⚠️ Por favor, pega tanto tu CV como la descripción del trabajo.")
     else:
@@ -129,146 +183,262 @@ if st.button("🔎 Iniciar Análisis Completo", type="primary", use_container_wi
         
         results = {}
         
-        # Tasks that can run in parallel (no dependencies)
-        parallel_tasks = []
-        if run_keywords:
-            parallel_tasks.append(('keywords', lambda: extract_keywords(jd_text, language=lang_code), '🔑 Keywords'))
-        if run_similarity:
-            parallel_tasks.append(('similarity', lambda: calculate_similarity(cv_text, jd_text), '📊 Similitud'))
-        if run_skills:
-            parallel_tasks.append(('skills', lambda: skills_matching_analysis(cv_text, jd_text, language=lang_code), '🎯 Habilidades'))
-        if run_gaps:
-            parallel_tasks.append(('gaps', lambda: gap_analysis(cv_text, jd_text, language=lang_code), '🧠 Brechas'))
-        if run_achievements:
-            parallel_tasks.append(('achievements', lambda: analyze_achievements(cv_text, language=lang_code), '📈 Logros'))
-        if run_verbs:
-            parallel_tasks.append(('verbs', lambda: analyze_action_verbs(cv_text, jd_text, language=lang_code), '💪 Verbos'))
-        if run_experience:
-            parallel_tasks.append(('experience', lambda: analyze_experience_level(cv_text, jd_text, language=lang_code), '👔 Experiencia'))
-        if run_format:
-            parallel_tasks.append(('format', lambda: analyze_format_structure(cv_text, jd_text, language=lang_code), '📐 Formato'))
-        if run_recommendations:
-            parallel_tasks.append(('recommendations', lambda: get_overall_recommendations(cv_text, jd_text, language=lang_code), '💡 Recomendaciones'))
+        # Analyses selected in the sidebar, keyed as in results
+        selected = {
+            'keywords': (run_keywords, '🔑 Keywords'),
+            'similarity': (run_similarity, '📊 Similitud'),
+            'skills': (run_skills, '🎯 Habilidades'),
+            'gaps': (run_gaps, '🧠 Brechas'),
+            'achievements': (run_achievements, '📈 Logros'),
+            'verbs': (run_verbs, '💪 Verbos'),
+            'experience': (run_experience, '👔 Experiencia'),
+            'format': (run_format, '📐 Formato'),
+            'recommendations': (run_recommendations, '💡 Recomendaciones'),
+            'optimized_cv': (run_optimize, '✍️ CV Optimizado'),
+        }
+        analyses = [key for key, (enabled, _) in selected.items() if enabled]
         
-        total_steps = len(parallel_tasks) + (1 if run_optimize else 0)
+        total_steps = len(analyses)
         completed = 0
         
-        try:
-            # Phase 1: run all independent analyses in parallel
-            with ThreadPoolExecutor(max_workers=len(parallel_tasks) or 1) as executor:
-                future_to_key = {executor.submit(fn): (key, label) for key, fn, label in parallel_tasks}
-                for future in as_completed(future_to_key):
-                    key, label = future_to_key[future]
-                    try:
-                        results[key] = future.result()
-                    except Exception as e:
-                        raise RuntimeError(f"Error en {label}: {e}") from e
-                    completed += 1
-                    progress_bar.progress(completed / total_steps)
-                    status_text.text(f"✅ [{completed}/{total_steps}] {label} listo. Esperando resto en paralelo...")
-            
-            # Phase 2: rewrite_cv depends on gap_analysis — run after parallel phase
-            if run_optimize:
-                progress_bar.progress(completed / total_steps)
-                status_text.text(f"✍️ [{completed + 1}/{total_steps}] Optimizando CV para ATS (usa análisis de brechas)...")
-                gap_analysis_text = results.get('gaps', None)
-                results['optimized_cv'] = rewrite_cv(cv_text, jd_text, gap_analysis_text=gap_analysis_text, language=lang_code)
-                completed += 1
-            
-            progress_bar.progress(1.0)
-            status_text.success("✅ ¡Análisis completo! Revisa los resultados a continuación.")
-            
-        except Exception as e:
-            st.error(f"❌ Error durante el análisis: {str(e)}")
-            st.exception(e)
+        # Analyses whose inputs are unchanged since an earlier run are shown from session state
+        similarity_mode = "chunked" if chunked_similarity else "full"
+        keyword_engine = "local" if local_keywords else "llm"
+        report_mode = "combined" if combined_mode else "separate"
+        analysis_cache = st.session_state.analysis_cache
+        analysis_keys = {
+            key: report_analysis_key(key, cv_text, jd_text, lang_code, analyses, similarity_mode=similarity_mode,
+                                     keyword_engine=keyword_engine, mode=report_mode, sections=incremental_mode)
+            for key in analyses
+        }
+        known = {key: analysis_cache[digest] for key, digest in analysis_keys.items() if digest in analysis_cache}
         
-        # Display results
+        # Display results: each section gets a placeholder up front and fills in as tokens arrive
         st.markdown("---")
         st.markdown("# 📊 Resultados del Análisis")
         
+        placeholders = {}
+        
         # Similarity Score - Prominent display
-        if run_similarity and 'similarity' in results:
+        if run_similarity:
             st.markdown("## 📊 Score de Compatibilidad ATS")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Similitud Semántica", f"{results['similarity']}%")
-            with col2:
-                if results['similarity'] >= 80:
-                    st.success("🟢 Excelente Match")
-                elif results['similarity'] >= 60:
-                    st.warning("🟡 Match Moderado")
-                else:
-                    st.error("🔴 Match Bajo - Necesita Mejoras")
-            with col3:
-                st.info(f"💡 Objetivo: >75% para mejor visibilidad")
+            placeholders['similarity'] = st.empty()
         
         # Keywords
-        if run_keywords and 'keywords' in results:
+        if run_keywords:
             st.markdown("## 🔑 Keywords Extraídas de la Descripción del Trabajo")
             with st.expander("Ver keywords completas", expanded=True):
-                st.markdown(results['keywords'])
+                placeholders['keywords'] = st.empty()
         
         # Skills Matching
-        if run_skills and 'skills' in results:
+        if run_skills:
             st.markdown("## 🎯 Análisis de Matching de Habilidades")
             with st.expander("Ver análisis completo de habilidades", expanded=True):
-                st.markdown(results['skills'])
+                placeholders['skills'] = st.empty()
         
         # Gap Analysis
-        if run_gaps and 'gaps' in results:
+        if run_gaps:
             st.markdown("## 🧠 Análisis de Brechas (Gap Analysis)")
             with st.expander("Ver análisis de brechas", expanded=True):
-                st.markdown(results['gaps'])
+                placeholders['gaps'] = st.empty()
         
         # Achievements Analysis
-        if run_achievements and 'achievements' in results:
+        if run_achievements:
             st.markdown("## 📈 Análisis de Logros Cuantificables")
             with st.expander("Ver análisis de logros", expanded=False):
-                st.markdown(results['achievements'])
+                placeholders['achievements'] = st.empty()
         
         # Action Verbs Analysis
-        if run_verbs and 'verbs' in results:
+        if run_verbs:
             st.markdown("## 💪 Análisis de Verbos de Acción")
             with st.expander("Ver análisis de verbos", expanded=False):
-                st.markdown(results['verbs'])
+                placeholders['verbs'] = st.empty()
         
         # Experience Level Analysis
-        if run_experience and 'experience' in results:
+        if run_experience:
             st.markdown("## 👔 Análisis de Nivel de Experiencia")
             with st.expander("Ver análisis de experiencia", expanded=False):
-                st.markdown(results['experience'])
+                placeholders['experience'] = st.empty()
         
         # Format Analysis
-        if run_format and 'format' in results:
+        if run_format:
             st.markdown("## 📐 Análisis de Formato y Estructura")
             with st.expander("Ver análisis de formato", expanded=False):
-                st.markdown(results['format'])
+                placeholders['format'] = st.empty()
         
         # Overall Recommendations
-        if run_recommendations and 'recommendations' in results:
+        if run_recommendations:
             st.markdown("## 💡 Recomendaciones Generales Prioritizadas")
             with st.expander("Ver todas las recomendaciones", expanded=True):
-                st.markdown(results['recommendations'])
+                placeholders['recommendations'] = st.empty()
         
         # Optimized CV
-        if run_optimize and 'optimized_cv' in results:
+        if run_optimize:
             st.markdown("## ✍️ CV Optimizado para ATS")
             st.markdown("### Tu hoja de vida optimizada con mejoras para pasar filtros ATS")
-            
-            optimized_display = st.text_area(
-                "CV Optimizado",
-                results['optimized_cv'],
-                height=500,
-                label_visibility="collapsed"
+            placeholders['optimized_cv'] = st.empty()
+        
+        def render_similarity(score):
+            with placeholders['similarity'].container():
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Similitud Semántica", f"{score}%")
+                with col2:
+                    if score >= 80:
+                        st.success("🟢 Excelente Match")
+                    elif score >= 60:
+                        st.warning("🟡 Match Moderado")
+                    else:
+                        st.error("🔴 Match Bajo - Necesita Mejoras")
+                with col3:
+                    st.info(f"💡 Objetivo: >75% para mejor visibilidad")
+        
+        def render_optimized_cv(text):
+            with placeholders['optimized_cv'].container():
+                optimized_display = st.text_area(
+                    "CV Optimizado",
+                    text,
+                    height=500,
+                    label_visibility="collapsed"
+                )
+                
+                # Local before/after check: does the rewrite actually contain the posting's keywords?
+                coverage = compare_keyword_coverage(cv_text, text, jd_text)
+                cov1, cov2 = st.columns(2)
+                with cov1:
+                    st.metric("Cobertura de keywords (original)", f"{coverage['before']['score']}%")
+                with cov2:
+                    st.metric(
+                        "Cobertura de keywords (optimizado)",
+                        f"{coverage['after']['score']}%",
+                        delta=f"{coverage['after']['score'] - coverage['before']['score']:+.1f}%"
+                    )
+                if coverage['after']['missing']:
+                    st.caption("🔎 Aún faltan: " + ", ".join(k['keyword'] for k in coverage['after']['missing'][:15]))
+                
+                st.download_button(
+                    label="⬇️ Descargar CV Optimizado",
+                    data=text,
+                    file_name="cv_optimizado_ats.txt",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+        
+        streamed = {}
+        last_paint = {}
+        
+        def paint_delta(key, delta):
+            # Repaint at most every STREAM_REPAINT_SECONDS per section to keep websocket traffic low
+            streamed[key] = streamed.get(key, '') + delta
+            now = time.monotonic()
+            if now - last_paint.get(key, 0.0) >= STREAM_REPAINT_SECONDS:
+                last_paint[key] = now
+                placeholders[key].markdown(streamed[key] + " ▌")
+        
+        def show_result(key, value):
+            global completed
+            results[key] = value
+            if key not in known:
+                analysis_cache[analysis_keys[key]] = value
+                while len(analysis_cache) > SESSION_CACHE_MAX_ENTRIES:
+                    analysis_cache.pop(next(iter(analysis_cache)))
+            if key == 'similarity':
+                render_similarity(value)
+            elif key == 'optimized_cv':
+                render_optimized_cv(value)
+            else:
+                placeholders[key].markdown(value)
+            completed += 1
+            progress_bar.progress(completed / total_steps)
+            origin = "reutilizado" if key in known else "listo"
+            status_text.text(f"✅ [{completed}/{total_steps}] {selected[key][1]} {origin}. Esperando resto en paralelo...")
+        
+        timings = {}
+        
+        # The report runs on report_loop()'s thread, but Streamlit elements may only be touched
+        # from this script thread: the callbacks are handed over through `events`
+        events = queue.Queue()
+        previous_state = st.session_state.get('incremental_state')
+        
+        async def run_all():
+            # All analyses share one event loop instead of one OS thread each
+            options = dict(
+                language=lang_code,
+                on_result=lambda key, value: events.put((show_result, key, value)),
+                on_delta=lambda key, delta: events.put((paint_delta, key, delta)),
+                similarity_mode=similarity_mode,
+                timings=timings,
+                mode=report_mode,
+                keyword_engine=keyword_engine,
+                known=known
             )
+            if not incremental_mode:
+                return await run_report_async(cv_text, jd_text, analyses, **options)
+            # Sections unchanged since the last run keep their sub-analyses and embeddings
+            return await analyze_cv_incremental_async(cv_text, jd_text, analyses, previous=previous_state, **options)
+        
+        try:
+            future = asyncio.run_coroutine_threadsafe(run_all(), report_loop())
+            try:
+                while not future.done() or not events.empty():
+                    try:
+                        callback, key, value = events.get(timeout=0.05)
+                    except queue.Empty:
+                        continue
+                    callback(key, value)
+                outcome = future.result()
+            finally:
+                # A rerun or stop interrupts this script: do not leave the report running
+                future.cancel()
+            if incremental_mode:
+                st.session_state.incremental_state = outcome
             
-            st.download_button(
-                label="⬇️ Descargar CV Optimizado",
-                data=results['optimized_cv'],
-                file_name="cv_optimizado_ats.txt",
-                mime="text/plain",
-                use_container_width=True
-            )
+            progress_bar.progress(1.0)
+            status_text.success("✅ ¡Análisis completo! Revisa los resultados a continuación.")
+            state = st.session_state.get('incremental_state') if incremental_mode else None
+            if state is not None and state['stats']['section_calls'] + state['stats']['section_calls_reused']:
+                diff = state['diff']
+                st.caption(
+                    f"🧩 Secciones: {len(diff['changed']) + len(diff['added'])} nuevas o editadas, "
+                    f"{len(diff['unchanged'])} sin cambios · Sub-análisis por sección: "
+                    f"{state['stats']['section_calls']} calculados, {state['stats']['section_calls_reused']} reutilizados"
+                )
+            if known:
+                st.caption(
+                    f"♻️ {len(known)} de {total_steps} análisis reutilizados de la ejecución anterior; "
+                    f"solo se calcularon los nuevos o con entradas distintas."
+                )
+            if timings.get('critical_path'):
+                path_labels = " → ".join(selected.get(key, (None, key))[1] for key in timings['critical_path'])
+                st.caption(
+                    f"⏱️ Tiempo total: {timings['wall_seconds']:.1f} s · Ruta crítica: {path_labels} "
+                    f"({timings['critical_path_seconds']:.1f} s) · Con dos fases habría sido ~{timings['two_phase_estimate_seconds']:.1f} s"
+                )
+            if timings.get('analyses'):
+                with st.expander("⏱️ Desglose de tiempos y costo"):
+                    rows = []
+                    for key, m in timings['analyses'].items():
+                        task = timings.get('tasks', {}).get(key, {})
+                        rows.append({
+                            "Análisis": selected.get(key, (None, key))[1],
+                            "Inicio (s)": round(task.get('start', 0.0), 2),
+                            "Duración (s)": round(m['seconds'], 2),
+                            "Espera en cola (s)": round(m['queue_wait_seconds'], 2),
+                            "Tokens entrada": m['prompt_tokens'],
+                            "Tokens en caché": m['cached_tokens'],
+                            "Tokens salida": m['completion_tokens'],
+                            "Reintentos": m['retries'],
+                            "Llamadas compartidas": m['coalesced_llm_requests'],
+                            "Embeddings (s)": round(m['encode_seconds'], 3),
+                            "Costo (USD)": round(m['cost_usd'], 5),
+                        })
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+                    total_cost = sum(m['cost_usd'] for m in timings['analyses'].values())
+                    st.caption(f"💵 Costo estimado del reporte: ${total_cost:.4f} USD")
+
+        except Exception as e:
+            st.error(f"❌ Error durante el análisis: {str(e)}")
+            st.exception(e)
         
         # Build and offer full report download
         if lang_code == "es":
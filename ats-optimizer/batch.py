@@ -0,0 +1,315 @@
+"""Headless batch runner: analyses every CV x job description pair and writes one JSONL record per pair.
+
+    python batch.py --cvs cvs/ --jds ofertas/ --output resultados.jsonl
+    python batch.py --manifest pares.csv --output resultados.jsonl --analyses similarity,gaps --concurrency 8
+    python batch.py --cvs cv.md --jds ofertas/ --output resultados.jsonl --multi
+
+--cvs / --jds take files or folders of .txt/.md documents and pair every CV with every JD.
+A manifest (.jsonl or .csv) lists the pairs instead, one per line/row with the fields
+cv / jd (file paths) or cv_text / jd_text (inline text) and an optional id.
+Pair ids default to "<cv file>::<jd file>" (names with their extension); a run whose ids
+repeat is rejected before anything is analysed.
+
+Records are appended as soon as each pair finishes. Re-running with the same --output
+resumes: pairs already recorded with status "ok" are skipped and failed ones are retried.
+With --multi, each CV is analysed once against all of its postings: the analyses that only
+read the CV run once, the similarity scores come from one batched encode, the records gain
+the posting's "rank" for that CV, and they are written when the CV's last posting finishes.
+The API password is read from --password, the ATS_PASSWORD variable or an interactive prompt.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+import optimizer
+
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+
+
+# ---------------- INPUTS ----------------
+
+def _read_text(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _document_paths(location):
+    """(path, name) for the file itself, or for the documents inside a folder (sorted, non-recursive).
+
+    The name, used in pair ids, is the path relative to the folder given, extension included.
+    """
+    if os.path.isdir(location):
+        return [
+            (os.path.join(location, name), name) for name in sorted(os.listdir(location))
+            if name.lower().endswith(DOCUMENT_EXTENSIONS)
+        ]
+    return [(location, os.path.basename(location))]
+
+
+def pairs_from_folders(cv_locations, jd_locations):
+    """Yields (pair_id, cv_source, jd_source) for every CV x JD combination."""
+    cv_paths = [document for location in cv_locations for document in _document_paths(location)]
+    jd_paths = [document for location in jd_locations for document in _document_paths(location)]
+    for cv_path, cv_name in cv_paths:
+        for jd_path, jd_name in jd_paths:
+            yield f"{cv_name}::{jd_name}", cv_path, jd_path
+
+
+def _manifest_rows(path):
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def pairs_from_manifest(path):
+    """Yields (pair_id, cv_source, jd_source); sources are file paths or {"text": ...} for inline text."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for number, row in enumerate(_manifest_rows(path), start=1):
+        sources = []
+        for field in ("cv", "jd"):
+            if row.get(f"{field}_text"):
+                sources.append({"text": row[f"{field}_text"]})
+            elif row.get(field):
+                sources.append(os.path.join(base_dir, row[field]))
+            else:
+                raise ValueError(f"Fila {number} del manifiesto sin '{field}' ni '{field}_text'")
+        cv_source, jd_source = sources
+        pair_id = row.get("id") or "::".join(
+            row[field] if isinstance(source, str) else f"fila{number}" for field, source in zip(("cv", "jd"), sources)
+        )
+        yield str(pair_id), cv_source, jd_source
+
+
+def check_unique_ids(pairs):
+    """Raises ValueError if two pairs share an id: their records (and resuming) would mix them up."""
+    seen, duplicates = set(), []
+    for pair_id, _, _ in pairs:
+        if pair_id in seen and pair_id not in duplicates:
+            duplicates.append(pair_id)
+        seen.add(pair_id)
+    if duplicates:
+        shown = ", ".join(duplicates[:5]) + (" ..." if len(duplicates) > 5 else "")
+        raise ValueError(
+            f"Ids de par repetidos: {shown}. Usa nombres de archivo distintos o un manifiesto con 'id' explícito"
+        )
+
+
+def _load(source):
+    return source["text"] if isinstance(source, dict) else _read_text(source)
+
+
+def _describe(source):
+    return "<texto>" if isinstance(source, dict) else source
+
+
+# ---------------- OUTPUT ----------------
+
+def completed_pair_ids(output_path):
+    """Ids already recorded with status "ok", after dropping a torn last line left by a crash."""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            # The run was interrupted mid-write: keep only the complete records
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("status") == "ok":
+            done.add(record.get("id"))
+    return done
+
+
+def _write_record(out, record, number, total, log):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+    detail = f"{record['seconds']}s" if record["status"] == "ok" else record["error"]
+    print(f"[{number}/{total}] {record['id']}: {record['status']} ({detail})", file=log, flush=True)
+
+
+# ---------------- RUNNER ----------------
+
+async def run_batch(pairs, output_path, analyses, language, concurrency, mode="separate",
+                    similarity_mode=None, keyword_engine=None, log=sys.stderr):
+    """Runs the pairs with at most `concurrency` reports in flight; returns (ok, failed) counts."""
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0}
+
+    async def run_pair(pair_id, cv_source, jd_source):
+        async with semaphore:
+            started = time.perf_counter()
+            record = {
+                "id": pair_id, "cv": _describe(cv_source), "jd": _describe(jd_source),
+                "language": language, "analyses": list(analyses),
+            }
+            try:
+                results = await optimizer.run_report_async(
+                    _load(cv_source), _load(jd_source), analyses, language,
+                    similarity_mode=similarity_mode, mode=mode, keyword_engine=keyword_engine
+                )
+                record.update(status="ok", results=results)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+            record["seconds"] = round(time.perf_counter() - started, 3)
+            return record
+
+    tasks = [asyncio.ensure_future(run_pair(*pair)) for pair in pairs]
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            for number, finished in enumerate(asyncio.as_completed(tasks), start=1):
+                record = await finished
+                _write_record(out, record, number, len(tasks), log)
+                counts[record["status"]] += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await optimizer.close_async_http_client()
+    return counts["ok"], counts["error"]
+
+
+async def run_batch_multi(pairs, output_path, analyses, language, concurrency, mode="separate",
+                          similarity_mode=None, keyword_engine=None, log=sys.stderr):
+    """Runs each CV once against all of its postings (see optimizer.run_multi_report_async).
+
+    Up to `concurrency` CVs run at a time, each with up to `concurrency` of its postings
+    analysed at once; returns (ok, failed) counts.
+    """
+    groups = {}  # CV -> (cv_source, [(pair_id, jd_source)])
+    for pair_id, cv_source, jd_source in pairs:
+        group = json.dumps(cv_source, sort_keys=True) if isinstance(cv_source, dict) else cv_source
+        groups.setdefault(group, (cv_source, []))[1].append((pair_id, jd_source))
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0}
+
+    async def run_group(cv_source, jobs):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await optimizer.run_multi_report_async(
+                    _load(cv_source), {pair_id: _load(jd_source) for pair_id, jd_source in jobs}, analyses,
+                    language, concurrency=concurrency, similarity_mode=similarity_mode, mode=mode,
+                    keyword_engine=keyword_engine
+                )
+            except Exception as e:
+                result = {"reports": {}, "errors": {pair_id: str(e) for pair_id, _ in jobs}, "ranking": []}
+            seconds = round(time.perf_counter() - started, 3)
+        ranks = {row["job_id"]: row["rank"] for row in result["ranking"]}
+        # A failed shared similarity pass is not fatal: each posting's report computed its own
+        shared_errors = [
+            message for key, message in result["errors"].items()
+            if key.startswith("shared:") and key != "shared:similarity"
+        ]
+        records = []
+        for pair_id, jd_source in jobs:
+            record = {
+                "id": pair_id, "cv": _describe(cv_source), "jd": _describe(jd_source),
+                "language": language, "analyses": list(analyses),
+            }
+            error = result["errors"].get(pair_id) or "; ".join(shared_errors)
+            if error:
+                record.update(status="error", error=error)
+            else:
+                record.update(status="ok", results=result["reports"][pair_id], rank=ranks[pair_id])
+            record["seconds"] = seconds
+            records.append(record)
+        return records
+
+    tasks = [asyncio.ensure_future(run_group(cv_source, jobs)) for cv_source, jobs in groups.values()]
+    number = 0
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            for finished in asyncio.as_completed(tasks):
+                for record in await finished:
+                    number += 1
+                    _write_record(out, record, number, len(pairs), log)
+                    counts[record["status"]] += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        await optimizer.close_async_http_client()
+    return counts["ok"], counts["error"]
+
+
+def _parse_analyses(value):
+    analyses = tuple(key.strip() for key in value.split(",") if key.strip())
+    unknown = [key for key in analyses if key not in optimizer.REPORT_ANALYSES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"análisis desconocidos: {', '.join(unknown)} (opciones: {', '.join(optimizer.REPORT_ANALYSES)})"
+        )
+    return analyses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    inputs = parser.add_argument_group("entradas")
+    inputs.add_argument("--cvs", nargs="+", default=[], help="archivos o carpetas de CVs (.txt/.md)")
+    inputs.add_argument("--jds", nargs="+", default=[], help="archivos o carpetas de ofertas (.txt/.md)")
+    inputs.add_argument("--manifest", help="lista de pares en .jsonl o .csv (cv/jd o cv_text/jd_text, id opcional)")
+    parser.add_argument("--output", required=True, help="archivo JSONL de resultados (se reanuda si existe)")
+    parser.add_argument("--analyses", type=_parse_analyses, default=optimizer.REPORT_ANALYSES,
+                        help=f"lista separada por comas (por defecto: {','.join(optimizer.REPORT_ANALYSES)})")
+    parser.add_argument("--language", choices=("es", "en"), default="es")
+    parser.add_argument("--concurrency", type=int, default=4, help="pares analizados a la vez")
+    parser.add_argument("--multi", action="store_true",
+                        help="analiza cada CV una sola vez contra todas sus ofertas y las ordena (ranking)")
+    parser.add_argument("--mode", choices=("separate", "combined"), default="separate")
+    parser.add_argument("--similarity-mode", choices=("full", "chunked"), default=None)
+    parser.add_argument("--keyword-engine", choices=optimizer.KEYWORD_ENGINES, default=None,
+                        help="local: keywords con TF-IDF y sinónimos, sin llamar a la API")
+    parser.add_argument("--password", default=os.getenv("ATS_PASSWORD"))
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        pairs = list(pairs_from_manifest(args.manifest))
+    elif args.cvs and args.jds:
+        pairs = list(pairs_from_folders(args.cvs, args.jds))
+    else:
+        parser.error("indica --manifest, o bien --cvs y --jds")
+    try:
+        check_unique_ids(pairs)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    done = completed_pair_ids(args.output)
+    pending = [pair for pair in pairs if pair[0] not in done]
+    print(f"{len(pairs)} pares, {len(pairs) - len(pending)} ya completados, {len(pending)} pendientes",
+          file=sys.stderr)
+    if not pending:
+        return 0
+
+    keyword_engine = args.keyword_engine or optimizer.KEYWORD_ENGINE
+    local = {"similarity"} | ({"keywords"} if keyword_engine == "local" else set())
+    if any(key not in local for key in args.analyses):
+        # Ask once up front rather than from inside the first concurrent API call
+        try:
+            optimizer.initialize_api_key(args.password)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 2
+
+    runner = run_batch_multi if args.multi else run_batch
+    _, failed = asyncio.run(runner(
+        pending, args.output, args.analyses, args.language, args.concurrency,
+        mode=args.mode, similarity_mode=args.similarity_mode, keyword_engine=args.keyword_engine
+    ))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Concurrent similarity throughput and client memory: in-process model vs the shared embedding server.
+
+Each mode runs in its own interpreter. "local" loads the model and has --threads threads
+encode CV/JD pairs with it; "server" starts embedding_server.py and has the same threads
+send the pairs over its Unix socket, where they are micro-batched. Reports pairs/second,
+p95 pair latency, the client's peak RSS and the server's batch statistics.
+
+    python benchmarks/bench_embedding_server.py --threads 16 --pairs 512 --max-wait-ms 5
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PACKAGE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_embeddings import build_corpus  # noqa: E402
+
+
+def run_pairs(backend, texts, threads):
+    """Encodes texts two at a time (one similarity call each) from `threads` threads."""
+    pairs = [texts[i:i + 2] for i in range(0, len(texts) - 1, 2)]
+    latencies = []
+    lock = threading.Lock()
+    next_pair = iter(pairs)
+
+    def worker():
+        while True:
+            with lock:
+                pair = next(next_pair, None)
+            if pair is None:
+                return
+            started = time.perf_counter()
+            backend.encode(pair, batch_size=2)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "pairs": len(pairs),
+        "wall_seconds": round(wall, 3),
+        "pairs_per_second": round(len(pairs) / wall, 1),
+        "p95_pair_ms": round(latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))] * 1000, 1),
+    }
+
+
+def run_child(mode, args):
+    texts = build_corpus(2 * args.pairs, seed=args.seed)
+    if mode == "local":
+        from embeddings import create_embedding_backend
+        backend = create_embedding_backend(args.backend, args.model)
+    else:
+        from embedding_server import RemoteEmbeddingBackend
+        backend = RemoteEmbeddingBackend(args.socket)
+    backend.encode(["warm up"])
+    result = run_pairs(backend, texts, args.threads)
+    # ru_maxrss is KiB on Linux
+    result["client_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if mode == "server":
+        result["server"] = backend.stats()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--pairs", type=int, default=512)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--encode-batch-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--socket", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args)
+        return 0
+
+    common = ["--model", args.model, "--backend", args.backend, "--threads", str(args.threads),
+              "--pairs", str(args.pairs), "--seed", str(args.seed)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "embeddings.sock")
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(PACKAGE_DIR, "embedding_server.py"), "--socket", socket_path,
+             "--model", args.model, "--backend", args.backend, "--max-batch-size", str(args.max_batch_size),
+             "--max-wait-ms", str(args.max_wait_ms), "--encode-batch-size", str(args.encode_batch_size)],
+            cwd=PACKAGE_DIR, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            if not server.stdout.readline():
+                raise RuntimeError("No se pudo iniciar el servidor de embeddings")
+            for mode in ("local", "server"):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", mode, "--socket", socket_path] + common,
+                    cwd=PACKAGE_DIR, stdout=subprocess.PIPE, text=True, check=True
+                ).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+        finally:
+            server.terminate()
+            server.wait()
+
+    results["speedup"] = round(results["server"]["pairs_per_second"] / results["local"]["pairs_per_second"], 2)
+    results["client_rss_saved_mb"] = round(
+        results["local"]["client_peak_rss_mb"] - results["server"]["client_peak_rss_mb"], 1
+    )
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
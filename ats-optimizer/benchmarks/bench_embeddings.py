@@ -0,0 +1,137 @@
+"""Throughput, RSS and score-parity benchmark for the embedding backends.
+
+Each backend runs in its own interpreter so resident memory is measured in isolation.
+Scores from every backend are compared with the torch reference; the run fails (exit
+code 1) when the largest CV x JD score difference exceeds that backend's drift bound.
+
+    python benchmarks/bench_embeddings.py --backends torch,onnx,onnx-int8 --texts 256
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from embeddings import MAX_SCORE_DRIFT  # noqa: E402
+
+ROLES = ["HR Business Partner", "Analista de Nómina", "Recruiter", "Office Manager",
+         "Operations Coordinator", "Especialista en Reclutamiento", "Payroll Specialist"]
+SKILLS = ["HRIS", "SAP SuccessFactors", "Workday", "Excel avanzado", "employee relations",
+          "talent acquisition", "onboarding", "compensación y beneficios", "labor law compliance",
+          "Power BI", "negociación", "gestión del desempeño", "conflict resolution", "ATS platforms"]
+VERBS = ["Led", "Managed", "Implementé", "Coordiné", "Reduced", "Improved", "Diseñé", "Negotiated"]
+
+
+def build_corpus(n_texts, seed=7):
+    """Deterministic synthetic CV / JD snippets of mixed length and language."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n_texts):
+        sentences = []
+        for _ in range(rng.randint(3, 25)):
+            sentences.append(
+                f"{rng.choice(VERBS)} {rng.choice(SKILLS)} for the {rng.choice(ROLES)} team, "
+                f"improving {rng.choice(SKILLS)} by {rng.randint(5, 60)}%."
+            )
+        kind = "Job description" if i % 2 else "Curriculum"
+        texts.append(f"{kind}: {rng.choice(ROLES)}. " + " ".join(sentences))
+    return texts
+
+
+def run_child(backend_name, model_name, n_texts, batch_size, out_path):
+    from embeddings import create_embedding_backend, normalize
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    backend = create_embedding_backend(backend_name, model_name)
+    backend.encode(["warm up"], batch_size=1)
+    load_seconds = time.perf_counter() - started
+
+    texts = build_corpus(n_texts)
+    started = time.perf_counter()
+    vectors = normalize(backend.encode(texts, batch_size=batch_size))
+    encode_seconds = time.perf_counter() - started
+    np.save(out_path, vectors)
+
+    print(json.dumps({
+        "backend": backend_name,
+        "load_seconds": round(load_seconds, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "texts_per_second": round(n_texts / encode_seconds, 1),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_before_load_mb": round(rss_before / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-drift", default="",
+                        help="overrides as backend=points, e.g. onnx-int8=2.5")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.model, args.texts, args.batch_size, args.child_out)
+        return 0
+
+    max_drift = dict(MAX_SCORE_DRIFT)
+    for item in filter(None, args.max_drift.split(",")):
+        name, value = item.split("=")
+        max_drift[name] = float(value)
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # Reference for the parity check
+
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in backends:
+            out_path = os.path.join(tmp, f"{name}.npy")
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", name, "--child-out", out_path,
+                 "--model", args.model, "--texts", str(args.texts), "--batch-size", str(args.batch_size)],
+                cwd=PACKAGE_DIR, stdout=subprocess.PIPE, text=True, check=True
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+            vectors[name] = np.load(out_path)
+
+    # CVs are the even texts, JDs the odd ones: compare the full CV x JD score matrix
+    reference = vectors["torch"][0::2] @ vectors["torch"][1::2].T * 100
+    failures = []
+    for name in backends:
+        scores = vectors[name][0::2] @ vectors[name][1::2].T * 100
+        drift = float(np.abs(scores - reference).max())
+        results[name]["max_score_drift"] = round(drift, 4)
+        results[name]["mean_score_drift"] = round(float(np.abs(scores - reference).mean()), 4)
+        bound = max_drift.get(name)
+        if bound is not None and drift > bound:
+            failures.append(f"{name}: score drift {drift:.3f} > {bound:.3f} points")
+
+    report = {"model": args.model, "texts": args.texts, "batch_size": args.batch_size, "backends": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"PARITY FAILURE: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Tail-latency benchmark for hedged LLM requests against the local mock API.
+
+The mock answers most calls in --latency-ms but a --slow-prob share takes --slow-ms, the
+kind of straggler that decides how long a nine-call report takes. The same workload runs
+with hedging off and on; the run fails (exit code 1) unless hedging cuts p99 latency by at
+least --min-p99-improvement.
+
+    python benchmarks/bench_hedging.py --calls 400 --concurrency 16 --slow-prob 0.03
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import optimizer  # noqa: E402
+from mock_server import MockOptions, start_mock_server  # noqa: E402
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def timed_call(tag, i):
+    started = time.perf_counter()
+    optimizer.call_llm("Mock system prompt", f"{tag} call {i}")
+    return time.perf_counter() - started
+
+
+async def timed_call_async(tag, i, semaphore):
+    async with semaphore:
+        started = time.perf_counter()
+        await optimizer.call_llm_async("Mock system prompt", f"{tag} call {i}")
+        return time.perf_counter() - started
+
+
+def run_workload(tag, calls, concurrency, client):
+    if client == "sync":
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda i: timed_call(tag, i), range(calls)))
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(*(timed_call_async(tag, i, semaphore) for i in range(calls)))
+        finally:
+            await optimizer.close_async_http_client()
+
+    return asyncio.run(main())
+
+
+def summarize(latencies, requests_sent, stats_before, stats_after):
+    return {
+        "calls": len(latencies),
+        "requests_sent": requests_sent,
+        "hedges": stats_after["hedged"] - stats_before["hedged"],
+        "hedge_wins": stats_after["hedge_wins"] - stats_before["hedge_wins"],
+        "p50_seconds": round(statistics.median(latencies), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "p99_seconds": round(percentile(latencies, 99), 4),
+        "max_seconds": round(max(latencies), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--client", choices=("async", "sync"), default="async")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--slow-prob", type=float, default=0.03)
+    parser.add_argument("--slow-ms", type=float, default=1500)
+    parser.add_argument("--hedge-percentile", type=float, default=optimizer.LLM_HEDGE_PERCENTILE)
+    parser.add_argument("--hedge-max-ratio", type=float, default=optimizer.LLM_HEDGE_MAX_RATIO)
+    parser.add_argument("--min-p99-improvement", type=float, default=0.3,
+                        help="required relative p99 reduction, e.g. 0.3 = 30%%")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    server = start_mock_server(options=MockOptions(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        slow_prob=args.slow_prob, slow_latency=args.slow_ms / 1000, seed=args.seed
+    ))
+    optimizer.OPENAI_BASE_URL = server.base_url
+    optimizer.HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer mock"}
+    optimizer.disable_response_cache()
+    optimizer.configure_llm_limiter(max_concurrency=4 * args.concurrency, initial_concurrency=4 * args.concurrency)
+    optimizer.LLM_HEDGE_PERCENTILE = args.hedge_percentile
+    optimizer.LLM_HEDGE_MAX_RATIO = args.hedge_max_ratio
+
+    results = {}
+    for mode, hedge in (("baseline", False), ("hedged", True)):
+        # The baseline run also fills the latency window the hedge delay is derived from
+        optimizer.LLM_HEDGE_ENABLED = hedge
+        requests_before = server.counters["requests"]
+        stats_before = optimizer.get_latency_stats()
+        latencies = run_workload(mode, args.calls, args.concurrency, args.client)
+        results[mode] = summarize(
+            latencies, server.counters["requests"] - requests_before, stats_before, optimizer.get_latency_stats()
+        )
+    server.shutdown()
+
+    baseline_p99 = results["baseline"]["p99_seconds"]
+    improvement = 1 - results["hedged"]["p99_seconds"] / baseline_p99 if baseline_p99 else 0.0
+    results["p99_improvement"] = round(improvement, 3)
+    results["extra_requests_ratio"] = round(results["hedged"]["requests_sent"] / args.calls - 1, 3)
+    print(json.dumps(results, indent=2))
+
+    if improvement < args.min_p99_improvement:
+        print(f"REGRESSION: p99 improvement {improvement:.1%} < {args.min_p99_improvement:.1%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Size, search latency and recall of the job-posting index (float16 and int8) against exact float32 search.
+
+Uses random unit vectors, so no model is loaded; the run fails (exit code 1) when the p95
+search latency exceeds --max-p95-ms or recall@k against exact search drops below --min-recall.
+
+    python benchmarks/bench_job_index.py --postings 100000 --queries 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+
+from embeddings import normalize  # noqa: E402
+from job_index import INDEX_DTYPES, JobIndex  # noqa: E402
+
+
+def bench_dtype(dtype, vectors, queries, k, chunk=20000):
+    with tempfile.TemporaryDirectory() as path:
+        index = JobIndex(path, dtype=dtype, model_name="bench")
+        started = time.perf_counter()
+        for start in range(0, len(vectors), chunk):
+            ids = [f"job{i}" for i in range(start, min(start + chunk, len(vectors)))]
+            index.add(ids, vectors[start:start + chunk], [{"n": i} for i in range(start, start + len(ids))])
+        add_seconds = time.perf_counter() - started
+
+        exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+        latencies, hits = [], 0
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            found = index.search(query, k)
+            latencies.append(time.perf_counter() - started)
+            hits += len({f"job{i}" for i in expected} & {match["job_id"] for match in found})
+        stats = index.stats()
+        index.close()
+    latencies.sort()
+    return {
+        "file_mb": round(stats["file_bytes"] / 2 ** 20, 1),
+        "add_seconds": round(add_seconds, 2),
+        "p50_search_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_search_ms": round(latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))] * 1000, 1),
+        f"recall_at_{k}": round(hits / (k * len(queries)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postings", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dtypes", default=",".join(INDEX_DTYPES))
+    parser.add_argument("--max-p95-ms", type=float, default=1000)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = normalize(rng.standard_normal((args.postings, args.dim)))
+    # Queries near existing postings, like a CV close to a few job descriptions
+    picks = rng.integers(0, args.postings, args.queries)
+    queries = normalize(vectors[picks] + 0.5 * normalize(rng.standard_normal((args.queries, args.dim))))
+
+    results = {}
+    failures = []
+    for dtype in filter(None, (name.strip() for name in args.dtypes.split(","))):
+        results[dtype] = result = bench_dtype(dtype, vectors, queries, args.k)
+        if result["p95_search_ms"] > args.max_p95_ms:
+            failures.append(f"{dtype}: p95 search {result['p95_search_ms']} ms > {args.max_p95_ms} ms")
+        if result[f"recall_at_{args.k}"] < args.min_recall:
+            failures.append(f"{dtype}: recall {result[f'recall_at_{args.k}']} < {args.min_recall}")
+
+    print(json.dumps({"postings": args.postings, "dim": args.dim, "k": args.k, "dtypes": results}, indent=2))
+    for failure in failures:
+        print(f"FAILURE: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Start-up time benchmark for `import optimizer`.
+
+Runs the import in fresh interpreters and fails (exit code 1) when the median import
+time exceeds --max-seconds or when a heavy module is imported eagerly again.
+
+    python benchmarks/bench_startup.py --runs 10 --max-seconds 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use, never by `import optimizer`
+LAZY_MODULES = ("sentence_transformers", "torch", "sklearn", "transformers", "httpx")
+
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import optimizer
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure_import(runs):
+    env = dict(os.environ)
+    env.pop("STREAMLIT", None)  # Importing must not prompt for a password outside Streamlit either
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_DIR, env.get("PYTHONPATH")]))
+    samples, loaded = [], set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD_SCRIPT],
+            cwd=PACKAGE_DIR, env=env, stdin=subprocess.DEVNULL,
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded.update(result["loaded"])
+    return samples, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    samples, loaded = measure_import(args.runs)
+    median = statistics.median(samples)
+    print(json.dumps({
+        "import_optimizer_median_seconds": round(median, 4),
+        "import_optimizer_max_seconds": round(max(samples), 4),
+        "runs": args.runs,
+        "eagerly_loaded": loaded,
+    }, indent=2))
+
+    failures = []
+    if median > args.max_seconds:
+        failures.append(f"median import time {median:.3f}s > {args.max_seconds:.3f}s")
+    if loaded:
+        failures.append(f"heavy modules imported eagerly: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
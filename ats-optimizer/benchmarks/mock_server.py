@@ -0,0 +1,257 @@
+"""Local stand-in for the DeepSeek chat completions API, with injectable latency and failures.
+
+Answers POST /v1/chat/completions (plain, streamed and JSON mode) with canned text and an
+OpenAI/DeepSeek-style `usage` block, including prompt-cache hit tokens for system prompts it
+has already seen. Time to first token follows a fixed, uniform or lognormal distribution;
+with --tokens-per-second the completion is then generated (and streamed) at that rate.
+GET /stats returns its counters. Used by the benchmarks; run it alone with
+
+    python benchmarks/mock_server.py --port 8765 --latency-ms 80 --slow-prob 0.02 --slow-ms 2000
+    python benchmarks/mock_server.py --distribution lognormal --latency-ms 600 --tokens-per-second 60
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_TEXT = (
+    "## Resumen\n\nEl perfil cubre la mayoría de los requisitos clave del puesto. "
+    "Se recomienda cuantificar logros y reforzar las palabras clave técnicas.\n"
+)
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+class MockOptions:
+    """Latency, throughput and failure injection knobs (all delays in seconds).
+
+    latency is the median time to first token: exact for "fixed", +/- jitter for "uniform",
+    and for "lognormal" exp(N(log(latency), sigma)). With tokens_per_second, completions of
+    completion_tokens tokens then take completion_tokens / tokens_per_second to generate.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.01, slow_prob=0.0, slow_latency=2.0, error_rate=0.0,
+                 max_concurrency=None, hang_prob=0.0, stream_chunks=8, seed=None, distribution="uniform",
+                 sigma=0.5, tokens_per_second=None, completion_tokens=None):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribución desconocida: {distribution!r} (opciones: {', '.join(LATENCY_DISTRIBUTIONS)})")
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.sigma = sigma
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.slow_prob = slow_prob
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.hang_prob = hang_prob
+        self.stream_chunks = stream_chunks
+        self.rng = random.Random(seed)
+
+    def first_token_delay(self):
+        """Draws one time to first token (call with the server lock held: rng is shared)."""
+        if self.rng.random() < self.slow_prob:
+            return self.slow_latency
+        if self.distribution == "fixed":
+            return self.latency
+        if self.distribution == "lognormal":
+            return self.rng.lognormvariate(math.log(max(self.latency, 1e-6)), self.sigma)
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def generation_seconds(self, completion_tokens):
+        return completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+
+def _approx_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        with self.server.lock:
+            body = dict(self.server.counters, in_flight=self.server.in_flight)
+        self._send_json(200, body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        options = self.server.options
+        with self.server.lock:
+            self.server.counters["requests"] += 1
+            self.server.in_flight += 1
+            self.server.counters["max_in_flight"] = max(self.server.counters["max_in_flight"], self.server.in_flight)
+            over_limit = options.max_concurrency is not None and self.server.in_flight > options.max_concurrency
+            draw = options.rng.random()
+            delay = options.first_token_delay()
+        try:
+            if over_limit:
+                self._count("rate_limited")
+                self._send_json(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "1"})
+                return
+            if draw < options.hang_prob:
+                self._count("hung")
+                time.sleep(3600)
+                return
+            if draw < options.hang_prob + options.error_rate:
+                self._count("server_errors")
+                self._send_json(503, {"error": {"message": "Server overloaded"}})
+                return
+            content = self._content(request)
+            usage = self._usage(request, content)
+            generation = options.generation_seconds(usage["completion_tokens"])
+            if request.get("stream"):
+                self._stream(content, usage, delay, generation)
+            else:
+                time.sleep(delay + generation)
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+            self._count("completed")
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("client_disconnects")
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _content(self, request):
+        messages = request.get("messages") or [{}]
+        text = CANNED_TEXT
+        if self.server.options.completion_tokens:
+            text = CANNED_TEXT * max(1, round(self.server.options.completion_tokens / _approx_tokens(CANNED_TEXT)))
+        if request.get("response_format", {}).get("type") == "json_object":
+            keys = re.findall(r'- "(\w+)":', messages[-1].get("content", ""))
+            return json.dumps({key: f"### {key}\n\n{text}" for key in keys})
+        return text
+
+    def _usage(self, request, content):
+        messages = request.get("messages") or []
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        prompt_tokens = sum(_approx_tokens(m.get("content", "")) for m in messages)
+        with self.server.lock:
+            hit = _approx_tokens(system) if system in self.server.seen_prefixes else 0
+            self.server.seen_prefixes.add(system)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _approx_tokens(content),
+            "total_tokens": prompt_tokens + _approx_tokens(content),
+            "prompt_cache_hit_tokens": hit,
+            "prompt_cache_miss_tokens": prompt_tokens - hit,
+        }
+
+    def _stream(self, content, usage, delay, generation):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = self.server.options.stream_chunks
+        step = max(1, len(content) // chunks)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+        time.sleep(delay)
+        for piece in pieces:
+            self._write_chunk({"choices": [{"index": 0, "delta": {"content": piece}}]})
+            time.sleep(generation / len(pieces))
+        self._write_chunk({"choices": [], "usage": usage})
+        self._write_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_chunk(self, event):
+        data = event if isinstance(event, str) else json.dumps(event)
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+        self.wfile.flush()
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _count(self, name):
+        with self.server.lock:
+            self.server.counters[name] += 1
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, MockHandler)
+        self.options = options
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.seen_prefixes = set()
+        self.counters = dict.fromkeys(
+            ("requests", "completed", "rate_limited", "server_errors", "hung", "client_disconnects",
+             "max_in_flight"), 0
+        )
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(port=0, options=None):
+    """Serves the mock on a daemon thread and returns the server (see .base_url, .shutdown())."""
+    server = MockServer(("127.0.0.1", port), options or MockOptions())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--latency-ms", type=float, default=50, help="median time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="spread of the uniform distribution")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-space spread of the lognormal distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="completion generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="approximate length of each answer")
+    parser.add_argument("--slow-prob", type=float, default=0.0, help="share of requests that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--hang-prob", type=float, default=0.0, help="share of requests that never answer")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="answer 429 above this many in flight")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    options = MockOptions(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, slow_prob=args.slow_prob,
+        slow_latency=args.slow_ms / 1000, error_rate=args.error_rate, max_concurrency=args.max_concurrency,
+        hang_prob=args.hang_prob, seed=args.seed, distribution=args.distribution, sigma=args.sigma,
+        tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens
+    )
+    server = MockServer(("127.0.0.1", args.port), options)
+    print(f"Mock DeepSeek API on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
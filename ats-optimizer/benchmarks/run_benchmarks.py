@@ -0,0 +1,287 @@
+"""End-to-end benchmark suite: report pipeline, embeddings and concurrent reports against the mock API.
+
+Starts benchmarks/mock_server.py in a child process (no API key or spend needed), points
+optimizer at it and records, in one JSON file per run:
+
+- embeddings: model load, encode throughput and full vs chunked similarity time
+- report: wall time, per-analysis latency, critical path and two-phase estimate (separate and combined mode)
+- throughput: wall time, reports/minute and report latency percentiles at each --concurrency level
+- app (with --app): one Streamlit script run of the whole report through AppTest
+- peak RSS after each phase, token usage, the request limiter's queue stats and per-analysis metrics
+
+    python benchmarks/run_benchmarks.py --concurrency 1,4,16 --output benchmarks/results/run.json
+    python benchmarks/run_benchmarks.py --distribution lognormal --latency-ms 800 --tokens-per-second 60
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/base.json --output new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PACKAGE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import optimizer  # noqa: E402
+from bench_embeddings import build_corpus  # noqa: E402
+
+# Metrics shown by --compare, as paths into the results JSON (all lower is better)
+HEADLINE_METRICS = (
+    "report.separate.wall_seconds",
+    "report.combined.wall_seconds",
+    "embeddings.encode_seconds",
+    "embeddings.chunked_similarity_seconds",
+    "peak_rss_mb",
+)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------- MOCK API ----------------
+
+def start_mock(args):
+    """Starts the mock API in a child process and returns (process, base_url)."""
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, "mock_server.py"), "--port", "0",
+        "--distribution", args.distribution, "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms), "--sigma", str(args.sigma),
+        "--error-rate", str(args.error_rate), "--seed", str(args.seed),
+    ]
+    if args.tokens_per_second:
+        command += ["--tokens-per-second", str(args.tokens_per_second)]
+    if args.completion_tokens:
+        command += ["--completion-tokens", str(args.completion_tokens)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline().strip()
+    if not banner:
+        process.kill()
+        raise RuntimeError("No se pudo iniciar el servidor mock")
+    return process, banner.rsplit(" ", 1)[-1]
+
+
+# ---------------- PHASES ----------------
+
+def bench_embeddings(cv_texts, jd_texts):
+    started = time.perf_counter()
+    optimizer.get_embedding_model()
+    load_seconds = time.perf_counter() - started
+
+    optimizer.embedding_cache.clear()
+    started = time.perf_counter()
+    optimizer.calculate_similarity_matrix(cv_texts, jd_texts)
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    optimizer.calculate_similarity_matrix(cv_texts, jd_texts)
+    cached_seconds = time.perf_counter() - started
+
+    optimizer.embedding_cache.clear()
+    started = time.perf_counter()
+    for cv_text, jd_text in zip(cv_texts, jd_texts):
+        optimizer.calculate_chunked_similarity(cv_text, jd_text)
+    chunked_seconds = time.perf_counter() - started
+
+    texts = len(cv_texts) + len(jd_texts)
+    return {
+        "backend": optimizer.EMBEDDING_BACKEND,
+        "model": optimizer.EMBEDDING_MODEL_NAME,
+        "load_seconds": round(load_seconds, 3),
+        "texts": texts,
+        "encode_seconds": round(encode_seconds, 3),
+        "texts_per_second": round(texts / encode_seconds, 1),
+        "cached_matrix_seconds": round(cached_seconds, 4),
+        "chunked_similarity_seconds": round(chunked_seconds, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def timed_report(cv_text, jd_text, mode):
+    timings = {}
+    started = time.perf_counter()
+    await optimizer.run_report_async(cv_text, jd_text, timings=timings, mode=mode)
+    return time.perf_counter() - started, timings
+
+
+def bench_report(cv_text, jd_text, mode):
+    async def run():
+        try:
+            return await timed_report(cv_text, jd_text, mode)
+        finally:
+            await optimizer.close_async_http_client()
+
+    wall, timings = asyncio.run(run())
+    return {
+        "wall_seconds": round(wall, 3),
+        "critical_path": timings["critical_path"],
+        "critical_path_seconds": timings["critical_path_seconds"],
+        "two_phase_estimate_seconds": timings["two_phase_estimate_seconds"],
+        "analyses": {name: task["seconds"] for name, task in timings["tasks"].items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_throughput(cv_texts, jd_texts, concurrency, mode):
+    async def run():
+        try:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                timed_report(cv_texts[i % len(cv_texts)], jd_texts[i % len(jd_texts)], mode)
+                for i in range(concurrency)
+            ))
+            return time.perf_counter() - started, [wall for wall, _ in results]
+        finally:
+            await optimizer.close_async_http_client()
+
+    limiter_before = optimizer.get_llm_limiter_stats()
+    wall, latencies = asyncio.run(run())
+    limiter = optimizer.get_llm_limiter_stats()
+    acquired = limiter["acquired"] - limiter_before["acquired"]
+    waited = limiter["wait_seconds_total"] - limiter_before["wait_seconds_total"]
+    return {
+        "reports": concurrency,
+        "wall_seconds": round(wall, 3),
+        "reports_per_minute": round(concurrency / wall * 60, 1),
+        "p50_report_seconds": round(statistics.median(latencies), 3),
+        "p95_report_seconds": round(percentile(latencies, 95), 3),
+        "max_report_seconds": round(max(latencies), 3),
+        "llm_requests": acquired,
+        "mean_queue_wait_seconds": round(waited / acquired, 4) if acquired else 0.0,
+        "max_queue_depth": limiter["max_queue_depth"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_app(cv_text, jd_text):
+    """Times one Streamlit script run that renders the whole report (requires streamlit)."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(PACKAGE_DIR, "app.py"), default_timeout=600)
+    app.session_state["api_initialized"] = True  # HEADERS are already set for the mock
+    app.run()
+    app.text_area[0].input(cv_text)
+    app.text_area[1].input(jd_text)
+    next(button for button in app.button if "Iniciar" in button.label).click()
+    started = time.perf_counter()
+    app.run()
+    return {
+        "script_run_seconds": round(time.perf_counter() - started, 3),
+        "exceptions": [str(exception.value) for exception in app.exception],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ---------------- COMPARISON ----------------
+
+def _lookup(results, path):
+    value = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(previous, current):
+    """Prints the headline metrics of two result files side by side."""
+    print(f"{'metric':42} {'before':>10} {'after':>10} {'change':>8}", file=sys.stderr)
+    rows = list(HEADLINE_METRICS)
+    rows += [f"throughput.{level}.wall_seconds" for level in current.get("throughput", {})]
+    for path in rows:
+        before, after = _lookup(previous, path), _lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        print(f"{path:42} {before:>10} {after:>10} {change:>8}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="numbers of simultaneous reports")
+    parser.add_argument("--mode", choices=("separate", "combined"), default="separate",
+                        help="report mode of the throughput phase")
+    parser.add_argument("--pairs", type=int, default=32, help="CV/JD pairs in the embedding phase")
+    parser.add_argument("--embedding-model", default=optimizer.EMBEDDING_MODEL_NAME)
+    parser.add_argument("--app", action="store_true", help="also time the Streamlit app (AppTest)")
+    mock = parser.add_argument_group("mock API")
+    mock.add_argument("--distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    mock.add_argument("--latency-ms", type=float, default=300, help="median time to first token")
+    mock.add_argument("--jitter-ms", type=float, default=50)
+    mock.add_argument("--sigma", type=float, default=0.4)
+    mock.add_argument("--tokens-per-second", type=float, default=None)
+    mock.add_argument("--completion-tokens", type=int, default=None)
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    parser.add_argument("--compare", help="earlier results file to compare the headline metrics with")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    corpus = build_corpus(2 * max(args.pairs, max(levels)))
+    cv_texts, jd_texts = corpus[0::2], corpus[1::2]
+
+    process, base_url = start_mock(args)
+    try:
+        optimizer.OPENAI_BASE_URL = base_url
+        optimizer.HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer mock"}
+        optimizer.EMBEDDING_MODEL_NAME = args.embedding_model
+        optimizer.disable_response_cache()
+        optimizer.reset_usage_stats()
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        }
+        results["embeddings"] = bench_embeddings(cv_texts[:args.pairs], jd_texts[:args.pairs])
+        results["report"] = {mode: bench_report(cv_texts[0], jd_texts[0], mode) for mode in ("separate", "combined")}
+        results["throughput"] = {
+            str(level): bench_throughput(cv_texts, jd_texts, level, args.mode) for level in levels
+        }
+        if args.app:
+            results["app"] = bench_app(cv_texts[0], jd_texts[0])
+        results["usage"] = optimizer.get_usage_stats()
+        results["llm_limiter"] = optimizer.get_llm_limiter_stats()
+        results["metrics"] = optimizer.get_metrics_snapshot()
+        results["peak_rss_mb"] = peak_rss_mb()
+    finally:
+        process.terminate()
+        process.wait()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
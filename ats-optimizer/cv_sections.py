@@ -0,0 +1,164 @@
+import hashlib
+import re
+import unicodedata
+
+# ---------------- HEADINGS ----------------
+
+SECTION_KINDS = ("header", "summary", "experience", "education", "skills", "other")
+
+# Heading text (lowercase, no accents) -> section kind, Spanish and English
+SECTION_HEADINGS = {
+    "summary": (
+        "resumen", "resumen profesional", "perfil", "perfil profesional", "sobre mi", "acerca de mi", "objetivo",
+        "objetivo profesional", "summary", "professional summary", "profile", "professional profile", "about me",
+        "objective", "career objective",
+    ),
+    "experience": (
+        "experiencia", "experiencia laboral", "experiencia profesional", "historial laboral", "trayectoria",
+        "trayectoria profesional", "experience", "work experience", "professional experience", "employment",
+        "employment history", "work history", "career history",
+    ),
+    "education": (
+        "educacion", "formacion", "formacion academica", "estudios", "educacion y formacion", "education",
+        "academic background", "education and training",
+    ),
+    "skills": (
+        "habilidades", "competencias", "conocimientos", "herramientas", "habilidades tecnicas",
+        "competencias tecnicas", "aptitudes", "skills", "technical skills", "core competencies", "competencies",
+        "tools", "key skills",
+    ),
+}
+
+_HEADING_KINDS = {heading: kind for kind, headings in SECTION_HEADINGS.items() for heading in headings}
+
+# Longest line (in words) still taken as a heading
+MAX_HEADING_WORDS = 6
+
+_BULLET = re.compile(r"^\s*(?:[-*•·▪◦‣–]|\d+[.)])\s+")
+_HEADING_MARKUP = re.compile(r"^[\s#*_=>-]+|[\s#*_=:.-]+$")
+
+
+def _fold(text):
+    """Lowercase without accents, the form headings are compared in."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def heading_kind(line):
+    """Returns the section kind a heading line opens, "other" for an unknown all-caps heading, or None."""
+    if _BULLET.match(line):
+        return None
+    title = _HEADING_MARKUP.sub("", line)
+    if not title or len(title.split()) > MAX_HEADING_WORDS:
+        return None
+    kind = _HEADING_KINDS.get(" ".join(_fold(title).split()))
+    if kind:
+        return kind
+    letters = [ch for ch in title if ch.isalpha()]
+    if len(letters) >= 3 and all(ch.isupper() for ch in letters):
+        return "other"
+    return None
+
+
+# ---------------- PARSING ----------------
+
+def section_digest(text):
+    """Content hash of a section; whitespace-only edits do not change it."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _experience_entries(lines):
+    """Splits an experience section into one block per position.
+
+    A blank line ends an entry, and so does a plain line (the next job title) right after
+    bullet points.
+    """
+    entries, current, in_bullets = [], [], False
+    for line in lines:
+        if not line.strip():
+            if current:
+                entries.append(current)
+            current, in_bullets = [], False
+            continue
+        bullet = bool(_BULLET.match(line))
+        if current and in_bullets and not bullet:
+            entries.append(current)
+            current = []
+        current.append(line)
+        in_bullets = bullet
+    if current:
+        entries.append(current)
+    return entries
+
+
+def parse_cv_sections(cv_text):
+    """Splits a CV into sections: header, summary, one per experience entry, education, skills, other.
+
+    Returns a list of dicts with id (kind plus ordinal, e.g. "experience-2"), kind, title,
+    text and digest (see section_digest). A CV without recognizable headings is one "other" section.
+    """
+    blocks = []  # (kind, heading line or None, lines)
+    kind, heading, lines = None, None, []
+    for line in cv_text.splitlines():
+        opened = heading_kind(line)
+        if opened:
+            blocks.append((kind, heading, lines))
+            kind, heading, lines = opened, line.strip(), []
+        else:
+            lines.append(line)
+    blocks.append((kind, heading, lines))
+    has_headings = len(blocks) > 1
+
+    sections, counts = [], {}
+
+    def add(kind, title, lines):
+        text = "\n".join(lines).strip()
+        if not text:
+            return
+        counts[kind] = counts.get(kind, 0) + 1
+        sections.append({
+            "id": f"{kind}-{counts[kind]}",
+            "kind": kind,
+            "title": title,
+            "text": text,
+            "digest": section_digest(text),
+        })
+
+    for kind, heading, lines in blocks:
+        if kind is None:
+            add("header" if has_headings else "other", "", lines)
+        elif kind == "experience":
+            for entry in _experience_entries(lines):
+                add(kind, entry[0].strip()[:80], entry)
+        else:
+            add(kind, _HEADING_MARKUP.sub("", heading), lines)
+    return sections
+
+
+# ---------------- DIFF ----------------
+
+def diff_sections(previous, current):
+    """Compares two parse_cv_sections results.
+
+    Sections are matched by content first, so a moved but unedited entry still counts as
+    unchanged, then by id. Returns {"unchanged", "changed", "added"} lists of current ids
+    and a "removed" list of previous ids.
+    """
+    previous = previous or []
+    previous_digests = {section["digest"] for section in previous}
+    current_digests = {section["digest"] for section in current}
+    current_ids = {section["id"] for section in current}
+    previous_ids = {section["id"] for section in previous}
+    diff = {"unchanged": [], "changed": [], "added": [], "removed": []}
+    for section in current:
+        if section["digest"] in previous_digests:
+            diff["unchanged"].append(section["id"])
+        elif section["id"] in previous_ids:
+            diff["changed"].append(section["id"])
+        else:
+            diff["added"].append(section["id"])
+    diff["removed"] = [
+        section["id"] for section in previous
+        if section["digest"] not in current_digests and section["id"] not in current_ids
+    ]
+    return diff
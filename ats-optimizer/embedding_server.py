@@ -0,0 +1,357 @@
+"""Out-of-process embedding model shared by every worker on the machine, over a Unix socket.
+
+    python embedding_server.py --socket /tmp/ats-embeddings.sock --max-batch-size 64 --max-wait-ms 5
+    ATS_EMBEDDING_SOCKET=/tmp/ats-embeddings.sock streamlit run app.py
+
+One process holds the model; optimizer.get_embedding_model() returns a RemoteEmbeddingBackend
+when ATS_EMBEDDING_SOCKET is set, so Streamlit workers and batch jobs stop loading their own
+copy. Encode requests arriving together from any client are merged into micro-batches of up
+to --max-batch-size texts, waiting at most --max-wait-ms for the batch to fill.
+
+Wire format, both directions: a 4-byte big-endian length and a JSON header. Requests are
+{"op": "encode", "texts": [...]}, {"op": "info"} or {"op": "stats"}; an encode answer
+{"shape": [n, dim]} is followed by n * dim little-endian float32 values. Errors come back
+as {"error": "..."}.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from embeddings import EMBEDDING_BACKENDS, create_embedding_backend
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ats-optimizer", "embeddings.sock")
+# Largest request header accepted (a few thousand long texts)
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+_LENGTH = struct.Struct(">I")
+
+
+# ---------------- MICRO-BATCHING ----------------
+
+class MicroBatcher:
+    """Merges concurrent encode calls into batches run one at a time on a single model thread.
+
+    A batch closes when it holds max_batch_size texts or max_wait seconds after its first
+    request arrived, whichever comes first. Duplicate texts in a batch are encoded once.
+    """
+
+    def __init__(self, encode, max_batch_size=64, max_wait=0.005):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+        self._counters = {"requests": 0, "texts": 0, "unique_texts": 0, "batches": 0, "max_batch_texts": 0,
+                          "encode_seconds": 0.0, "queue_wait_seconds": 0.0}
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def encode(self, texts):
+        """Returns the (len(texts), dim) float32 embeddings, computed within some batch."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future, time.perf_counter()))
+        return await future
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats["mean_batch_texts"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["encode_seconds"] = round(stats["encode_seconds"], 3)
+        stats["queue_wait_seconds"] = round(stats["queue_wait_seconds"], 3)
+        stats["pending_requests"] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        from concurrent.futures import ThreadPoolExecutor
+        # One thread: the model already uses every core per batch, and backends are not all thread-safe
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ats-embed")
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                size = len(batch[0][0])
+                deadline = loop.time() + self.max_wait
+                while size < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batch.append(item)
+                    size += len(item[0])
+                await self._encode_batch(loop, executor, batch)
+        finally:
+            executor.shutdown(wait=False)
+
+    async def _encode_batch(self, loop, executor, batch):
+        unique = {}
+        for texts, _, _ in batch:
+            for text in texts:
+                unique.setdefault(text, len(unique))
+        started = time.perf_counter()
+        try:
+            if unique:
+                vectors = await loop.run_in_executor(executor, self._encode, list(unique))
+                vectors = np.asarray(vectors, dtype=np.float32)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+        counters = self._counters
+        counters["batches"] += 1
+        counters["requests"] += len(batch)
+        counters["unique_texts"] += len(unique)
+        counters["encode_seconds"] += finished - started
+        for texts, future, queued_at in batch:
+            counters["texts"] += len(texts)
+            counters["queue_wait_seconds"] += started - queued_at
+            if not future.done():
+                if texts:
+                    future.set_result(vectors[[unique[text] for text in texts]])
+                else:
+                    future.set_result(np.empty((0, 0), dtype=np.float32))
+        counters["max_batch_texts"] = max(counters["max_batch_texts"], sum(len(texts) for texts, _, _ in batch))
+
+
+# ---------------- SERVER ----------------
+
+async def _read_message(reader):
+    length = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))[0]
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Mensaje de {length} bytes; el máximo es {MAX_MESSAGE_BYTES}")
+    return json.loads(await reader.readexactly(length))
+
+
+def _frame(header, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data + payload
+
+
+class EmbeddingServer:
+    """Serves one embedding backend to many clients through a MicroBatcher."""
+
+    def __init__(self, backend, socket_path=DEFAULT_SOCKET_PATH, max_batch_size=64, max_wait_ms=5.0,
+                 encode_batch_size=8):
+        self.backend = backend
+        self.socket_path = socket_path
+        self.batcher = MicroBatcher(
+            lambda texts: backend.encode(texts, batch_size=encode_batch_size), max_batch_size, max_wait_ms / 1000
+        )
+        self._server = None
+        self._connections = 0
+
+    async def start(self):
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if _socket_alive(self.socket_path):
+                raise RuntimeError(f"Ya hay un servidor de embeddings en {self.socket_path}")
+            os.unlink(self.socket_path)  # Left over by a server that died
+        self.batcher.start()
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        # Same-user access only: the socket hands out free model time
+        os.chmod(self.socket_path, stat.S_IRUSR | stat.S_IWUSR)
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def info(self):
+        return {
+            "model_name": self.backend.model_name,
+            "cache_name": self.backend.cache_name,
+            "backend": self.backend.name,
+            "max_batch_size": self.batcher.max_batch_size,
+            "max_wait_ms": self.batcher.max_wait * 1000,
+        }
+
+    async def _handle(self, reader, writer):
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    request = await _read_message(reader)
+                except asyncio.IncompleteReadError:
+                    return  # Client closed the connection
+                writer.write(await self._answer(request))
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        except ValueError as e:
+            writer.write(_frame({"error": str(e)}))
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def _answer(self, request):
+        op = request.get("op") if isinstance(request, dict) else None
+        if op == "encode":
+            texts = request.get("texts")
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                return _frame({"error": "'texts' debe ser una lista de textos"})
+            try:
+                vectors = await self.batcher.encode(texts)
+            except Exception as e:
+                return _frame({"error": f"Error al codificar: {e}"})
+            vectors = np.ascontiguousarray(vectors, dtype="<f4")
+            return _frame({"shape": list(vectors.shape)}, vectors.tobytes())
+        if op == "info":
+            return _frame(self.info())
+        if op == "stats":
+            return _frame(dict(self.batcher.stats(), connections=self._connections))
+        return _frame({"error": f"Operación desconocida: {op!r} (opciones: encode, info, stats)"})
+
+
+def _socket_alive(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+# ---------------- CLIENT ----------------
+
+class RemoteEmbeddingBackend:
+    """Embedding backend that forwards encode() to an EmbeddingServer.
+
+    Drop-in for the local backends: same encode(texts, batch_size) and cache_name (the
+    server's, so cached vectors and job indexes built either way stay interchangeable).
+    Each thread keeps its own connection and reconnects once if the server restarted.
+    """
+
+    name = "remote"
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        try:
+            info = self._request({"op": "info"})[0]
+        except OSError as e:
+            raise ConnectionError(f"No se pudo conectar al servidor de embeddings en {socket_path}: {e}") from e
+        self.model_name = info["model_name"]
+        self.cache_name = info["cache_name"]
+        self.server_backend = info["backend"]
+
+    def encode(self, texts, batch_size=32):
+        # batch_size is the server's business: it batches across every client
+        header, payload = self._request({"op": "encode", "texts": list(texts)})
+        return np.frombuffer(payload, dtype="<f4").reshape(header["shape"])
+
+    def stats(self):
+        return self._request({"op": "stats"})[0]
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _request(self, message):
+        data = json.dumps(message).encode("utf-8")
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.sendall(_LENGTH.pack(len(data)) + data)
+                header = json.loads(self._receive(connection, _LENGTH.unpack(self._receive(connection, _LENGTH.size))[0]))
+                payload = b""
+                if "shape" in header:
+                    payload = self._receive(connection, 4 * int(np.prod(header["shape"])))
+                break
+            except (ConnectionError, BrokenPipeError, socket.timeout) as e:
+                self.close()
+                if attempt:
+                    raise ConnectionError(f"Se perdió la conexión con el servidor de embeddings: {e}") from e
+        if "error" in header:
+            raise RuntimeError(header["error"])
+        return header, payload
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.socket_path)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _receive(connection, size):
+        chunks = []
+        while size:
+            chunk = connection.recv(min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError("el servidor cerró la conexión")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
+# ---------------- MAIN ----------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=os.getenv("ATS_EMBEDDING_SOCKET", DEFAULT_SOCKET_PATH))
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default=os.getenv("ATS_EMBEDDING_BACKEND", "torch"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-path", default=os.getenv("ATS_ONNX_MODEL_PATH"))
+    parser.add_argument("--max-batch-size", type=int, default=64, help="textos por micro-lote")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="espera máxima para llenar un lote")
+    parser.add_argument("--encode-batch-size", type=int, default=8, help="lote interno del modelo")
+    args = parser.parse_args(argv)
+
+    backend = create_embedding_backend(args.backend, args.model, onnx_path=args.onnx_path)
+    backend.encode(["warm up"])
+    server = EmbeddingServer(backend, args.socket, args.max_batch_size, args.max_wait_ms, args.encode_batch_size)
+
+    async def run():
+        await server.start()
+        print(f"Embedding server ({backend.cache_name}) on unix:{args.socket}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
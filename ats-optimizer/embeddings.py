@@ -0,0 +1,299 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ---------------- BACKENDS ----------------
+
+# Backends selectable through ATS_EMBEDDING_BACKEND / create_embedding_backend()
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+# Largest tolerated |score - torch score| per backend, in calculate_similarity's 0-100 points
+# (checked by tests/test_embedding_parity.py and benchmarks/bench_embeddings.py)
+MAX_SCORE_DRIFT = {"torch": 0.0, "onnx": 0.5, "onnx-int8": 3.0}
+
+ONNX_CACHE_DIR = os.getenv(
+    "ATS_ONNX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ats-optimizer", "onnx")
+)
+
+
+class SentenceTransformerBackend:
+    """The PyTorch SentenceTransformer path."""
+
+    name = "torch"
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.cache_name = f"{model_name}/{self.name}"
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+class OnnxBackend:
+    """Same MiniLM weights on ONNX Runtime (CPU), with the mean pooling SentenceTransformer applies.
+
+    The graph is exported from the Hugging Face checkpoint on first use and kept under
+    ONNX_CACHE_DIR; pass onnx_path to use a pre-exported file and skip torch entirely.
+    quantize=True runs ONNX Runtime's dynamic int8 quantization over the exported graph.
+    """
+
+    def __init__(self, model_name, quantize=False, onnx_path=None, max_length=256, threads=None):
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "El backend ONNX requiere 'onnxruntime' y 'transformers' (pip install onnxruntime transformers)"
+            ) from e
+        self.model_name = model_name
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.cache_name = f"{model_name}/{self.name}"
+        self.max_length = max_length
+        hub_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.tokenizer = AutoTokenizer.from_pretrained(hub_id)
+
+        if onnx_path is None:
+            onnx_path = _export_onnx(hub_id, quantize)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        pooled = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np"
+            )
+            feeds = {name: batch[name].astype(np.int64) for name in self._input_names if name in batch}
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled.append((token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        if not pooled:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(pooled).astype(np.float32)
+
+
+def _export_onnx(hub_id, quantize):
+    """Exports hub_id to ONNX (and int8) once, returning the path of the requested graph."""
+    target_dir = os.path.join(ONNX_CACHE_DIR, hub_id.replace("/", "__"))
+    fp32_path = os.path.join(target_dir, "model.onnx")
+    int8_path = os.path.join(target_dir, "model-int8.onnx")
+    os.makedirs(target_dir, exist_ok=True)
+
+    if not os.path.exists(fp32_path):
+        import inspect
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        class _LastHiddenState(torch.nn.Module):
+            # Keyword-only call into the HF model: positional forward() order varies across versions
+            def __init__(self, model, input_names):
+                super().__init__()
+                self.model = model
+                self.input_names = input_names
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+        sample = AutoTokenizer.from_pretrained(hub_id)(["warm up"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        wrapper = _LastHiddenState(AutoModel.from_pretrained(hub_id).eval(), input_names)
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        # The TorchScript exporter handles dynamic_axes without the optional onnxscript dependency
+        legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper, tuple(sample[name] for name in input_names), tmp_path,
+                input_names=input_names, output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes, opset_version=17, **legacy
+            )
+        os.replace(tmp_path, fp32_path)
+
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+def create_embedding_backend(name, model_name, onnx_path=None):
+    """Builds the embedding backend called name (one of EMBEDDING_BACKENDS)."""
+    if name == "torch":
+        return SentenceTransformerBackend(model_name)
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(model_name, quantize=name == "onnx-int8", onnx_path=onnx_path)
+    raise ValueError(f"Backend de embeddings desconocido: {name!r} (opciones: {', '.join(EMBEDDING_BACKENDS)})")
+
+
+# ---------------- EMBEDDING CACHE ----------------
+
+def text_key(model_name, text):
+    """Cache key for one text embedded by one model."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of unit-length float32 embeddings, bounded by total bytes."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._vectors = OrderedDict()  # text_key -> read-only float32 vector
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self._counters["misses"] += 1
+                return None
+            self._vectors.move_to_end(key)
+            self._counters["hits"] += 1
+            return vector
+
+    def put(self, key, vector):
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            previous = self._vectors.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if vector.nbytes > self.max_bytes:
+                return
+            self._vectors[key] = vector
+            self._bytes += vector.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._vectors.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._vectors), bytes=self._bytes)
+
+
+# ---------------- ENCODING ----------------
+
+def normalize(vectors):
+    """Scales each row to unit length (zero rows stay zero) and returns float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def encode_normalized(model, model_name, texts, cache=None, batch_size=32):
+    """Returns an (n, dim) float32 matrix of unit-length embeddings for texts.
+
+    Only texts missing from the cache are sent to the model, each distinct text once,
+    in batches of batch_size.
+    """
+    keys = [text_key(model_name, text) for text in texts]
+    found = {}
+    if cache is not None:
+        for key in set(keys):
+            vector = cache.get(key)
+            if vector is not None:
+                found[key] = vector
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        encoded = normalize(model.encode(list(missing.values()), batch_size=batch_size))
+        for key, vector in zip(missing, encoded):
+            found[key] = vector
+            if cache is not None:
+                cache.put(key, vector)
+
+    return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+
+# ---------------- SCORING ----------------
+
+def top_k(scores, k):
+    """Returns (indices, values) of the k highest scores in each row, best first."""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    # argpartition is O(n) per row; only the k survivors get sorted
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+# ---------------- CHUNKING ----------------
+
+CHUNK_AGGREGATES = ("mean_max", "max")
+
+
+def split_chunks(text, max_words=160, overlap_words=32):
+    """Splits text into section-aware chunks of at most max_words words.
+
+    Blank-line separated blocks (sections, experience entries) are packed together up to
+    max_words; longer blocks are cut into windows overlapping by overlap_words, so the parts
+    past the model's ~256-token input limit are embedded too.
+    """
+    chunks, current = [], []
+    for block in re.split(r"\n\s*\n", text):
+        words = block.split()
+        if not words:
+            continue
+        if len(words) > max_words:
+            if current:
+                chunks.append(" ".join(current))
+                current = []
+            step = max(max_words - overlap_words, 1)
+            for start in range(0, len(words), step):
+                chunks.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+        elif len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = list(words)
+        else:
+            current.extend(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks or [text]
+
+
+def aggregate_chunk_scores(scores, aggregate="mean_max"):
+    """Reduces a (cv_chunks, jd_chunks) cosine matrix to one score.
+
+    "mean_max": for every JD chunk take its best-matching CV chunk, then average, i.e. how
+    well the CV covers each part of the posting. "max": the single best chunk pair.
+    """
+    if scores.size == 0:
+        return 0.0
+    if aggregate == "max":
+        return float(scores.max())
+    if aggregate == "mean_max":
+        return float(scores.max(axis=0).mean())
+    raise ValueError(f"Agregación desconocida: {aggregate!r} (opciones: {', '.join(CHUNK_AGGREGATES)})")
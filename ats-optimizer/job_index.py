@@ -0,0 +1,369 @@
+"""Persistent job-description vector index: "best job postings for this CV" over many postings.
+
+Vectors live in a memory-mapped file (float16, or int8 with a per-row scale), metadata and
+ids in an SQLite file next to it:
+
+    <path>/vectors.f16 | vectors.i8   one unit-length embedding per row, appended in place
+    <path>/scales.f32                 per-row dequantization scale (int8 only)
+    <path>/index.sqlite3              job_id, row, metadata JSON, deleted flag, index settings
+
+Adding only appends rows; deleting (or re-adding an existing job_id) marks the old row dead
+until compact() rewrites the files. Searches scan the mapped rows in blocks, so a query
+over 100k postings touches ~77 MB of float16 (38 MB of int8) without loading it all.
+
+    python job_index.py add --jds ofertas/ --index indice_ofertas
+    python job_index.py search --cv cv.txt --index indice_ofertas -k 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+from embeddings import normalize, top_k
+
+INDEX_DTYPES = ("float16", "int8")
+# Rows scored per block: bounds the float32 scratch memory of a search (~24 MB at 384 dims)
+SEARCH_BLOCK_ROWS = 16384
+
+_VECTOR_FILES = {"float16": "vectors.f16", "int8": "vectors.i8"}
+
+
+class JobIndex:
+    """Memory-mapped store of normalized JD embeddings with incremental add/delete and top-k search.
+
+    dim, dtype and model_name are fixed when the index is created and checked on reopen, so
+    vectors from a different embedding model are never mixed in.
+    """
+
+    def __init__(self, path, dim=None, dtype="float16", model_name=None):
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Tipo de índice desconocido: {dtype!r} (opciones: {', '.join(INDEX_DTYPES)})")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " row INTEGER PRIMARY KEY, job_id TEXT NOT NULL, metadata TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_live ON jobs (job_id) WHERE deleted = 0")
+
+        settings = dict(self._db.execute("SELECT name, value FROM settings"))
+        if settings:
+            self.dtype = settings["dtype"]
+            self.dim = int(settings["dim"])
+            self.model_name = settings.get("model_name") or None
+            if dim is not None and dim != self.dim:
+                raise ValueError(f"El índice {path} tiene dimensión {self.dim}, no {dim}")
+            if model_name is not None and self.model_name is not None and model_name != self.model_name:
+                raise ValueError(f"El índice {path} se creó con el modelo {self.model_name!r}, no {model_name!r}")
+        else:
+            self.dtype, self.dim, self.model_name = dtype, dim, model_name
+            if dim is not None:
+                self._save_settings()
+
+        self._vectors = None
+        self._scales = None
+        self._rows = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._load_rows()
+
+    # ---------------- WRITES ----------------
+
+    def add(self, job_ids, vectors, metadata=None):
+        """Appends one embedding per job_id (re-adding an id replaces its previous entry).
+
+        vectors are (n, dim) embeddings, normalized here; metadata is an optional list of
+        JSON-serializable dicts (title, company, url, ...) returned with search results.
+        """
+        job_ids = [str(job_id) for job_id in job_ids]
+        vectors = normalize(np.atleast_2d(vectors))
+        metadata = list(metadata) if metadata is not None else [{}] * len(job_ids)
+        if not (len(job_ids) == len(vectors) == len(metadata)):
+            raise ValueError("job_ids, vectors y metadata deben tener la misma longitud")
+        if not job_ids:
+            return 0
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._save_settings()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vectores de dimensión {vectors.shape[1]}; el índice usa {self.dim}")
+
+            start = self._rows
+            # Vectors first: rows past the committed count are dropped on the next open
+            self._append_vectors(vectors)
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    f"UPDATE jobs SET deleted = 1 WHERE deleted = 0 AND job_id IN ({','.join('?' * len(job_ids))})",
+                    job_ids
+                )
+                self._db.executemany(
+                    "INSERT INTO jobs (row, job_id, metadata) VALUES (?, ?, ?)",
+                    [(start + i, job_id, json.dumps(meta, ensure_ascii=False))
+                     for i, (job_id, meta) in enumerate(zip(job_ids, metadata))]
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._load_rows_locked()
+        return len(job_ids)
+
+    def delete(self, job_ids):
+        """Marks postings deleted; their rows stop matching at once and are reclaimed by compact()."""
+        job_ids = [str(job_id) for job_id in job_ids]
+        if not job_ids:
+            return 0
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET deleted = 1 WHERE deleted = 0 AND job_id IN ({','.join('?' * len(job_ids))})",
+                job_ids
+            )
+            self._load_rows_locked()
+            return cursor.rowcount
+
+    def compact(self):
+        """Rewrites the files without deleted rows; returns the number of rows reclaimed.
+
+        Run it while nothing else writes to the index; an interrupted compact leaves the
+        files and the row numbers out of step, so rebuild the index if one is killed midway.
+        """
+        with self._lock:
+            live_rows = np.flatnonzero(self._live)
+            reclaimed = self._rows - len(live_rows)
+            if reclaimed == 0:
+                return 0
+            vectors_path = self._vectors_path()
+            vectors = np.array(self._vectors[live_rows]) if len(live_rows) else None
+            scales = np.array(self._scales[live_rows]) if self._scales is not None and len(live_rows) else None
+            self._vectors = self._scales = None  # Unmap before replacing the files
+            self._write_atomic(vectors_path, vectors)
+            if self.dtype == "int8":
+                self._write_atomic(self._scales_path(), scales)
+            self._db.execute("BEGIN")
+            try:
+                rows = self._db.execute("SELECT row FROM jobs WHERE deleted = 0 ORDER BY row").fetchall()
+                self._db.execute("DELETE FROM jobs WHERE deleted = 1")
+                # Renumber in increasing order so no new row number collides with an old one
+                self._db.executemany(
+                    "UPDATE jobs SET row = ? WHERE row = ?", [(new, old) for new, (old,) in enumerate(rows)]
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._load_rows_locked()
+            return reclaimed
+
+    # ---------------- SEARCH ----------------
+
+    def search(self, query, k=10, min_score=None):
+        """Best postings for one query embedding: [{"job_id", "score", "metadata"}], best first.
+
+        Scores are cosine similarities on the 0-100 scale of calculate_similarity.
+        """
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        with self._lock:
+            vectors, scales, live, rows = self._vectors, self._scales, self._live, self._rows
+        if rows == 0 or k <= 0:
+            return []
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Consulta de dimensión {query.shape[0]}; el índice usa {self.dim}")
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, rows, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, rows)
+            scores = vectors[start:stop].astype(np.float32) @ query
+            if scales is not None:
+                scores *= scales[start:stop]
+            scores[~live[start:stop]] = -np.inf
+            # Keep a running top-k: this block's survivors merged with the best so far
+            indices, values = top_k(scores, k)
+            best_rows = np.concatenate([best_rows, indices[0] + start])
+            best_scores = np.concatenate([best_scores, values[0]])
+            keep, _ = top_k(best_scores, k)
+            best_rows, best_scores = best_rows[keep[0]], best_scores[keep[0]]
+
+        found = [(int(row), float(score)) for row, score in zip(best_rows, best_scores) if np.isfinite(score)]
+        if min_score is not None:
+            found = [(row, score) for row, score in found if score * 100 >= min_score]
+        if not found:
+            return []
+        with self._lock:
+            entries = dict(
+                (row, (job_id, metadata)) for row, job_id, metadata in self._db.execute(
+                    f"SELECT row, job_id, metadata FROM jobs WHERE row IN ({','.join('?' * len(found))})",
+                    [row for row, _ in found]
+                )
+            )
+        return [
+            {"job_id": entries[row][0], "score": round(score * 100, 2), "metadata": json.loads(entries[row][1])}
+            for row, score in found if row in entries
+        ]
+
+    # ---------------- INFO ----------------
+
+    def __len__(self):
+        with self._lock:
+            return int(self._live.sum())
+
+    def __contains__(self, job_id):
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM jobs WHERE job_id = ? AND deleted = 0", (str(job_id),)
+            ).fetchone() is not None
+
+    def stats(self):
+        with self._lock:
+            live = int(self._live.sum())
+            rows = self._rows
+        files = [self._vectors_path()] + ([self._scales_path()] if self.dtype == "int8" else [])
+        return {
+            "jobs": live,
+            "rows": rows,
+            "deleted_rows": rows - live,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "model_name": self.model_name,
+            "file_bytes": sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+        }
+
+    def close(self):
+        with self._lock:
+            self._vectors = self._scales = None
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Callers below must hold self._lock (or be __init__)
+
+    def _vectors_path(self):
+        return os.path.join(self.path, _VECTOR_FILES[self.dtype])
+
+    def _scales_path(self):
+        return os.path.join(self.path, "scales.f32")
+
+    def _save_settings(self):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+            [("dtype", self.dtype), ("dim", str(self.dim)), ("model_name", self.model_name or "")]
+        )
+
+    def _append_vectors(self, vectors):
+        if self.dtype == "int8":
+            # Symmetric per-row quantization: row ~= int8 values * scale
+            scales = np.maximum(np.abs(vectors).max(axis=1), np.finfo(np.float32).tiny) / 127
+            quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            self._append_file(self._vectors_path(), quantized, self.dim)
+            self._append_file(self._scales_path(), scales.astype(np.float32), 4)
+        else:
+            self._append_file(self._vectors_path(), vectors.astype(np.float16), 2 * self.dim)
+        self._vectors = self._scales = None  # Remapped with the new length by _load_rows_locked
+
+    def _append_file(self, path, array, row_bytes):
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            # Drop the tail of an earlier append whose metadata never got committed
+            f.truncate(row_bytes * self._rows)
+            f.seek(row_bytes * self._rows)
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_atomic(self, path, array):
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            if array is not None:
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def _load_rows(self):
+        with self._lock:
+            self._load_rows_locked()
+
+    def _load_rows_locked(self):
+        """Maps the committed rows read-only and rebuilds the live-row mask."""
+        rows = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM jobs").fetchone()[0]
+        live = np.zeros(rows, dtype=bool)
+        live_rows = [row for (row,) in self._db.execute("SELECT row FROM jobs WHERE deleted = 0")]
+        live[live_rows] = True
+        self._rows = rows
+        self._live = live
+        if rows == 0:
+            self._vectors = self._scales = None
+            return
+        vector_dtype = np.int8 if self.dtype == "int8" else np.float16
+        self._vectors = np.memmap(self._vectors_path(), dtype=vector_dtype, mode="r", shape=(rows, self.dim))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._scales_path(), dtype=np.float32, mode="r", shape=(rows,))
+
+
+# ---------------- CLI ----------------
+
+def _read_documents(locations):
+    """(job_id, text, metadata) for .txt/.md files given directly or inside folders."""
+    for location in locations:
+        paths = [location]
+        if os.path.isdir(location):
+            paths = [
+                os.path.join(location, name) for name in sorted(os.listdir(location))
+                if name.lower().endswith((".txt", ".md"))
+            ]
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            title = next((line.strip() for line in text.splitlines() if line.strip()), "")
+            yield os.path.splitext(os.path.basename(path))[0], text, {"path": path, "title": title[:200]}
+
+
+def main(argv=None):
+    import optimizer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=optimizer.JD_INDEX_PATH, help="carpeta del índice")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="indexa ofertas (.txt/.md); el nombre de archivo es el id")
+    add.add_argument("--jds", nargs="+", required=True, help="archivos o carpetas de ofertas")
+    add.add_argument("--dtype", choices=INDEX_DTYPES, default=optimizer.JD_INDEX_DTYPE)
+    delete = commands.add_parser("delete", help="elimina ofertas por id")
+    delete.add_argument("ids", nargs="+")
+    search = commands.add_parser("search", help="mejores ofertas para un CV")
+    search.add_argument("--cv", required=True, help="archivo del CV")
+    search.add_argument("-k", type=int, default=10)
+    commands.add_parser("compact", help="recupera el espacio de las ofertas eliminadas")
+    commands.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    index = optimizer.open_job_index(args.index, getattr(args, "dtype", None))
+    try:
+        if args.command == "add":
+            count = optimizer.index_job_descriptions(index, _read_documents(args.jds))
+            print(f"{count} ofertas indexadas ({len(index)} en total)", file=sys.stderr)
+        elif args.command == "delete":
+            print(f"{index.delete(args.ids)} ofertas eliminadas", file=sys.stderr)
+        elif args.command == "search":
+            with open(args.cv, encoding="utf-8") as f:
+                cv_text = f.read()
+            for match in optimizer.best_jobs_for_cv(cv_text, args.k, index=index):
+                print(json.dumps(match, ensure_ascii=False))
+        elif args.command == "compact":
+            print(f"{index.compact()} filas recuperadas", file=sys.stderr)
+        else:
+            print(json.dumps(index.stats(), indent=2, ensure_ascii=False))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
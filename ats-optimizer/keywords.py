@@ -0,0 +1,328 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# ---------------- VOCABULARY ----------------
+
+# Longest keyword phrase extracted (in words, stopwords excluded)
+MAX_NGRAM = 3
+
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun bajo bien cada casi como con contra cual
+cuales cuando de del desde donde dos durante e el ella ellas ellos en entre era es esa esas ese eso esos esta
+estan estar estas este esto estos fue ha haber hacia han hasta hay la las le les lo los mas me mediante mi
+mismo muy nos nuestra nuestras nuestro nuestros o otra otras otro otros para pero poco por que quien se
+segun ser si sin sobre su sus tal tambien tan tanto te tiene tienen toda todas todo todos tu tus u un una
+unas uno unos usted y ya
+""".split())
+
+STOPWORDS_EN = frozenset("""
+a about above after all also an and any are as at be been being both but by can could do does doing for
+from had has have having he her here his how i if in into is it its may more most must my no not of on
+once only or other our ours out over own per same she should so some such than that the their them then
+there these they this those through to too under until up upon us very via was we were what when where
+which while who whom why will with within would you your
+""".split())
+
+# Words every job posting uses; they say nothing about this one
+JOB_POSTING_STOPWORDS = frozenset("""
+ability able anos ano buscamos candidate candidates candidato candidata capacidad company conocimiento
+conocimientos deseable empresa excellent excelente experience experiencia good gran including incluyendo
+job knowledge looking minimo minimum nivel ofrecemos offer plus position preferred preferible preferiblemente
+puesto required requerido requerida requirements requisitos responsabilidades responsibilities rol role
+skills solido solida strong trabajo work working year years
+""".split())
+
+STOPWORDS = STOPWORDS_ES | STOPWORDS_EN | JOB_POSTING_STOPWORDS
+
+# Synonym groups (Spanish and English): the first entry is the label shown, the rest are
+# matched as the same keyword, so a CV saying "Human Resources Information System" covers "HRIS".
+SYNONYM_GROUPS = (
+    ("HRIS", "Human Resources Information System", "Sistema de Información de Recursos Humanos"),
+    ("ATS", "Applicant Tracking System", "Sistema de Seguimiento de Candidatos"),
+    ("CRM", "Customer Relationship Management", "Gestión de Relaciones con Clientes"),
+    ("ERP", "Enterprise Resource Planning", "Planificación de Recursos Empresariales"),
+    ("KPI", "KPIs", "Key Performance Indicators", "Indicadores Clave de Desempeño", "Indicadores de Gestión"),
+    ("Recruitment", "Talent Acquisition", "Reclutamiento", "Selección de Personal", "Atracción de Talento"),
+    ("Payroll", "Nómina", "Nóminas", "Liquidación de Nómina"),
+    ("Onboarding", "Inducción", "Incorporación de Personal"),
+    ("Performance Management", "Performance Evaluation", "Evaluación de Desempeño", "Gestión del Desempeño"),
+    ("Labor Relations", "Employee Relations", "Relaciones Laborales"),
+    ("Training and Development", "Capacitación", "Formación y Desarrollo"),
+    ("Project Management", "Gestión de Proyectos", "Dirección de Proyectos", "Administración de Proyectos"),
+    ("Agile", "Scrum", "Metodologías Ágiles", "Metodología Ágil"),
+    ("Stakeholder Management", "Gestión de Stakeholders", "Gestión de Partes Interesadas"),
+    ("Customer Service", "Atención al Cliente", "Servicio al Cliente"),
+    ("Sales", "Ventas"),
+    ("Negotiation", "Negociación"),
+    ("Leadership", "Liderazgo", "Team Leadership", "Liderazgo de Equipos"),
+    ("Communication", "Communication Skills", "Comunicación", "Habilidades de Comunicación"),
+    ("Problem Solving", "Resolución de Problemas", "Solución de Problemas"),
+    ("Teamwork", "Trabajo en Equipo"),
+    ("Budgeting", "Budget Management", "Presupuesto", "Gestión de Presupuesto", "Manejo de Presupuesto"),
+    ("Accounting", "Contabilidad"),
+    ("Financial Analysis", "Análisis Financiero"),
+    ("Supply Chain", "Cadena de Suministro", "Logística"),
+    ("Inventory Management", "Gestión de Inventarios", "Control de Inventarios"),
+    ("Data Analysis", "Data Analytics", "Análisis de Datos", "Analítica de Datos"),
+    ("Data Science", "Ciencia de Datos"),
+    ("Machine Learning", "ML", "Aprendizaje Automático"),
+    ("Deep Learning", "Aprendizaje Profundo"),
+    ("Artificial Intelligence", "AI", "IA", "Inteligencia Artificial"),
+    ("NLP", "Natural Language Processing", "Procesamiento de Lenguaje Natural"),
+    ("Business Intelligence", "BI", "Inteligencia de Negocios"),
+    ("Power BI", "PowerBI"),
+    ("Excel", "Microsoft Excel", "MS Excel"),
+    ("SQL", "Structured Query Language"),
+    ("PostgreSQL", "Postgres"),
+    ("JavaScript", "JS"),
+    ("TypeScript", "TS"),
+    ("Node.js", "NodeJS"),
+    ("Kubernetes", "K8s"),
+    ("AWS", "Amazon Web Services"),
+    ("GCP", "Google Cloud", "Google Cloud Platform"),
+    ("Azure", "Microsoft Azure"),
+    ("CI/CD", "Continuous Integration", "Integración Continua", "Despliegue Continuo"),
+    ("REST API", "REST APIs", "RESTful", "API REST"),
+    ("QA", "Quality Assurance", "Aseguramiento de Calidad", "Control de Calidad"),
+    ("UX", "User Experience", "Experiencia de Usuario"),
+    ("UI", "User Interface", "Interfaz de Usuario"),
+    ("English", "Inglés", "English Proficiency"),
+    ("Spanish", "Español"),
+    ("Bachelor's Degree", "Bachelor's", "Licenciatura", "Título Universitario", "Título Profesional", "Pregrado"),
+    # No bare "Master": it would read a degree into "Scrum Master"
+    ("Master's Degree", "Master's", "MBA", "Maestría", "Magíster"),
+    ("Occupational Health and Safety", "OHS", "Seguridad y Salud en el Trabajo", "SST", "Salud Ocupacional"),
+)
+
+_TOKEN = re.compile(r"\w[\w+#./-]*[\w+#]|\w", re.UNICODE)
+# Punctuation that ends a phrase (a "." or "/" inside a token such as Node.js or CI/CD does not)
+_CLAUSE_BREAK = re.compile(r"[,;:!?()\[\]{}\"“”«»•|\n\r]|\.(?=\s|$)|\s[-–—/]\s")
+# Tokens of one letter kept as keywords (languages); others are noise
+_SINGLE_LETTER_TERMS = frozenset(("c", "r"))
+
+
+# ---------------- NORMALIZATION ----------------
+
+def _fold(token):
+    """Lowercase without accents, the form stopwords and synonyms are compared in."""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(folded):
+    """Light plural stripping shared by both languages; singular and plural reduce to the same form.
+
+    Drops a final "s" and then a final "e": habilidades/habilidad -> habilidad,
+    claves/clave -> clav, services/service -> servic. Tokens like node.js are left alone.
+    """
+    if not folded.isalpha():
+        return folded
+    if len(folded) > 3 and folded.endswith("s") and not folded.endswith("ss"):
+        folded = folded[:-1]
+    if len(folded) > 3 and folded.endswith("e"):
+        folded = folded[:-1]
+    return folded
+
+
+def _match_form(token):
+    return _stem(_fold(token))
+
+
+def tokenize(text):
+    """Lowercased word tokens; keeps C++, C#, Node.js, CI/CD and similar as one token."""
+    return _TOKEN.findall(text.lower())
+
+
+def _build_synonym_index():
+    """{first match-form token: [(match-form tuple, group id), ...]} sorted longest phrase first."""
+    index = {}
+    for group_id, group in enumerate(SYNONYM_GROUPS):
+        for variant in group:
+            form = tuple(_match_form(token) for token in tokenize(variant))
+            index.setdefault(form[0], []).append((form, group_id))
+    for variants in index.values():
+        variants.sort(key=lambda entry: -len(entry[0]))
+    return index
+
+
+_SYNONYM_INDEX = _build_synonym_index()
+
+
+def _tag_synonyms(tokens):
+    """Replaces each synonym phrase in a token list with a single ("syn", group id) marker."""
+    forms = [_match_form(token) for token in tokens]
+    tagged = []
+    i = 0
+    while i < len(tokens):
+        for form, group_id in _SYNONYM_INDEX.get(forms[i], ()):
+            if tuple(forms[i:i + len(form)]) == form:
+                tagged.append(("syn", group_id))
+                i += len(form)
+                break
+        else:
+            tagged.append(tokens[i])
+            i += 1
+    return tagged
+
+
+def _is_breaker(token):
+    """Stopwords, numbers and stray letters end a phrase: n-grams never span them."""
+    folded = _fold(token)
+    if folded in STOPWORDS or not any(ch.isalpha() for ch in folded):
+        return True
+    return len(folded) == 1 and folded not in _SINGLE_LETTER_TERMS
+
+
+def _phrase_ngrams(text, max_ngram=MAX_NGRAM):
+    """Analyzer for the vectorizer: n-grams inside stopword-free runs, synonyms as one term.
+
+    A synonym match is a term of its own and also ends the run, so every phrase is made of
+    words that stand next to each other in the text (never a label glued to a neighbour).
+    """
+    terms = []
+    for clause in _CLAUSE_BREAK.split(text):
+        run = []
+        for token in _tag_synonyms(tokenize(clause)) + [None]:
+            if token is None or isinstance(token, tuple) or _is_breaker(token):
+                for n in range(1, max_ngram + 1):
+                    for start in range(len(run) - n + 1):
+                        terms.append(" ".join(run[start:start + n]))
+                run = []
+                if isinstance(token, tuple):
+                    terms.append(f"syn:{token[1]}")
+            else:
+                run.append(token)
+    return terms
+
+
+def _segments(text):
+    """Lines and sentences of a job description: the documents term frequencies are spread over."""
+    parts = re.split(r"[\n\r]+|(?<=[.;:!?])\s+|\s+[-•*·]\s+", text)
+    return [part for part in (p.strip() for p in parts) if part]
+
+
+# ---------------- EXTRACTION ----------------
+
+def extract_keywords_local(job_description, top_n=30, corpus=None, max_ngram=MAX_NGRAM):
+    """Ranks the job description's keywords with TF-IDF over word n-grams, no API call.
+
+    Returns [{"keyword", "weight", "synonyms"}] best first, weights scaled so the top one is 1.0.
+    Document frequencies come from the posting's own lines and sentences, or, when `corpus`
+    (other job descriptions) is given, from those postings, so terms common to all of them
+    rank lower. Synonyms (SYNONYM_GROUPS) count as one keyword under their label.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    documents = list(corpus) + [job_description] if corpus else _segments(job_description)
+    if not documents:
+        return []
+    vectorizer = TfidfVectorizer(
+        analyzer=lambda text: _phrase_ngrams(text, max_ngram), sublinear_tf=True, norm=None
+    )
+    try:
+        matrix = vectorizer.fit_transform(documents)
+    except ValueError:
+        return []  # Nothing but stopwords
+    if corpus:
+        # Score the posting's own row, with its raw term counts
+        weights = vectorizer.transform([job_description]).toarray()[0]
+    else:
+        weights = np.asarray(matrix.sum(axis=0)).ravel()
+    terms = vectorizer.get_feature_names_out()
+
+    # Longer phrases and curated terms are more specific than any single word they contain
+    lengths = np.array([1 if term.startswith("syn:") else term.count(" ") + 1 for term in terms])
+    curated = np.array([term.startswith("syn:") for term in terms])
+    weights = weights * (1 + 0.25 * (lengths - 1)) * np.where(curated, 1.5, 1.0)
+
+    order = np.argsort(-weights, kind="stable")
+    selected = []
+    chosen_phrases = []
+    for index in order:
+        if weights[index] <= 0 or len(selected) >= top_n:
+            break
+        term = terms[index]
+        if not term.startswith("syn:"):
+            padded = f" {term} "
+            # Skip a word already shown inside a phrase that outranks it
+            if any(padded in f" {phrase} " for phrase in chosen_phrases):
+                continue
+            chosen_phrases.append(term)
+        selected.append((term, weights[index]))
+
+    if not selected:
+        return []
+    top = selected[0][1]
+    keywords = []
+    for term, weight in selected:
+        if term.startswith("syn:"):
+            group = SYNONYM_GROUPS[int(term[4:])]
+            keywords.append({"keyword": group[0], "weight": round(float(weight / top), 3), "synonyms": list(group[1:])})
+        else:
+            keywords.append({"keyword": term, "weight": round(float(weight / top), 3), "synonyms": []})
+    return keywords
+
+
+# ---------------- COVERAGE ----------------
+
+def _match_text(text):
+    """Padded match-form string of a text, for whole-word phrase lookups."""
+    return " " + " ".join(_match_form(token) for token in tokenize(text)) + " "
+
+
+def keyword_coverage(cv_text, job_description=None, keywords=None, top_n=30):
+    """Share of the job description's keywords (weighted) that appear in the CV, in milliseconds.
+
+    Pass the `keywords` from extract_keywords_local to score several CVs against one posting.
+    A keyword counts as present when it or any of its synonyms appears in the CV, ignoring
+    case, accents and plurals. Returns {"score": 0-100, "matched": [...], "missing": [...]}
+    with the keyword dicts, matched ones carrying the variant found under "found_as".
+    """
+    if keywords is None:
+        keywords = extract_keywords_local(job_description, top_n)
+    cv = _match_text(cv_text)
+    matched, missing = [], []
+    for keyword in keywords:
+        for variant in [keyword["keyword"]] + keyword["synonyms"]:
+            if _match_text(variant) in cv:
+                matched.append(dict(keyword, found_as=variant))
+                break
+        else:
+            missing.append(keyword)
+    total = sum(keyword["weight"] for keyword in keywords)
+    score = sum(keyword["weight"] for keyword in matched) / total * 100 if total else 0.0
+    return {"score": round(score, 1), "matched": matched, "missing": missing}
+
+
+def compare_coverage(cv_before, cv_after, job_description, top_n=30):
+    """Keyword coverage of an original and a rewritten CV against the same posting."""
+    keywords = extract_keywords_local(job_description, top_n)
+    before = keyword_coverage(cv_before, keywords=keywords)
+    after = keyword_coverage(cv_after, keywords=keywords)
+    before_found = {keyword["keyword"] for keyword in before["matched"]}
+    after_found = {keyword["keyword"] for keyword in after["matched"]}
+    return {
+        "before": before,
+        "after": after,
+        "gained": [keyword for keyword in after["matched"] if keyword["keyword"] not in before_found],
+        "lost": [keyword for keyword in before["matched"] if keyword["keyword"] not in after_found],
+    }
+
+
+def keywords_markdown(keywords, language="es"):
+    """Markdown list of extracted keywords, in place of the LLM keyword analysis."""
+    if language == "es":
+        title, synonyms_label, empty = "### 🔑 Palabras clave de la oferta (extracción local)", "también", "No se encontraron palabras clave."
+    else:
+        title, synonyms_label, empty = "### 🔑 Job description keywords (local extraction)", "also", "No keywords found."
+    if not keywords:
+        return f"{title}\n\n{empty}"
+    lines = [title, ""]
+    for keyword in keywords:
+        line = f"- **{keyword['keyword']}** ({keyword['weight']:.2f})"
+        if keyword["synonyms"]:
+            line += f" — {synonyms_label}: {', '.join(keyword['synonyms'])}"
+        lines.append(line)
+    return "\n".join(lines)
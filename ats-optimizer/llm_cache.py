@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------- KEYS ----------------
+
+def cache_key(model_name, system_prompt, user_prompt, temperature, json_mode=False, max_tokens=None):
+    """Content hash identifying one chat completion request, including the options that change its answer."""
+    payload = json.dumps([model_name, system_prompt, user_prompt, temperature, bool(json_mode), max_tokens],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------- RESPONSE CACHE ----------------
+
+class ResponseCache:
+    """Two-tier LLM response cache: an in-memory LRU in front of an SQLite file.
+
+    Both tiers evict least-recently-used entries once they exceed their byte budget,
+    and entries older than ttl_seconds are treated as misses and dropped.
+    Pass path=None to keep only the in-memory tier.
+    """
+
+    def __init__(self, path=None, max_memory_bytes=32 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, created_at, size)
+        self._memory_bytes = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self._db = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """Returns the cached response text, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                self._drop_memory(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._remember(key, value, created_at)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._counters["sets"] += 1
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode("utf-8")), now, now)
+                )
+                self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Returns hit/miss counters plus the current size of each tier."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            if self._db is not None:
+                count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Callers below must hold self._lock
+
+    def _remember(self, key, value, created_at):
+        self._drop_memory(key)
+        size = len(value.encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = (value, created_at, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[2]
+
+    def _evict_disk(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self._counters["evictions"] += 1
@@ -0,0 +1,263 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------- CONTEXT ----------------
+
+# Analysis the running code works for ("gaps", "optimized_cv", ...); LLM requests and encodes
+# made underneath are attributed to it. Set with analysis_scope(); asyncio tasks inherit it.
+current_analysis = contextvars.ContextVar("ats_current_analysis", default="other")
+# ReportMetrics of the report being run, if any (see report_scope)
+_current_report = contextvars.ContextVar("ats_current_report", default=None)
+
+# Histogram bucket upper bounds in seconds, from a cached call to a long rewrite
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+
+# Per-analysis counters, in the order they are exported
+ANALYSIS_FIELDS = (
+    "runs", "errors", "seconds", "llm_requests", "llm_seconds", "queue_wait_seconds",
+    "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd", "retries",
+    "encode_calls", "encode_texts", "encode_seconds", "coalesced_llm_requests", "coalesced_similarity",
+)
+
+
+def _new_fields():
+    return dict.fromkeys(ANALYSIS_FIELDS, 0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style (callers hold the registry lock)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+# ---------------- REGISTRY ----------------
+
+class MetricsRegistry:
+    """Thread-safe per-analysis counters and latency histograms for the whole process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._analyses = {}
+        self._histograms = {}  # (metric, analysis) -> Histogram
+        self._retries = {}  # (analysis, reason) -> count
+        self._started = time.time()
+
+    def add(self, analysis, **values):
+        with self._lock:
+            fields = self._analyses.setdefault(analysis, _new_fields())
+            for name, value in values.items():
+                fields[name] += value
+
+    def observe(self, metric, analysis, seconds):
+        with self._lock:
+            histogram = self._histograms.get((metric, analysis))
+            if histogram is None:
+                histogram = self._histograms[(metric, analysis)] = Histogram()
+            histogram.observe(seconds)
+
+    def count_retry(self, analysis, reason):
+        with self._lock:
+            self._retries[(analysis, reason)] = self._retries.get((analysis, reason), 0) + 1
+            self._analyses.setdefault(analysis, _new_fields())["retries"] += 1
+
+    def snapshot(self):
+        """JSON-ready copy: per-analysis counters and totals, retry reasons and histogram counts/sums."""
+        with self._lock:
+            analyses = {name: dict(fields) for name, fields in self._analyses.items()}
+            retries = {}
+            for (analysis, reason), count in self._retries.items():
+                retries.setdefault(analysis, {})[reason] = count
+            histograms = {
+                f"{metric}:{analysis}": {"count": h.count, "sum": round(h.sum, 4)}
+                for (metric, analysis), h in self._histograms.items()
+            }
+        for fields in analyses.values():
+            for name in ("seconds", "llm_seconds", "queue_wait_seconds", "encode_seconds"):
+                fields[name] = round(fields[name], 4)
+            fields["cost_usd"] = round(fields["cost_usd"], 6)
+        totals = _new_fields()
+        for fields in analyses.values():
+            for name in ANALYSIS_FIELDS:
+                totals[name] += fields[name]
+        return {
+            "uptime_seconds": round(time.time() - self._started, 1),
+            "analyses": analyses,
+            "totals": {name: round(value, 6) for name, value in totals.items()},
+            "retries": retries,
+            "histograms": histograms,
+        }
+
+    def prometheus_text(self, gauges=None):
+        """Prometheus text exposition (version 0.0.4); gauges adds {name: (help, value)} samples."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            analyses = {name: dict(fields) for name, fields in self._analyses.items()}
+            retries = dict(self._retries)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.count, h.sum) for key, h in self._histograms.items()
+            }
+
+        counters = (
+            ("runs", "ats_analysis_runs_total", "Analyses run"),
+            ("errors", "ats_analysis_errors_total", "Analyses that raised"),
+            ("llm_requests", "ats_llm_requests_total", "Successful LLM API requests"),
+            ("queue_wait_seconds", "ats_llm_queue_wait_seconds_total", "Time spent waiting for a limiter slot"),
+            ("prompt_tokens", "ats_llm_prompt_tokens_total", "Prompt tokens billed"),
+            ("completion_tokens", "ats_llm_completion_tokens_total", "Completion tokens billed"),
+            ("cached_tokens", "ats_llm_cached_prompt_tokens_total", "Prompt tokens served from the provider cache"),
+            ("cost_usd", "ats_llm_cost_usd_total", "Estimated API cost in USD"),
+            ("encode_texts", "ats_embedding_texts_total", "Texts passed to the embedding encoder"),
+            ("encode_seconds", "ats_embedding_encode_seconds_total", "Time spent encoding embeddings"),
+            ("coalesced_llm_requests", "ats_llm_coalesced_requests_total",
+             "LLM requests served by an identical request already in flight"),
+            ("coalesced_similarity", "ats_similarity_coalesced_total",
+             "Similarity calls served by an identical computation already in flight"),
+        )
+        for field, name, help_text in counters:
+            family(name, "counter", help_text)
+            for analysis, fields in sorted(analyses.items()):
+                lines.append(f'{name}{{analysis="{analysis}"}} {_format(fields[field])}')
+
+        family("ats_llm_retries_total", "counter", "LLM request retries by reason")
+        for (analysis, reason), count in sorted(retries.items()):
+            lines.append(f'ats_llm_retries_total{{analysis="{analysis}",reason="{reason}"}} {count}')
+
+        for metric in sorted({metric for metric, _ in histograms}):
+            name = f"ats_{metric}_seconds"
+            family(name, "histogram", f"{metric.replace('_', ' ').capitalize()} latency")
+            for (hist_metric, analysis), (buckets, counts, count, total) in sorted(histograms.items()):
+                if hist_metric != metric:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{{analysis="{analysis}",le="{bound}"}} {bucket_count}')
+                lines.append(f'{name}_bucket{{analysis="{analysis}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{analysis="{analysis}"}} {_format(total)}')
+                lines.append(f'{name}_count{{analysis="{analysis}"}} {count}')
+
+        for name, (help_text, value) in (gauges or {}).items():
+            family(name, "gauge", help_text)
+            lines.append(f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._analyses.clear()
+            self._histograms.clear()
+            self._retries.clear()
+            self._started = time.time()
+
+
+def _format(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+class ReportMetrics:
+    """The same per-analysis counters, scoped to one report (for the UI breakdown)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analyses = {}
+
+    def add(self, analysis, **values):
+        with self._lock:
+            fields = self.analyses.setdefault(analysis, _new_fields())
+            for name, value in values.items():
+                fields[name] += value
+
+    def breakdown(self):
+        with self._lock:
+            return {
+                name: {field: round(value, 6) if isinstance(value, float) else value for field, value in fields.items()}
+                for name, fields in self.analyses.items()
+            }
+
+
+registry = MetricsRegistry()
+
+
+# ---------------- RECORDING ----------------
+
+def _add(analysis=None, **values):
+    analysis = analysis or current_analysis.get()
+    registry.add(analysis, **values)
+    report = _current_report.get()
+    if report is not None:
+        report.add(analysis, **values)
+
+
+@contextmanager
+def analysis_scope(analysis):
+    """Attributes everything recorded inside to `analysis` and records its wall time and errors."""
+    token = current_analysis.set(analysis)
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        current_analysis.reset(token)
+        _add(analysis, runs=1, errors=int(failed), seconds=seconds)
+        registry.observe("analysis", analysis, seconds)
+
+
+@contextmanager
+def report_scope():
+    """Collects a ReportMetrics for everything recorded inside (including tasks started inside)."""
+    report = ReportMetrics()
+    token = _current_report.set(report)
+    try:
+        yield report
+    finally:
+        _current_report.reset(token)
+
+
+def record_request(seconds, queue_wait_seconds):
+    """One successful LLM request: time on the wire and time queued for a limiter slot."""
+    _add(llm_requests=1, llm_seconds=seconds, queue_wait_seconds=queue_wait_seconds)
+    analysis = current_analysis.get()
+    registry.observe("llm_request", analysis, seconds)
+    registry.observe("llm_queue_wait", analysis, queue_wait_seconds)
+
+
+def record_usage(prompt_tokens, completion_tokens, cached_tokens, cost_usd):
+    _add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens,
+         cost_usd=cost_usd)
+
+
+def record_retry(reason):
+    analysis = current_analysis.get()
+    registry.count_retry(analysis, reason)
+    report = _current_report.get()
+    if report is not None:
+        report.add(analysis, retries=1)
+
+
+def record_encode(texts, seconds):
+    _add(encode_calls=1, encode_texts=texts, encode_seconds=seconds)
+    registry.observe("embedding_encode", current_analysis.get(), seconds)
+
+
+def record_coalesced(kind):
+    """A call that waited on an identical one in flight instead of running; kind is "llm_requests" or "similarity"."""
+    _add(**{f"coalesced_{kind}": 1})
@@ -1,12 +1,28 @@
+import asyncio
+import weakref
 import requests
+from requests.adapters import HTTPAdapter
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import hashlib
 import base64
+import contextlib
+import contextvars
 import getpass
 import os
+import random
+import threading
+import time
+import keywords
+import metrics
+from cv_sections import diff_sections, parse_cv_sections
+from llm_cache import ResponseCache, cache_key
+from scheduler import TaskGraph
+from singleflight import SingleFlight
+from rate_limit import AdaptiveLimiter, LatencyTracker
+from embeddings import (
+    EmbeddingCache, aggregate_chunk_scores, create_embedding_backend, encode_normalized, split_chunks, text_key, top_k
+)
 
 # ---------------- ENCRYPTION/DECRYPTION ----------------
 
@@ -44,28 +60,629 @@ def initialize_api_key(password=None):
 
 # ---------------- CONFIG ----------------
 
-OPENAI_BASE_URL = "https://api.deepseek.com"
+OPENAI_BASE_URL = os.getenv("ATS_OPENAI_BASE_URL", "https://api.deepseek.com")
 MODEL_NAME = "deepseek-chat"
 
+# Max keep-alive connections kept open to the API (one per concurrent analysis)
+HTTP_POOL_SIZE = int(os.getenv("ATS_HTTP_POOL_SIZE", "16"))
+# Connection cap for the asyncio client, which multiplexes many reports on one loop
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ATS_ASYNC_HTTP_POOL_SIZE", "100"))
+
+# Process-wide cap on concurrent API requests, shared by every session, thread and event loop.
+# It starts at LLM_INITIAL_CONCURRENCY and adapts (AIMD) between 1 and LLM_MAX_CONCURRENCY.
+LLM_MAX_CONCURRENCY = int(os.getenv("ATS_LLM_MAX_CONCURRENCY", "32"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("ATS_LLM_INITIAL_CONCURRENCY", "8"))
+# Token-bucket cap on request starts per second (0 disables it)
+LLM_RATE_LIMIT_RPS = float(os.getenv("ATS_LLM_RATE_LIMIT_RPS", "0"))
+# Retries of a request answered with 429/5xx, with exponential backoff unless Retry-After says otherwise
+LLM_THROTTLE_RETRIES = int(os.getenv("ATS_LLM_THROTTLE_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 30.0
+# Per-request timeouts: connecting, and the longest silence while reading (also between stream chunks)
+LLM_CONNECT_TIMEOUT = float(os.getenv("ATS_LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.getenv("ATS_LLM_READ_TIMEOUT", "120"))
+# Retries of timeouts / dropped connections before a response arrived, with jittered backoff
+LLM_RETRIES = int(os.getenv("ATS_LLM_RETRIES", "2"))
+# Hedged requests (non-streaming calls only): once a call has been in flight longer than the
+# LLM_HEDGE_PERCENTILE latency of recent calls, send a duplicate and keep whichever answers first.
+# LLM_HEDGE_MAX_RATIO caps the share of calls that may hedge, so a general slowdown cannot double the load.
+LLM_HEDGE_ENABLED = os.getenv("ATS_LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("ATS_LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MAX_RATIO = float(os.getenv("ATS_LLM_HEDGE_MAX_RATIO", "0.1"))
+# Threads shared by every report for blocking work (embeddings) run from asyncio
+BLOCKING_WORKERS = int(os.getenv("ATS_BLOCKING_WORKERS", str(min(4, os.cpu_count() or 1))))
+# API prices in USD per million tokens, for the cost estimates in the metrics (deepseek-chat list prices)
+PRICE_INPUT_CACHE_HIT = float(os.getenv("ATS_PRICE_INPUT_CACHE_HIT", "0.07"))
+PRICE_INPUT_CACHE_MISS = float(os.getenv("ATS_PRICE_INPUT_CACHE_MISS", "0.27"))
+PRICE_OUTPUT = float(os.getenv("ATS_PRICE_OUTPUT", "1.10"))
+
+# Opt-in response cache: set ATS_LLM_CACHE=1 or call enable_response_cache()
+LLM_CACHE_ENABLED = os.getenv("ATS_LLM_CACHE", "0") == "1"
+LLM_CACHE_PATH = os.getenv(
+    "ATS_LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "ats-optimizer", "llm_responses.sqlite3")
+)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("ATS_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_DISK_MB = int(os.getenv("ATS_LLM_CACHE_MAX_DISK_MB", "256"))
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# "torch" (SentenceTransformer), "onnx" or "onnx-int8" (ONNX Runtime, CPU)
+EMBEDDING_BACKEND = os.getenv("ATS_EMBEDDING_BACKEND", "torch")
+# Optional pre-exported ONNX graph for the onnx backends (skips the torch export)
+EMBEDDING_ONNX_PATH = os.getenv("ATS_ONNX_MODEL_PATH")
+# Memory budget for cached text embeddings (384 float32 dims = 1.5 KB per text)
+EMBEDDING_CACHE_MB = int(os.getenv("ATS_EMBEDDING_CACHE_MB", "64"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("ATS_EMBEDDING_BATCH_SIZE", "32"))
+# Unix socket of a shared embedding_server.py; when set, no model is loaded in this process
+EMBEDDING_SERVER_SOCKET = os.getenv("ATS_EMBEDDING_SOCKET")
+
+# "full" embeds each document whole (MiniLM only reads its first ~256 tokens);
+# "chunked" embeds every section/window and aggregates with SIMILARITY_CHUNK_AGGREGATE
+SIMILARITY_MODE = os.getenv("ATS_SIMILARITY_MODE", "full")
+SIMILARITY_CHUNK_AGGREGATE = os.getenv("ATS_SIMILARITY_AGGREGATE", "mean_max")
+SIMILARITY_CHUNK_WORDS = int(os.getenv("ATS_SIMILARITY_CHUNK_WORDS", "160"))
+
+# Persistent job-posting index for "best jobs for this CV" (see job_index.py); int8 halves it again
+JD_INDEX_PATH = os.getenv(
+    "ATS_JD_INDEX_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "ats-optimizer", "jd_index")
+)
+JD_INDEX_DTYPE = os.getenv("ATS_JD_INDEX_DTYPE", "float16")
+
+# Keyword extraction: "llm" (categorized analysis from the API) or "local" (TF-IDF + synonyms, no API call)
+KEYWORD_ENGINES = ("llm", "local")
+KEYWORD_ENGINE = os.getenv("ATS_KEYWORD_ENGINE", "llm")
+KEYWORDS_TOP_N = int(os.getenv("ATS_KEYWORDS_TOP_N", "30"))
+
+# Per-posting reports in flight at once when one CV is run against many postings
+MULTI_REPORT_CONCURRENCY = int(os.getenv("ATS_MULTI_REPORT_CONCURRENCY", "4"))
+
 # API_KEY will be initialized via initialize_api_key() function
 # This allows it to be set from Streamlit or command line
 API_KEY = None
 HEADERS = None
 
-# Try to initialize from environment or command line if not in Streamlit
-if os.getenv('STREAMLIT') is None:
+_api_key_lock = threading.Lock()
+
+
+def _auth_headers(prompt=True):
+    """Returns HEADERS, asking for the password on the first LLM call outside Streamlit.
+
+    The async calls pass prompt=False: a getpass prompt would block their event loop, so they
+    fail instead until the entry point has called initialize_api_key().
+    """
+    if HEADERS is None and not prompt:
+        raise RuntimeError(
+            "API_KEY sin inicializar: llama a initialize_api_key() antes de los análisis async "
+            "(en batch.py y server.py, con --password o ATS_PASSWORD)"
+        )
+    if HEADERS is None and os.getenv('STREAMLIT') is None:
+        with _api_key_lock:
+            if HEADERS is None:
+                initialize_api_key()
+    return HEADERS
+
+
+# The embedding backend (and torch/onnxruntime behind it) is loaded on first use, see get_embedding_model()
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+embedding_cache = EmbeddingCache(max_bytes=EMBEDDING_CACHE_MB * 1024 * 1024)
+
+
+def get_embedding_model():
+    """Returns the shared embedding backend selected by EMBEDDING_BACKEND, loading it on the first call.
+
+    With EMBEDDING_SERVER_SOCKET set it is a client of that embedding server instead.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                if EMBEDDING_SERVER_SOCKET:
+                    from embedding_server import RemoteEmbeddingBackend
+                    _embedding_model = RemoteEmbeddingBackend(EMBEDDING_SERVER_SOCKET)
+                else:
+                    _embedding_model = create_embedding_backend(
+                        EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, onnx_path=EMBEDDING_ONNX_PATH
+                    )
+    return _embedding_model
+
+
+def __getattr__(name):
+    # Keeps `optimizer.embedding_model` working without loading the model at import time
+    if name == "embedding_model":
+        return get_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ---------------- HTTP CLIENT ----------------
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def _new_http_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_http_session():
+    """Returns the process-wide pooled keep-alive session shared by every LLM call."""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                _http_session = _new_http_session(HTTP_POOL_SIZE)
+    return _http_session
+
+
+def configure_http_pool(pool_size=None):
+    """Replaces the shared session with a new one holding up to pool_size connections per host."""
+    global _http_session, HTTP_POOL_SIZE
+    with _http_session_lock:
+        if pool_size is not None:
+            HTTP_POOL_SIZE = pool_size
+        old_session, _http_session = _http_session, _new_http_session(HTTP_POOL_SIZE)
+    if old_session is not None:
+        old_session.close()
+
+
+def get_connection_stats():
+    """Returns how many connections the shared pool opened and how many requests reused one."""
+    stats = {"connections_opened": 0, "requests_sent": 0, "connections_reused": 0}
+    session = _http_session
+    if session is None:
+        return stats
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["connections_opened"] += pool.num_connections
+            stats["requests_sent"] += pool.num_requests
+    stats["connections_reused"] = max(stats["requests_sent"] - stats["connections_opened"], 0)
+    return stats
+
+
+# ---------------- WARM-UP ----------------
+
+def warm_up(load_model=True, connect=True, loop=None):
+    """Pays the lazy start-up costs up front; a server can call it at boot.
+
+    Loads the embedding model (and runs one encode so its kernels are initialised) and
+    opens a keep-alive connection to the API. The connection goes to the sync HTTP pool, or,
+    given the long-lived event loop that will serve the async calls, to that loop's
+    AsyncClient (clients are per loop, so warming any other loop would not help).
+    Returns seconds spent per step.
+    """
+    timings = {}
+    if load_model:
+        started = time.perf_counter()
+        get_embedding_model().encode(["warm up"])
+        timings["embedding_model"] = time.perf_counter() - started
+    if connect:
+        started = time.perf_counter()
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(_connect_async_client(), loop).result()
+        else:
+            try:
+                get_http_session().head(OPENAI_BASE_URL, timeout=5)
+            except requests.RequestException:
+                pass  # The first real call will connect instead
+        timings["http_pool"] = time.perf_counter() - started
+    return timings
+
+
+async def _connect_async_client():
+    import httpx
     try:
-        initialize_api_key()
-    except:
-        pass  # Will be initialized later
-
-# Load embedding model once
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        await get_async_http_client().head(OPENAI_BASE_URL, timeout=5)
+    except httpx.HTTPError:
+        pass  # The first real call will connect instead
+
+
+# ---------------- RESPONSE CACHE ----------------
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def enable_response_cache(path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                          max_disk_mb=LLM_CACHE_MAX_DISK_MB, max_memory_mb=32):
+    """Turns on the LLM response cache; path=None keeps it in memory only."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        _response_cache = ResponseCache(
+            path,
+            max_memory_bytes=max_memory_mb * 1024 * 1024,
+            max_disk_bytes=max_disk_mb * 1024 * 1024,
+            ttl_seconds=ttl_seconds
+        )
+    return _response_cache
+
+
+def disable_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        _response_cache = None
+
+
+def get_response_cache():
+    """Returns the active response cache, or None when caching is off."""
+    global _response_cache
+    if _response_cache is None and LLM_CACHE_ENABLED:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    LLM_CACHE_PATH,
+                    max_disk_bytes=LLM_CACHE_MAX_DISK_MB * 1024 * 1024,
+                    ttl_seconds=LLM_CACHE_TTL_SECONDS
+                )
+    return _response_cache
+
+
+def _cache_lookup(system_prompt, user_prompt, model_name, temperature, json_mode=False, max_tokens=None):
+    """Returns (cache, key, cached_text); cache and key are None when caching is off."""
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None
+    key = cache_key(model_name, system_prompt, user_prompt, temperature, json_mode, max_tokens)
+    return cache, key, cache.get(key)
+
+
+# ---------------- REQUEST LIMITER ----------------
+
+class LLMHTTPError(RuntimeError):
+    """The API answered with an HTTP error status."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"Error {status_code} de la API: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# Statuses that mean "overloaded, try again later": they shrink the concurrency limit and are retried
+_THROTTLE_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+_llm_limiter = None
+_llm_limiter_lock = threading.Lock()
+_blocking_executor = None
+_blocking_executor_lock = threading.Lock()
+
+
+def get_llm_limiter():
+    """Returns the process-wide AdaptiveLimiter every API request goes through."""
+    global _llm_limiter
+    if _llm_limiter is None:
+        with _llm_limiter_lock:
+            if _llm_limiter is None:
+                _llm_limiter = AdaptiveLimiter(
+                    initial_limit=min(LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY),
+                    max_limit=LLM_MAX_CONCURRENCY,
+                    rate=LLM_RATE_LIMIT_RPS or None
+                )
+    return _llm_limiter
+
+
+def configure_llm_limiter(max_concurrency=None, initial_concurrency=None, rate_limit_rps=None):
+    """Replaces the shared limiter; requests already holding a slot finish on the old one."""
+    global _llm_limiter, LLM_MAX_CONCURRENCY, LLM_INITIAL_CONCURRENCY, LLM_RATE_LIMIT_RPS
+    with _llm_limiter_lock:
+        if max_concurrency is not None:
+            LLM_MAX_CONCURRENCY = max_concurrency
+        if initial_concurrency is not None:
+            LLM_INITIAL_CONCURRENCY = initial_concurrency
+        if rate_limit_rps is not None:
+            LLM_RATE_LIMIT_RPS = rate_limit_rps
+        _llm_limiter = None
+    return get_llm_limiter()
+
+
+def get_llm_limiter_stats():
+    """Concurrency limit, in-flight requests, queue depth and queue wait times of the shared limiter."""
+    return get_llm_limiter().stats()
+
+
+def get_blocking_executor():
+    """Returns the process-wide thread pool for blocking work started from asyncio code."""
+    global _blocking_executor
+    if _blocking_executor is None:
+        with _blocking_executor_lock:
+            if _blocking_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _blocking_executor = ThreadPoolExecutor(
+                    max_workers=BLOCKING_WORKERS, thread_name_prefix="ats-blocking"
+                )
+    return _blocking_executor
+
+
+def _response_error(response):
+    """Returns an LLMHTTPError for an error response (requests or httpx), else None."""
+    if response.status_code < 400:
+        return None
+    retry_after = response.headers.get("Retry-After")
+    try:
+        retry_after = float(retry_after) if retry_after is not None else None
+    except ValueError:
+        retry_after = None  # HTTP-date form: fall back to exponential backoff
+    return LLMHTTPError(response.status_code, response.text[:500], retry_after)
+
+
+def _backoff_seconds(error, attempt):
+    """Retry-After when the server sent one, else full-jitter exponential backoff."""
+    if error is not None and error.retry_after is not None:
+        return min(error.retry_after, LLM_BACKOFF_MAX_SECONDS)
+    # Random spread so requests that failed together do not all retry in the same instant
+    return random.uniform(0, min(LLM_BACKOFF_BASE_SECONDS * 2 ** attempt, LLM_BACKOFF_MAX_SECONDS))
+
+
+def _release_throttled(limiter, error, attempt):
+    """Releases a slot after an error response; returns the backoff delay, or None if not retryable."""
+    if error.status_code not in _THROTTLE_STATUSES:
+        limiter.release("error")
+        return None
+    delay = _backoff_seconds(error, attempt)
+    # A 429 is account-wide, so hold back every request; a 5xx only delays its own retry
+    limiter.release("throttled", pause_seconds=delay if error.status_code == 429 else None)
+    if attempt >= LLM_THROTTLE_RETRIES:
+        return None
+    metrics.record_retry("throttled_429" if error.status_code == 429 else "server_5xx")
+    return delay
+
+
+def _release_transient(limiter, timed_out, retries):
+    """Releases a slot after a timeout / connection failure; returns the backoff delay, or None to give up."""
+    # A timeout hints at an overloaded API; a refused or reset connection says nothing about load
+    limiter.release("throttled" if timed_out else "error")
+    with _latency_lock:
+        _latency_counters["timeouts" if timed_out else "connection_errors"] += 1
+    if retries >= LLM_RETRIES:
+        return None
+    with _latency_lock:
+        _latency_counters["retries"] += 1
+    metrics.record_retry("timeout" if timed_out else "connection")
+    return _backoff_seconds(None, retries)
+
+
+def _send_limited(send, hold=False, on_acquired=None):
+    """Runs send() under a limiter slot, retrying 429/5xx answers and transient network errors.
+
+    Returns the successful response. With hold=True its slot is kept for the caller to
+    release once the body is consumed (streams); otherwise it is released as "ok".
+    on_acquired() is called each time a slot is taken, right before the request goes out.
+    """
+    limiter = get_llm_limiter()
+    attempt = retries = 0
+    queue_wait = 0.0
+    while True:
+        queue_wait += limiter.acquire()
+        if on_acquired is not None:
+            on_acquired()
+        started = time.perf_counter()
+        try:
+            response = send()
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            delay = _release_transient(limiter, isinstance(e, requests.exceptions.Timeout), retries)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            retries += 1
+            continue
+        except BaseException:
+            limiter.release("error")
+            raise
+        error = _response_error(response)
+        if error is None:
+            # For held streams this is the time to the response headers
+            metrics.record_request(time.perf_counter() - started, queue_wait)
+            if not hold:
+                _llm_latency.record(time.perf_counter() - started)
+                limiter.release("ok")
+            return response
+        response.close()
+        delay = _release_throttled(limiter, error, attempt)
+        if delay is None:
+            raise error
+        if error.status_code != 429:
+            time.sleep(delay)
+        attempt += 1
+
+
+async def _send_limited_async(send, hold=False, on_acquired=None):
+    """Async counterpart of _send_limited; send is a coroutine function returning an httpx response."""
+    import httpx
+    limiter = get_llm_limiter()
+    attempt = retries = 0
+    queue_wait = 0.0
+    while True:
+        queue_wait += await limiter.acquire_async()
+        if on_acquired is not None:
+            on_acquired()
+        started = time.perf_counter()
+        try:
+            response = await send()
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+            delay = _release_transient(limiter, isinstance(e, httpx.TimeoutException), retries)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            retries += 1
+            continue
+        except BaseException:
+            limiter.release("error")
+            raise
+        if response.status_code >= 400:
+            await response.aread()
+        error = _response_error(response)
+        if error is None:
+            # For held streams this is the time to the response headers
+            metrics.record_request(time.perf_counter() - started, queue_wait)
+            if not hold:
+                _llm_latency.record(time.perf_counter() - started)
+                limiter.release("ok")
+            return response
+        await response.aclose()
+        delay = _release_throttled(limiter, error, attempt)
+        if delay is None:
+            raise error
+        if error.status_code != 429:
+            await asyncio.sleep(delay)
+        attempt += 1
+
+
+# ---------------- HEDGED REQUESTS ----------------
+
+# Latencies of recent successful non-streaming requests (slot taken -> body received)
+_llm_latency = LatencyTracker()
+_latency_lock = threading.Lock()
+_latency_counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "connection_errors": 0, "retries": 0}
+_hedge_executor = None
+
+
+def _hedge_delay():
+    """Seconds after which a call may send its hedge, or None when hedging is off or not warmed up."""
+    with _latency_lock:
+        _latency_counters["calls"] += 1
+    if not LLM_HEDGE_ENABLED:
+        return None
+    return _llm_latency.percentile(LLM_HEDGE_PERCENTILE)
+
+
+def _take_hedge_budget():
+    with _latency_lock:
+        if _latency_counters["hedged"] >= LLM_HEDGE_MAX_RATIO * _latency_counters["calls"]:
+            return False
+        _latency_counters["hedged"] += 1
+        return True
+
+
+def _count_hedge_win():
+    with _latency_lock:
+        _latency_counters["hedge_wins"] += 1
+
+
+def get_latency_stats():
+    """Recent request latency percentiles plus hedge, timeout and retry counters."""
+    with _latency_lock:
+        stats = dict(_latency_counters)
+    stats["samples"] = len(_llm_latency)
+    for q in (50, 95, 99):
+        value = _llm_latency.percentile(q)
+        stats[f"p{q}_seconds"] = round(value, 3) if value is not None else None
+    return stats
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _latency_lock:
+            if _hedge_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * LLM_MAX_CONCURRENCY, thread_name_prefix="ats-hedge"
+                )
+    return _hedge_executor
+
+
+def _send_hedged(send):
+    """_send_limited with a duplicate request once the first is slower than the hedge delay.
+
+    A blocking request cannot be interrupted, so the losing one finishes in the background.
+    """
+    delay = _hedge_delay()
+    if delay is None:
+        return _send_limited(send)
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    executor = _get_hedge_executor()
+    in_flight = threading.Event()
+    # Each request runs in a copy of the caller's context so its metrics keep the analysis label
+    primary = executor.submit(contextvars.copy_context().run, _send_limited, send, on_acquired=in_flight.set)
+    # Time the hedge from when the request went out, not from when it joined the limiter queue
+    in_flight.wait()
+    done, _ = wait([primary], timeout=delay)
+    if done or not _take_hedge_budget():
+        return primary.result()
+    hedge = executor.submit(contextvars.copy_context().run, _send_limited, send)
+    pending = {primary, hedge}
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _count_hedge_win()
+                return future.result()
+        if not pending:
+            return primary.result()  # Both failed: raise the primary's error
+
+
+async def _send_hedged_async(send):
+    """Async _send_limited with hedging; the slower request is cancelled once one succeeds."""
+    delay = _hedge_delay()
+    if delay is None:
+        return await _send_limited_async(send)
+
+    in_flight = asyncio.Event()
+    primary = asyncio.ensure_future(_send_limited_async(send, on_acquired=in_flight.set))
+    tasks = {primary}
+    try:
+        # Time the hedge from when the request went out, not from when it joined the limiter queue
+        await in_flight.wait()
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not _take_hedge_budget():
+            return await primary
+        hedge = asyncio.ensure_future(_send_limited_async(send))
+        tasks.add(hedge)
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _count_hedge_win()
+                    return task.result()
+            if not pending:
+                return await primary
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+# ---------------- IN-FLIGHT COALESCING ----------------
+
+# Concurrent identical LLM requests / similarity computations wait on the one already running.
+# Streamed calls are never coalesced, and app.py always streams, so the LLM side only pays off
+# for the non-streaming server and batch jobs.
+_llm_flights = SingleFlight(on_coalesced=lambda: metrics.record_coalesced("llm_requests"))
+_similarity_flights = SingleFlight(on_coalesced=lambda: metrics.record_coalesced("similarity"))
+
+
+def _llm_flight_key(system_prompt, user_prompt, model_name, temperature, json_mode=False, max_tokens=None):
+    return cache_key(model_name, system_prompt, user_prompt, temperature, json_mode, max_tokens)
+
+
+def get_coalescing_stats():
+    """Calls, executions and coalesced waiters of the single-flight layers around the API and similarity."""
+    return {"llm": _llm_flights.stats(), "similarity": _similarity_flights.stats()}
 
 
 # ---------------- LLM CALL ----------------
 
-def call_llm(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3):
+def _chat_payload(system_prompt, user_prompt, model_name, temperature, stream=False, json_mode=False, max_tokens=None):
     payload = {
         "model": model_name,
         "messages": [
@@ -74,14 +691,329 @@ def call_llm(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3)
         ],
         "temperature": temperature
     }
+    if stream:
+        payload["stream"] = True
+        # Ask for the final usage chunk so streamed calls report cache-hit tokens too
+        payload["stream_options"] = {"include_usage": True}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    return payload
+
+
+def _sse_event(line):
+    """Parses one server-sent-events line; returns its JSON payload, {} for non-data lines, None at [DONE]."""
+    if not line or not line.startswith("data:"):
+        return {}
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    return json.loads(data)
+
+
+def _sse_delta(event):
+    """Text delta carried by one parsed SSE event ("" when it has none)."""
+    choices = event.get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+# ---------------- TOKEN USAGE ----------------
+
+_usage_lock = threading.Lock()
+_usage_totals = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "prompt_cache_hit_tokens": 0,
+    "prompt_cache_miss_tokens": 0,
+}
+
+
+def _record_usage(usage):
+    """Adds the `usage` block of one completion to the process-wide totals."""
+    if not usage:
+        return
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    # DeepSeek reports prompt_cache_hit_tokens; OpenAI-style APIs nest cached_tokens instead
+    hit = usage.get("prompt_cache_hit_tokens")
+    if hit is None:
+        hit = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    miss = usage.get("prompt_cache_miss_tokens")
+    if miss is None:
+        miss = max(prompt_tokens - hit, 0)
+    completion_tokens = usage.get("completion_tokens") or 0
+    with _usage_lock:
+        _usage_totals["requests"] += 1
+        _usage_totals["prompt_tokens"] += prompt_tokens
+        _usage_totals["completion_tokens"] += completion_tokens
+        _usage_totals["prompt_cache_hit_tokens"] += hit
+        _usage_totals["prompt_cache_miss_tokens"] += miss
+    cost = (hit * PRICE_INPUT_CACHE_HIT + miss * PRICE_INPUT_CACHE_MISS + completion_tokens * PRICE_OUTPUT) / 1e6
+    metrics.record_usage(prompt_tokens, completion_tokens, hit, cost)
+
+
+def get_usage_stats():
+    """Token totals of the API calls made so far, plus the share of prompt tokens served from the context cache."""
+    with _usage_lock:
+        stats = dict(_usage_totals)
+    cached = stats["prompt_cache_hit_tokens"] + stats["prompt_cache_miss_tokens"]
+    stats["prompt_cache_hit_ratio"] = round(stats["prompt_cache_hit_tokens"] / cached, 4) if cached else 0.0
+    return stats
+
+
+def reset_usage_stats():
+    with _usage_lock:
+        for name in _usage_totals:
+            _usage_totals[name] = 0
+
+
+def get_metrics_snapshot():
+    """Per-analysis latency, queue wait, token, retry, encode and cost metrics as a JSON-ready dict."""
+    snapshot = metrics.registry.snapshot()
+    snapshot["llm_limiter"] = get_llm_limiter_stats()
+    snapshot["latency"] = get_latency_stats()
+    snapshot["coalescing"] = get_coalescing_stats()
+    return snapshot
+
+
+def get_metrics_prometheus():
+    """The same metrics in the Prometheus text exposition format, plus request limiter gauges."""
+    limiter = get_llm_limiter_stats()
+    return metrics.registry.prometheus_text({
+        "ats_llm_concurrency_limit": ("Current adaptive concurrency limit", limiter["limit"]),
+        "ats_llm_in_flight": ("API requests holding a limiter slot", limiter["in_flight"]),
+        "ats_llm_queue_depth": ("API requests waiting for a limiter slot", limiter["queue_depth"]),
+        "ats_llm_coalesced_in_flight": ("Distinct API requests other callers are waiting on", get_coalescing_stats()["llm"]["in_flight"]),
+    })
+
+
+def call_llm(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3, stream=False, json_mode=False,
+             max_tokens=None):
+    """Returns the completion text, or with stream=True a generator of text deltas.
+
+    json_mode asks the API for a single JSON object (the prompt must mention JSON).
+    """
+    if stream:
+        return stream_llm(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens)
+    # Identical requests already in flight (same posting submitted by many users) share one API call
+    return _llm_flights.do(
+        _llm_flight_key(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens),
+        _call_llm, system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens
+    )
+
+
+def _call_llm(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens):
+    cache, key, cached = _cache_lookup(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens)
+    if cached is not None:
+        return cached
+
+    payload = _chat_payload(system_prompt, user_prompt, model_name, temperature, json_mode=json_mode, max_tokens=max_tokens)
+
+    response = _send_hedged(lambda: get_http_session().post(
+        f"{OPENAI_BASE_URL}/v1/chat/completions",
+        headers=_auth_headers(),
+        json=payload,
+        timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+    ))
+
+    body = response.json()
+    _record_usage(body.get("usage"))
+    content = body["choices"][0]["message"]["content"]
+    if cache is not None:
+        cache.set(key, content)
+    return content
+
+
+def stream_llm(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3, json_mode=False, max_tokens=None):
+    """Yields completion text deltas as the API streams them (SSE).
+
+    Streams are not coalesced: a waiter would only get the text once the whole stream ended.
+    """
+    cache, key, cached = _cache_lookup(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens)
+    if cached is not None:
+        yield cached
+        return
+
+    payload = _chat_payload(system_prompt, user_prompt, model_name, temperature, stream=True, json_mode=json_mode,
+                            max_tokens=max_tokens)
+    parts = []
+
+    response = _send_limited(lambda: get_http_session().post(
+        f"{OPENAI_BASE_URL}/v1/chat/completions",
+        headers=_auth_headers(),
+        json=payload,
+        stream=True,
+        timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+    ), hold=True)
+    # The limiter slot stays taken until the stream is drained (or abandoned)
+    outcome = "error"
+    try:
+        with response:
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                event = _sse_event(line)
+                if event is None:
+                    break
+                _record_usage(event.get("usage"))
+                delta = _sse_delta(event)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        outcome = "ok"
+    finally:
+        get_llm_limiter().release(outcome)
+
+    if cache is not None:
+        cache.set(key, "".join(parts))
+
+
+# ---------------- ASYNC LLM CALL ----------------
+
+# httpx.AsyncClient connections are bound to the loop that opened them, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client():
+    """Returns the pooled keep-alive AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+        limits = httpx.Limits(
+            max_connections=ASYNC_HTTP_POOL_SIZE,
+            max_keepalive_connections=ASYNC_HTTP_POOL_SIZE
+        )
+        timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT, pool=None)
+        client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """Closes the AsyncClient of the running loop; call it before the loop shuts down."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def call_llm_async(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3, json_mode=False,
+                         max_tokens=None):
+    return await _llm_flights.do_async(
+        _llm_flight_key(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens),
+        _call_llm_async, system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens
+    )
+
 
-    response = requests.post(
+async def _call_llm_async(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens):
+    cache, key, cached = _cache_lookup(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens)
+    if cached is not None:
+        return cached
+
+    payload = _chat_payload(system_prompt, user_prompt, model_name, temperature, json_mode=json_mode, max_tokens=max_tokens)
+    headers = _auth_headers(prompt=False)
+
+    response = await _send_hedged_async(lambda: get_async_http_client().post(
+        f"{OPENAI_BASE_URL}/v1/chat/completions",
+        headers=headers,
+        json=payload
+    ))
+
+    body = response.json()
+    _record_usage(body.get("usage"))
+    content = body["choices"][0]["message"]["content"]
+    if cache is not None:
+        cache.set(key, content)
+    return content
+
+
+async def stream_llm_async(system_prompt, user_prompt, model_name=MODEL_NAME, temperature=0.3, json_mode=False,
+                           max_tokens=None):
+    """Async generator of completion text deltas (SSE); not coalesced, see stream_llm."""
+    cache, key, cached = _cache_lookup(system_prompt, user_prompt, model_name, temperature, json_mode, max_tokens)
+    if cached is not None:
+        yield cached
+        return
+
+    payload = _chat_payload(system_prompt, user_prompt, model_name, temperature, stream=True, json_mode=json_mode,
+                            max_tokens=max_tokens)
+    parts = []
+
+    client = get_async_http_client()
+    request = client.build_request(
+        "POST",
         f"{OPENAI_BASE_URL}/v1/chat/completions",
-        headers=HEADERS,
+        headers=_auth_headers(prompt=False),
         json=payload
     )
+    response = await _send_limited_async(lambda: client.send(request, stream=True), hold=True)
+    outcome = "error"
+    try:
+        async for line in response.aiter_lines():
+            event = _sse_event(line)
+            if event is None:
+                break
+            _record_usage(event.get("usage"))
+            delta = _sse_delta(event)
+            if delta:
+                parts.append(delta)
+                yield delta
+        outcome = "ok"
+    finally:
+        await response.aclose()
+        get_llm_limiter().release(outcome)
+
+    if cache is not None:
+        cache.set(key, "".join(parts))
+
+
+def _analysis_scope(analysis):
+    """Times the block and labels its metrics as `analysis`; no-op when None (caller already scoped)."""
+    return metrics.analysis_scope(analysis) if analysis else contextlib.nullcontext()
+
+
+def _run_prompts(prompts, analysis=None):
+    system_prompt, user_prompt, temperature = prompts
+    with _analysis_scope(analysis):
+        return call_llm(system_prompt, user_prompt, temperature=temperature)
+
+
+async def _run_prompts_async(prompts, on_delta=None, analysis=None):
+    system_prompt, user_prompt, temperature = prompts
+    with _analysis_scope(analysis):
+        if on_delta is None:
+            return await call_llm_async(system_prompt, user_prompt, temperature=temperature)
+        parts = []
+        async for delta in stream_llm_async(system_prompt, user_prompt, temperature=temperature):
+            parts.append(delta)
+            on_delta(delta)
+        return "".join(parts)
+
 
-    return response.json()["choices"][0]["message"]["content"]
+# ---------------- PROMPT LAYOUT ----------------
+#
+# The documents go in the system message, identical for every analysis of the same CV/JD
+# pair; the per-analysis role and instructions follow in the user message. All calls of a
+# report therefore share one long prompt prefix that the provider's context cache
+# (DeepSeek bills those tokens as prompt_cache_hit_tokens) serves after the first call.
+
+_DOCUMENT_PREAMBLE = """You are assisting with an ATS (Applicant Tracking System) resume optimization report.
+The documents under review are provided below. The user message assigns your role and the analysis to perform; follow its instructions and output format exactly."""
+
+
+def _document_context(cv_text=None, job_description=None):
+    """Shared system message: a fixed preamble, then the job description, then the resume."""
+    parts = [_DOCUMENT_PREAMBLE]
+    if job_description is not None:
+        parts.append(f"JOB DESCRIPTION:\n{job_description}")
+    if cv_text is not None:
+        parts.append(f"CANDIDATE RESUME:\n{cv_text}")
+    return "\n\n".join(parts)
+
+
+def _task_prompt(role, instructions):
+    """Per-analysis user message: the role the model plays, then the task itself."""
+    return f"{role}\n\n{instructions}"
 
 
 # ---------------- LANGUAGE HELPER ----------------
@@ -95,12 +1027,12 @@ def _language_instruction(language):
 
 # ---------------- KEYWORD EXTRACTION (OPTIMIZED) ----------------
 
-def extract_keywords(job_description, language="es"):
-    system_prompt = """You are an expert HR analyst and ATS specialist with 15+ years of experience in talent acquisition across all industries. 
+def _extract_keywords_prompts(job_description, language="es"):
+    role = """You are an expert HR analyst and ATS specialist with 15+ years of experience in talent acquisition across all industries. 
     Your expertise includes understanding how Applicant Tracking Systems parse and rank resumes based on keyword matching.
     You excel at identifying critical skills, competencies, certifications, and requirements that hiring managers prioritize, regardless of the field (HR, administration, sales, operations, etc.)."""
 
-    user_prompt = f"""Analyze the following job description and extract ALL critical keywords and requirements that an ATS system would prioritize.
+    instructions = f"""Analyze the job description provided above and extract ALL critical keywords and requirements that an ATS system would prioritize.
 
     Extract and categorize:
     1. **Hard Skills & Technical Competencies**: Specific skills, software tools, systems, methodologies, or technical knowledge required (e.g., HRIS systems, payroll software, recruitment platforms, data analysis tools, etc.)
@@ -111,30 +1043,167 @@ def extract_keywords(job_description, language="es"):
 
     Format your response as a structured list with clear categories. Be comprehensive and include variations of terms (e.g., "recruitment" and "talent acquisition", "HRIS" and "Human Resources Information System").
 
-    JOB DESCRIPTION:
-    {job_description}
-
     Provide a detailed, categorized list of all relevant keywords and requirements. Adapt your analysis to the specific field and role described.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.2)
+    return _document_context(job_description=job_description), _task_prompt(role, instructions), 0.2
+
+
+def _local_keywords(job_description, language):
+    with metrics.analysis_scope("keywords"):
+        return keywords.keywords_markdown(keywords.extract_keywords_local(job_description, KEYWORDS_TOP_N), language)
+
+
+def _check_keyword_engine(engine):
+    if engine not in KEYWORD_ENGINES:
+        raise ValueError(f"Motor de keywords desconocido: {engine!r} (opciones: {', '.join(KEYWORD_ENGINES)})")
+    return engine
+
+
+def extract_keywords(job_description, language="es", engine=None):
+    """Keyword analysis as markdown; engine="local" (or ATS_KEYWORD_ENGINE=local) skips the API call."""
+    if _check_keyword_engine(engine or KEYWORD_ENGINE) == "local":
+        return _local_keywords(job_description, language)
+    return _run_prompts(_extract_keywords_prompts(job_description, language), analysis="keywords")
+
+
+async def extract_keywords_async(job_description, language="es", engine=None):
+    if _check_keyword_engine(engine or KEYWORD_ENGINE) == "local":
+        return _local_keywords(job_description, language)
+    return await _run_prompts_async(_extract_keywords_prompts(job_description, language), analysis="keywords")
+
+
+def keyword_coverage(cv_text, job_description):
+    """Weighted share (0-100) of the job description's keywords present in the CV, computed locally."""
+    return keywords.keyword_coverage(cv_text, job_description, top_n=KEYWORDS_TOP_N)
+
+
+def compare_keyword_coverage(cv_text, optimized_cv_text, job_description):
+    """Keyword coverage before and after a rewrite, with the keywords gained and lost."""
+    return keywords.compare_coverage(cv_text, optimized_cv_text, job_description, top_n=KEYWORDS_TOP_N)
 
 
 # ---------------- SIMILARITY SCORE ----------------
 
-def calculate_similarity(cv_text, job_description):
-    embeddings = embedding_model.encode([cv_text, job_description])
-    score = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
+def calculate_similarity(cv_text, job_description, mode=None):
+    mode = mode or SIMILARITY_MODE
+    return _similarity_flights.do((mode, cv_text, job_description), _calculate_similarity, cv_text, job_description, mode)
+
+
+def _calculate_similarity(cv_text, job_description, mode):
+    if mode == "chunked":
+        return calculate_chunked_similarity(cv_text, job_description)
+    # Cached vectors are unit length, so the cosine is a plain dot product
+    model = get_embedding_model()
+    started = time.perf_counter()
+    embeddings = encode_normalized(model, model.cache_name, [cv_text, job_description], embedding_cache)
+    metrics.record_encode(2, time.perf_counter() - started)
+    score = float(np.dot(embeddings[0], embeddings[1]))
     return round(score * 100, 2)
 
 
+def calculate_chunked_similarity(cv_text, job_description, aggregate=None, max_words=None):
+    """Similarity over all sections of both documents instead of just their first ~256 tokens.
+
+    Every chunk of both texts goes through one batched, cached encode pass, so repeat calls on
+    a long document only pay for the chunks that changed.
+    """
+    max_words = max_words or SIMILARITY_CHUNK_WORDS
+    cv_chunks = split_chunks(cv_text, max_words)
+    jd_chunks = split_chunks(job_description, max_words)
+    model = get_embedding_model()
+    started = time.perf_counter()
+    embeddings = encode_normalized(model, model.cache_name, cv_chunks + jd_chunks, embedding_cache, EMBEDDING_BATCH_SIZE)
+    metrics.record_encode(len(cv_chunks) + len(jd_chunks), time.perf_counter() - started)
+    scores = embeddings[:len(cv_chunks)] @ embeddings[len(cv_chunks):].T
+    score = aggregate_chunk_scores(scores, aggregate or SIMILARITY_CHUNK_AGGREGATE)
+    return round(score * 100, 2)
+
+
+def calculate_similarity_matrix(cv_texts, job_descriptions, batch_size=EMBEDDING_BATCH_SIZE, top_k_per_cv=None):
+    """Scores every CV against every JD with one encode pass over the unique texts.
+
+    Returns an (n_cvs, n_jds) float32 matrix in the same 0-100 scale as calculate_similarity.
+    With top_k_per_cv, returns (matrix, indices, scores) where row i lists the best JDs for CV i.
+    """
+    cv_texts, job_descriptions = list(cv_texts), list(job_descriptions)
+    model = get_embedding_model()
+    started = time.perf_counter()
+    embeddings = encode_normalized(model, model.cache_name, cv_texts + job_descriptions, embedding_cache, batch_size)
+    metrics.record_encode(len(cv_texts) + len(job_descriptions), time.perf_counter() - started)
+    cv_embeddings, jd_embeddings = embeddings[:len(cv_texts)], embeddings[len(cv_texts):]
+    if not cv_texts or not job_descriptions:
+        scores = np.zeros((len(cv_texts), len(job_descriptions)), dtype=np.float32)
+    else:
+        scores = np.round(cv_embeddings @ jd_embeddings.T * 100, 2).astype(np.float32)
+    if top_k_per_cv is None:
+        return scores
+    indices, best = top_k(scores, top_k_per_cv)
+    return scores, indices, best
+
+
+def open_job_index(path=None, dtype=None):
+    """Opens (or creates) the job-posting index for the current embedding model."""
+    from job_index import JobIndex
+    model = get_embedding_model()
+    return JobIndex(path or JD_INDEX_PATH, dtype=dtype or JD_INDEX_DTYPE, model_name=model.cache_name)
+
+
+def index_job_descriptions(index, jobs, batch_size=EMBEDDING_BATCH_SIZE, chunk_size=1024):
+    """Embeds and adds (job_id, text, metadata) tuples to a JobIndex; returns how many were added.
+
+    Postings are encoded chunk_size at a time and bypass embedding_cache, so indexing a large
+    collection neither holds it all in memory nor evicts the vectors of live reports.
+    """
+    from itertools import islice
+    model = get_embedding_model()
+    jobs = iter(jobs)
+    added = 0
+    while True:
+        chunk = list(islice(jobs, chunk_size))
+        if not chunk:
+            return added
+        job_ids, texts, metadata = zip(*chunk)
+        started = time.perf_counter()
+        vectors = encode_normalized(model, model.cache_name, list(texts), None, batch_size)
+        metrics.record_encode(len(texts), time.perf_counter() - started)
+        added += index.add(job_ids, vectors, metadata)
+
+
+def best_jobs_for_cv(cv_text, k=10, index=None, min_score=None):
+    """Top-k indexed job postings for a CV: [{"job_id", "score", "metadata"}], score 0-100.
+
+    One encode of the CV, then a scan of the memory-mapped index; no per-posting model call.
+    """
+    index = index or open_job_index()
+    model = get_embedding_model()
+    started = time.perf_counter()
+    query = encode_normalized(model, model.cache_name, [cv_text], embedding_cache)[0]
+    metrics.record_encode(1, time.perf_counter() - started)
+    return index.search(query, k, min_score=min_score)
+
+
+async def calculate_similarity_async(cv_text, job_description, mode=None):
+    # Encoding is CPU-bound; keep it off the event loop (in a copy of this context, for the metrics labels).
+    # Waiters on an identical computation await it here instead of holding an executor thread.
+    mode = mode or SIMILARITY_MODE
+    loop = asyncio.get_running_loop()
+
+    async def compute():
+        return await loop.run_in_executor(
+            get_blocking_executor(), contextvars.copy_context().run, _calculate_similarity, cv_text, job_description, mode
+        )
+
+    return await _similarity_flights.do_async((mode, cv_text, job_description), compute)
+
+
 # ---------------- SKILLS MATCHING ANALYSIS (NEW) ----------------
 
-def skills_matching_analysis(cv_text, job_description, language="es"):
-    system_prompt = """You are a senior recruiter and career consultant specializing in skills assessment and candidate-job matching across all industries. 
+def _skills_matching_analysis_prompts(cv_text, job_description, language="es"):
+    role = """You are a senior recruiter and career consultant specializing in skills assessment and candidate-job matching across all industries. 
     You have deep expertise in analyzing competencies (both hard and soft skills), transferable skills, and identifying skill gaps.
     Your analysis helps candidates understand exactly what they have and what they need to develop, whether in HR, administration, operations, or any other field."""
 
-    user_prompt = f"""Perform a comprehensive skills matching analysis between the candidate's resume and the job description.
+    instructions = f"""Perform a comprehensive skills matching analysis between the candidate's resume and the job description.
 
     Provide a detailed analysis in the following format:
 
@@ -159,25 +1228,27 @@ def skills_matching_analysis(cv_text, job_description, language="es"):
        - Quick wins (skills that can be learned quickly)
        - Long-term development areas
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Be specific, actionable, and prioritize recommendations.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def skills_matching_analysis(cv_text, job_description, language="es"):
+    return _run_prompts(_skills_matching_analysis_prompts(cv_text, job_description, language), analysis="skills")
+
+
+async def skills_matching_analysis_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_skills_matching_analysis_prompts(cv_text, job_description, language), analysis="skills")
 
 
 # ---------------- GAP ANALYSIS (OPTIMIZED) ----------------
 
-def gap_analysis(cv_text, job_description, language="es"):
-    system_prompt = """You are a senior career coach and recruiter with expertise in resume optimization and career development. 
+def _gap_analysis_prompts(cv_text, job_description, language="es"):
+    role = """You are a senior career coach and recruiter with expertise in resume optimization and career development. 
     You specialize in identifying gaps between candidate profiles and job requirements, providing actionable insights that help candidates improve their marketability.
     Your analysis is thorough, constructive, and focuses on actionable improvements."""
 
-    user_prompt = f"""Perform a comprehensive gap analysis comparing the candidate's resume with the job description.
+    instructions = f"""Perform a comprehensive gap analysis comparing the candidate's resume with the job description.
 
     Provide a detailed analysis covering:
 
@@ -210,25 +1281,27 @@ def gap_analysis(cv_text, job_description, language="es"):
        - Unique strengths that differentiate the candidate
        - How to better highlight these in the resume
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Be specific, prioritize by impact, and provide actionable recommendations.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def gap_analysis(cv_text, job_description, language="es"):
+    return _run_prompts(_gap_analysis_prompts(cv_text, job_description, language), analysis="gaps")
+
+
+async def gap_analysis_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_gap_analysis_prompts(cv_text, job_description, language), analysis="gaps")
 
 
 # ---------------- QUANTIFIABLE ACHIEVEMENTS ANALYSIS (NEW) ----------------
 
-def analyze_achievements(cv_text, language="es"):
-    system_prompt = """You are an expert resume writer specializing in quantifying achievements and impact. 
+def _analyze_achievements_prompts(cv_text, language="es", job_description=None):
+    role = """You are an expert resume writer specializing in quantifying achievements and impact. 
     You understand that recruiters and ATS systems prioritize resumes with measurable results, metrics, and concrete outcomes.
     You help candidates transform vague descriptions into powerful, quantifiable statements."""
 
-    user_prompt = f"""Analyze the candidate's resume for quantifiable achievements and provide recommendations.
+    instructions = f"""Analyze the candidate's resume for quantifiable achievements and provide recommendations.
 
     Provide:
 
@@ -255,22 +1328,27 @@ def analyze_achievements(cv_text, language="es"):
        - How to estimate metrics if exact numbers aren't available
        - Examples of quantifiable achievements relevant to their role type
 
-    CANDIDATE RESUME:
-    {cv_text}
-
     Focus on making achievements more impactful and ATS-friendly through quantification.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def analyze_achievements(cv_text, language="es", job_description=None):
+    return _run_prompts(_analyze_achievements_prompts(cv_text, language, job_description), analysis="achievements")
+
+
+async def analyze_achievements_async(cv_text, language="es", job_description=None):
+    return await _run_prompts_async(_analyze_achievements_prompts(cv_text, language, job_description), analysis="achievements")
 
 
 # ---------------- ACTION VERBS ANALYSIS (NEW) ----------------
 
-def analyze_action_verbs(cv_text, job_description, language="es"):
-    system_prompt = """You are a professional resume writer and career coach specializing in powerful language and action verbs.
+def _analyze_action_verbs_prompts(cv_text, job_description, language="es"):
+    role = """You are a professional resume writer and career coach specializing in powerful language and action verbs.
     You understand that strong action verbs make resumes more compelling and help candidates stand out in ATS systems.
     You provide specific, industry-appropriate verb suggestions that align with job requirements."""
 
-    user_prompt = f"""Analyze the action verbs used in the candidate's resume and provide recommendations.
+    instructions = f"""Analyze the action verbs used in the candidate's resume and provide recommendations.
 
     Provide:
 
@@ -294,25 +1372,27 @@ def analyze_action_verbs(cv_text, job_description, language="es"):
        - Suggest variety while maintaining clarity
        - Provide a list of 20-30 powerful verbs relevant to this role
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Make the resume more dynamic and impactful through better verb choices.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def analyze_action_verbs(cv_text, job_description, language="es"):
+    return _run_prompts(_analyze_action_verbs_prompts(cv_text, job_description, language), analysis="verbs")
+
+
+async def analyze_action_verbs_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_analyze_action_verbs_prompts(cv_text, job_description, language), analysis="verbs")
 
 
 # ---------------- EXPERIENCE LEVEL ANALYSIS (NEW) ----------------
 
-def analyze_experience_level(cv_text, job_description, language="es"):
-    system_prompt = """You are a senior recruiter and career analyst with expertise in assessing candidate experience levels and career progression.
+def _analyze_experience_level_prompts(cv_text, job_description, language="es"):
+    role = """You are a senior recruiter and career analyst with expertise in assessing candidate experience levels and career progression.
     You understand how to match candidate experience with job requirements and identify if a candidate is underqualified, well-matched, or overqualified.
     You provide insights on how to position experience effectively."""
 
-    user_prompt = f"""Analyze the candidate's experience level relative to the job requirements.
+    instructions = f"""Analyze the candidate's experience level relative to the job requirements.
 
     Provide:
 
@@ -341,25 +1421,27 @@ def analyze_experience_level(cv_text, job_description, language="es"):
        - Are there gaps or inconsistencies?
        - How to better present career trajectory
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Provide actionable insights on experience positioning.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def analyze_experience_level(cv_text, job_description, language="es"):
+    return _run_prompts(_analyze_experience_level_prompts(cv_text, job_description, language), analysis="experience")
+
+
+async def analyze_experience_level_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_analyze_experience_level_prompts(cv_text, job_description, language), analysis="experience")
 
 
 # ---------------- FORMAT & STRUCTURE RECOMMENDATIONS (NEW) ----------------
 
-def analyze_format_structure(cv_text, job_description, language="es"):
-    system_prompt = """You are an ATS optimization expert and resume formatting specialist.
+def _analyze_format_structure_prompts(cv_text, job_description, language="es"):
+    role = """You are an ATS optimization expert and resume formatting specialist.
     You understand how different ATS systems parse resumes and what formatting choices maximize compatibility and readability.
     You provide specific recommendations for resume structure, sections, and formatting that improve both ATS parsing and human readability."""
 
-    user_prompt = f"""Analyze the resume's format, structure, and ATS compatibility.
+    instructions = f"""Analyze the resume's format, structure, and ATS compatibility.
 
     Provide:
 
@@ -390,21 +1472,23 @@ def analyze_format_structure(cv_text, job_description, language="es"):
        - Is information too dense or too sparse?
        - Recommendations for condensing or expanding
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Focus on both ATS compatibility and human readability.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def analyze_format_structure(cv_text, job_description, language="es"):
+    return _run_prompts(_analyze_format_structure_prompts(cv_text, job_description, language), analysis="format")
+
+
+async def analyze_format_structure_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_analyze_format_structure_prompts(cv_text, job_description, language), analysis="format")
 
 
 # ---------------- REWRITE CV (OPTIMIZED) ----------------
 
-def rewrite_cv(cv_text, job_description, gap_analysis_text=None, language="es"):
-    system_prompt = """You are a world-class ATS resume optimizer and professional resume writer with expertise in:
+def _rewrite_cv_prompts(cv_text, job_description, gap_analysis_text=None, language="es"):
+    role = """You are a world-class ATS resume optimizer and professional resume writer with expertise in:
     - Applicant Tracking System optimization and keyword integration
     - Creating compelling, achievement-focused resume content
     - Industry best practices for resume writing
@@ -459,7 +1543,7 @@ def rewrite_cv(cv_text, job_description, gap_analysis_text=None, language="es"):
     
     Remember: You must address the gaps strategically while maintaining complete accuracy. Never fabricate experience, but do reframe and emphasize existing experience to better match requirements."""
 
-    user_prompt = f"""Rewrite and optimize this resume to maximize ATS alignment and impact while maintaining complete accuracy.
+    instructions = f"""Rewrite and optimize this resume to maximize ATS alignment and impact while maintaining complete accuracy.
 {gap_analysis_section}
 
     OPTIMIZATION REQUIREMENTS:
@@ -500,27 +1584,29 @@ def rewrite_cv(cv_text, job_description, gap_analysis_text=None, language="es"):
        - Highlight transferable skills and experiences
        - Position the candidate as an ideal fit for this role
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    TARGET JOB DESCRIPTION:
-    {job_description}
-
     Provide the complete optimized resume, maintaining all original information while significantly enhancing presentation, impact, and ATS compatibility. 
     {"CRITICALLY IMPORTANT: Use the gap analysis insights above to strategically address identified gaps and improve the resume's alignment with job requirements. " if gap_analysis_text else ""}
     {"Write the entire optimized resume in Spanish (Español)." if language == "es" else "Write the entire optimized resume in English."}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.4)
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.4
+
+
+def rewrite_cv(cv_text, job_description, gap_analysis_text=None, language="es"):
+    return _run_prompts(_rewrite_cv_prompts(cv_text, job_description, gap_analysis_text, language), analysis="optimized_cv")
+
+
+async def rewrite_cv_async(cv_text, job_description, gap_analysis_text=None, language="es"):
+    return await _run_prompts_async(_rewrite_cv_prompts(cv_text, job_description, gap_analysis_text, language), analysis="optimized_cv")
 
 
 # ---------------- OVERALL RECOMMENDATIONS (NEW) ----------------
 
-def get_overall_recommendations(cv_text, job_description, language="es"):
-    system_prompt = """You are a senior career coach and resume expert with comprehensive knowledge of resume optimization, ATS systems, and job market trends.
+def _get_overall_recommendations_prompts(cv_text, job_description, language="es"):
+    role = """You are a senior career coach and resume expert with comprehensive knowledge of resume optimization, ATS systems, and job market trends.
     You provide holistic, strategic recommendations that help candidates improve their overall resume quality and marketability.
     Your advice is practical, prioritized, and actionable."""
 
-    user_prompt = f"""Provide comprehensive, prioritized recommendations for improving this resume.
+    instructions = f"""Provide comprehensive, prioritized recommendations for improving this resume.
 
     Structure your response as:
 
@@ -548,12 +1634,557 @@ def get_overall_recommendations(cv_text, job_description, language="es"):
     - Certifications or qualifications to pursue
     - Projects or experiences that would strengthen the profile
 
-    CANDIDATE RESUME:
-    {cv_text}
-
-    JOB DESCRIPTION:
-    {job_description}
-
     Be specific, actionable, and prioritize by impact and effort required.{_language_instruction(language)}"""
     
-    return call_llm(system_prompt, user_prompt, temperature=0.3)
\ No newline at end of file
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def get_overall_recommendations(cv_text, job_description, language="es"):
+    return _run_prompts(_get_overall_recommendations_prompts(cv_text, job_description, language), analysis="recommendations")
+
+
+async def get_overall_recommendations_async(cv_text, job_description, language="es"):
+    return await _run_prompts_async(_get_overall_recommendations_prompts(cv_text, job_description, language), analysis="recommendations")
+
+
+# ---------------- COMBINED ANALYSIS (FEWER CALLS) ----------------
+
+# Analyses that can share one structured-output call: each only needs the CV and/or JD
+COMBINED_ANALYSES = ("keywords", "skills", "gaps", "achievements", "verbs", "experience", "format", "recommendations")
+# Sections per combined call; keeps each JSON answer well under the completion token limit
+COMBINED_SECTIONS_PER_CALL = int(os.getenv("ATS_COMBINED_SECTIONS_PER_CALL", "4"))
+COMBINED_MAX_TOKENS = int(os.getenv("ATS_COMBINED_MAX_TOKENS", "8192"))
+
+_COMBINED_SECTION_SPECS = {
+    "keywords": """Critical ATS keywords and requirements from the JOB DESCRIPTION, categorized as:
+       Hard Skills & Technical Competencies; Soft Skills & Behavioral Competencies; Certifications & Qualifications;
+       Industry-Specific Terms & Knowledge; Experience Requirements. Include variations of terms (e.g. "HRIS" and "Human Resources Information System").""",
+    "skills": """SKILLS MATCHING REPORT: 1. MATCHED SKILLS (strength Strong/Moderate/Weak and where they appear in the resume);
+       2. PARTIAL MATCHES and how to reframe them; 3. MISSING CRITICAL SKILLS (Critical/Important/Nice-to-have, how to acquire
+       or demonstrate them, compensating transferable skills); 4. SKILL GAP PRIORITY (top 3-5 skills, quick wins, long-term areas).""",
+    "gaps": """Gap analysis: 1. CRITICAL GAPS (why each matters, how to address it); 2. EXPERIENCE GAPS (years and type vs. required,
+       how to frame existing experience); 3. SKILL REPRESENTATION GAPS; 4. QUALIFICATION GAPS (missing credentials and alternatives);
+       5. IMPROVEMENT OPPORTUNITIES (quick, medium-term, long-term); 6. STRENGTHS TO LEVERAGE.""",
+    "achievements": """Quantifiable achievements in the RESUME: 1. CURRENT QUANTIFIABLE ACHIEVEMENTS (rated Strong/Moderate/Weak);
+       2. ACHIEVEMENTS THAT NEED QUANTIFICATION with example rewrites; 3. MISSING ACHIEVEMENT TYPES (business, people, process, scale impact);
+       4. ACTIONABLE RECOMMENDATIONS with field-appropriate metrics and how to estimate them.""",
+    "verbs": """Action verbs: 1. CURRENT ACTION VERBS ANALYSIS (strength Strong/Moderate/Weak/Overused, repetitive or weak verbs);
+       2. RECOMMENDED ACTION VERBS aligned with the job; 3. VERB REPLACEMENT SUGGESTIONS with example rewrites;
+       4. VERB DIVERSITY, including a list of 20-30 powerful verbs relevant to this role.""",
+    "experience": """Experience level: 1. EXPERIENCE LEVEL ASSESSMENT (Underqualified / Well-matched / Overqualified, years, seniority);
+       2. EXPERIENCE STRENGTHS; 3. EXPERIENCE GAPS; 4. POSITIONING RECOMMENDATIONS; 5. CAREER PROGRESSION ANALYSIS.""",
+    "format": """Format and ATS compatibility: 1. ATS COMPATIBILITY ASSESSMENT; 2. STRUCTURE ANALYSIS (sections, order, missing sections);
+       3. FORMATTING RECOMMENDATIONS; 4. CONTENT ORGANIZATION; 5. LENGTH & DENSITY.""",
+    "recommendations": """Prioritized recommendations: PRIORITY 1 - CRITICAL IMPROVEMENTS; PRIORITY 2 - IMPORTANT ENHANCEMENTS;
+       PRIORITY 3 - OPTIMIZATION OPPORTUNITIES; QUICK WINS; LONG-TERM DEVELOPMENT. Explain why each matters and give specific steps.""",
+}
+
+
+def _combined_analysis_prompts(cv_text, job_description, keys, language="es"):
+    role = """You are a senior recruiter, career coach and ATS optimization specialist with 15+ years of experience across all industries.
+    You produce several sections of a resume review in one pass. Every section is specific, actionable, prioritized by impact and truthful to the resume.
+    You always answer with a single valid JSON object."""
+
+    sections = "\n".join(f'    - "{key}": {_COMBINED_SECTION_SPECS[key]}' for key in keys)
+    instructions = f"""Review the candidate's resume against the job description and write the following report sections.
+
+    Return a JSON object with exactly these keys. Each value must be a complete, detailed Markdown string for that section:
+{sections}
+
+    Do not add any other keys or any text outside the JSON object.{_language_instruction(language)}"""
+
+    return _document_context(cv_text, job_description), _task_prompt(role, instructions), 0.3
+
+
+def _combined_groups(keys):
+    keys = [key for key in COMBINED_ANALYSES if key in keys]
+    size = max(COMBINED_SECTIONS_PER_CALL, 1)
+    return [tuple(keys[i:i + size]) for i in range(0, len(keys), size)]
+
+
+def _parse_combined(content, keys):
+    """Returns {key: text} for the sections present in a combined JSON answer."""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {key: data[key] for key in keys if isinstance(data.get(key), str) and data[key].strip()}
+
+
+async def _combined_group_async(cv_text, job_description, keys, language):
+    system_prompt, user_prompt, temperature = _combined_analysis_prompts(cv_text, job_description, keys, language)
+    with metrics.analysis_scope("combined"):
+        content = await call_llm_async(
+            system_prompt, user_prompt, temperature=temperature, json_mode=True, max_tokens=COMBINED_MAX_TOKENS
+        )
+    sections = _parse_combined(content, keys)
+    # A truncated or malformed answer only costs the sections that are missing
+    missing = [key for key in keys if key not in sections]
+    fallbacks = await asyncio.gather(*(
+        _run_prompts_async(_analysis_prompts(key, cv_text, job_description, language), analysis=key) for key in missing
+    ))
+    sections.update(zip(missing, fallbacks))
+    return sections
+
+
+async def combined_analysis_async(cv_text, job_description, analyses=COMBINED_ANALYSES, language="es"):
+    """Runs the selected analyses in ceil(n / COMBINED_SECTIONS_PER_CALL) JSON calls.
+
+    Returns {key: markdown} with the same keys and shape as the per-function results.
+    """
+    groups = _combined_groups(analyses)
+    results = {}
+    for sections in await asyncio.gather(*(
+        _combined_group_async(cv_text, job_description, keys, language) for keys in groups
+    )):
+        results.update(sections)
+    return results
+
+
+def combined_analysis(cv_text, job_description, analyses=COMBINED_ANALYSES, language="es"):
+    async def _run():
+        try:
+            return await combined_analysis_async(cv_text, job_description, analyses, language)
+        finally:
+            await close_async_http_client()
+    return asyncio.run(_run())
+
+
+# ---------------- ASYNC REPORT ORCHESTRATOR ----------------
+
+# Result keys in the order app.py renders them
+REPORT_ANALYSES = (
+    "keywords", "similarity", "skills", "gaps", "achievements",
+    "verbs", "experience", "format", "recommendations", "optimized_cv"
+)
+
+# Analyses that only read the CV: a report against many postings runs them once
+CV_ONLY_ANALYSES = ("achievements",)
+
+# Inputs each analysis consumes from other analyses (used when they are part of the report)
+ANALYSIS_DEPENDENCIES = {
+    "optimized_cv": ("gaps",),
+}
+
+
+def _analysis_prompts(key, cv_text, job_description, language, gap_analysis_text=None):
+    """Returns (system_prompt, user_prompt, temperature) for an LLM analysis key."""
+    builders = {
+        "keywords": lambda: _extract_keywords_prompts(job_description, language),
+        "skills": lambda: _skills_matching_analysis_prompts(cv_text, job_description, language),
+        "gaps": lambda: _gap_analysis_prompts(cv_text, job_description, language),
+        "achievements": lambda: _analyze_achievements_prompts(cv_text, language, job_description),
+        "verbs": lambda: _analyze_action_verbs_prompts(cv_text, job_description, language),
+        "experience": lambda: _analyze_experience_level_prompts(cv_text, job_description, language),
+        "format": lambda: _analyze_format_structure_prompts(cv_text, job_description, language),
+        "recommendations": lambda: _get_overall_recommendations_prompts(cv_text, job_description, language),
+        "optimized_cv": lambda: _rewrite_cv_prompts(cv_text, job_description, gap_analysis_text, language),
+    }
+    return builders[key]()
+
+
+async def _run_analysis_async(key, cv_text, job_description, language, gap_analysis_text=None, on_delta=None,
+                              similarity_mode=None, keyword_engine="llm"):
+    if key == "similarity":
+        with metrics.analysis_scope("similarity"):
+            return await calculate_similarity_async(cv_text, job_description, similarity_mode)
+    if key == "keywords" and keyword_engine == "local":
+        return _local_keywords(job_description, language)
+    prompts = _analysis_prompts(key, cv_text, job_description, language, gap_analysis_text)
+    return await _run_prompts_async(
+        prompts, on_delta=(lambda delta: on_delta(key, delta)) if on_delta else None, analysis=key
+    )
+
+
+def report_analysis_key(key, cv_text, job_description, language="es", analyses=REPORT_ANALYSES, similarity_mode=None,
+                        keyword_engine=None, mode="separate", sections=False):
+    """Content hash identifying one analysis of a report, for callers that keep results between runs.
+
+    Besides the CV (keywords leave it out, unless they come from a combined call, whose prompt
+    carries the CV), the posting and the language, it covers the
+    options that change that analysis's output: the similarity mode, the keyword engine,
+    whether optimized_cv gets the gap analysis as input, for COMBINED_ANALYSES whether they
+    come from the combined JSON calls (mode), and for SECTION_ANALYSES whether they were merged
+    from per-section answers (sections=True, see analyze_cv_incremental_async).
+    """
+    keyword_engine = _check_keyword_engine(keyword_engine or KEYWORD_ENGINE)
+    if key == "similarity":
+        variant = [similarity_mode or SIMILARITY_MODE]
+    elif key == "keywords":
+        if keyword_engine == "local" or mode != "combined":
+            # Read from the posting alone, so editing the CV keeps them
+            cv_text = None
+        variant = [keyword_engine]
+    else:
+        variant = [dep for dep in ANALYSIS_DEPENDENCIES.get(key, ()) if dep in analyses]
+    if key in COMBINED_ANALYSES and not (key == "keywords" and keyword_engine == "local"):
+        variant.append(mode)
+    if key in SECTION_ANALYSES and sections:
+        variant.append("sections")
+    payload = json.dumps([key, cv_text, job_description, language, variant], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def run_report_async(cv_text, job_description, analyses=REPORT_ANALYSES, language="es", on_result=None, on_delta=None,
+                           similarity_mode=None, timings=None, mode="separate", keyword_engine=None, known=None):
+    """Runs a whole report on the running event loop and returns the results dict app.py renders.
+
+    Analyses are scheduled as a dependency graph (see ANALYSIS_DEPENDENCIES): each one starts
+    as soon as the analyses it consumes have finished. on_result(key, value) is called on the
+    loop as each analysis finishes. When on_delta(key, delta) is given, LLM analyses are
+    streamed and it is called with each text delta as it arrives. similarity_mode overrides
+    SIMILARITY_MODE ("full" or "chunked"). If a timings dict is passed, it is filled with the
+    scheduler's per-analysis timings and critical path, plus this report's per-analysis metrics
+    (queue wait, tokens, cost, retries, encode time) under "analyses". mode="combined" runs the COMBINED_ANALYSES
+    through a few JSON calls (see combined_analysis_async) instead of one call each.
+    keyword_engine="local" extracts the keywords locally instead (see extract_keywords).
+    known maps analysis keys to results from an earlier run (see report_analysis_key); those
+    are reported through on_result and fed to their dependents without being recomputed.
+    """
+    keyword_engine = _check_keyword_engine(keyword_engine or KEYWORD_ENGINE)
+    known = {key: value for key, value in (known or {}).items() if key in analyses}
+    graph = TaskGraph()
+    combined_keys = {}
+    if mode == "combined":
+        llm_analyses = [key for key in analyses
+                        if key not in known and not (key == "keywords" and keyword_engine == "local")]
+        for index, keys in enumerate(_combined_groups(llm_analyses)):
+            group = f"combined_{index + 1}"
+
+            async def run_group(inputs, keys=keys):
+                return await _combined_group_async(cv_text, job_description, keys, language)
+
+            graph.add(group, run_group)
+            combined_keys.update((key, group) for key in keys)
+
+    for key in REPORT_ANALYSES:
+        if key not in analyses:
+            continue
+        if key in known:
+            async def reuse(inputs, value=known[key]):
+                return value
+
+            graph.add(key, reuse)
+            continue
+        if key in combined_keys:
+            async def pick(inputs, key=key, group=combined_keys[key]):
+                return inputs[group][key]
+
+            graph.add(key, pick, [combined_keys[key]])
+            continue
+        deps = [dep for dep in ANALYSIS_DEPENDENCIES.get(key, ()) if dep in analyses]
+
+        async def run(inputs, key=key):
+            return await _run_analysis_async(
+                key, cv_text, job_description, language,
+                gap_analysis_text=inputs.get("gaps"), on_delta=on_delta, similarity_mode=similarity_mode,
+                keyword_engine=keyword_engine
+            )
+
+        graph.add(key, run, deps)
+
+    def report_result(key, value):
+        if on_result is not None and key in REPORT_ANALYSES:
+            on_result(key, value)
+
+    with metrics.report_scope() as report_metrics:
+        run = await graph.run(on_result=report_result)
+    if timings is not None:
+        timings.update(run.summary())
+        timings["analyses"] = report_metrics.breakdown()
+    return {key: value for key, value in run.results.items() if key in REPORT_ANALYSES}
+
+
+def run_report(cv_text, job_description, analyses=REPORT_ANALYSES, language="es", on_result=None):
+    """Blocking wrapper around run_report_async for scripts and the CLI."""
+    async def _run():
+        try:
+            return await run_report_async(cv_text, job_description, analyses, language, on_result)
+        finally:
+            await close_async_http_client()
+    return asyncio.run(_run())
+
+
+# ---------------- INCREMENTAL RE-ANALYSIS ----------------
+
+# Analyses run once per CV section and merged (see analyze_cv_incremental_async), with the section kinds they read
+SECTION_ANALYSES = {
+    "achievements": ("summary", "experience", "other"),
+    "verbs": ("summary", "experience", "other"),
+}
+
+
+def _section_result_key(analysis, section, job_description, language):
+    payload = json.dumps([analysis, section["digest"], job_description, language], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _merge_section_results(sections, texts):
+    """Joins per-section analyses under the section titles, in CV order."""
+    return "\n\n".join(f"### {section['title'] or section['id']}\n\n{text}" for section, text in zip(sections, texts))
+
+
+def _incremental_chunked_similarity(cv_text, job_description, previous=None):
+    """calculate_chunked_similarity, reusing the chunk vectors of an earlier run.
+
+    The chunks and the aggregation are exactly those of calculate_chunked_similarity, so the
+    score matches it; previous is the "chunk_vectors" entry of an earlier state (vectors by
+    embeddings.text_key), used when the model matches, and only the other chunks are encoded.
+    Returns (score, chunk_vectors, vectors_reused, vectors_encoded).
+    """
+    cv_chunks = split_chunks(cv_text, SIMILARITY_CHUNK_WORDS)
+    jd_chunks = split_chunks(job_description, SIMILARITY_CHUNK_WORDS)
+    model = get_embedding_model()
+    reusable = previous["vectors"] if previous and previous.get("model") == model.cache_name else {}
+    keys = [text_key(model.cache_name, chunk) for chunk in cv_chunks + jd_chunks]
+    vectors = {key: reusable[key] for key in keys if key in reusable}
+    missing = {key: chunk for key, chunk in zip(keys, cv_chunks + jd_chunks) if key not in vectors}
+    if missing:
+        started = time.perf_counter()
+        embeddings = encode_normalized(model, model.cache_name, list(missing.values()), embedding_cache, EMBEDDING_BATCH_SIZE)
+        metrics.record_encode(len(missing), time.perf_counter() - started)
+        vectors.update(zip(missing, embeddings))
+    matrix = np.stack([vectors[key] for key in keys])
+    scores = matrix[:len(cv_chunks)] @ matrix[len(cv_chunks):].T
+    score = aggregate_chunk_scores(scores, SIMILARITY_CHUNK_AGGREGATE)
+    reused = len(vectors) - len(missing)
+    return round(score * 100, 2), {"model": model.cache_name, "vectors": vectors}, reused, len(missing)
+
+
+async def analyze_cv_incremental_async(cv_text, job_description, analyses=REPORT_ANALYSES, language="es", previous=None,
+                                       on_result=None, on_delta=None, similarity_mode=None, timings=None,
+                                       mode="separate", keyword_engine=None, known=None):
+    """Re-runs a report on an edited CV, recomputing only what its changed sections affect.
+
+    The CV is split into sections (see cv_sections.parse_cv_sections). SECTION_ANALYSES run once
+    per section and are merged under the section titles, reusing what previous (the state an
+    earlier call returned) holds for sections whose content hash did not change; the first run
+    therefore makes one call per section for each of them instead of one in total. Chunked
+    similarity gives calculate_chunked_similarity's score, encoding only the chunks missing from
+    previous. Analyses that read the whole CV are reused only when their report_analysis_key
+    matches, as are the entries of known. The other arguments are as in run_report_async.
+
+    Returns the state to pass as previous next time: "results" (as run_report_async),
+    "sections", "diff" (see cv_sections.diff_sections) and "stats" with the section calls and
+    chunk vectors reused and computed.
+    """
+    previous = previous or {}
+    similarity_mode = similarity_mode or SIMILARITY_MODE
+    sections = parse_cv_sections(cv_text)
+    diff = diff_sections(previous.get("sections"), sections)
+    stats = {"section_calls": 0, "section_calls_reused": 0, "vectors_encoded": 0, "vectors_reused": 0}
+
+    result_keys = {
+        key: report_analysis_key(
+            key, cv_text, job_description, language, analyses, similarity_mode, keyword_engine, mode, sections=True
+        )
+        for key in analyses
+    }
+    previous_results, previous_keys = previous.get("results", {}), previous.get("result_keys", {})
+    known = {key: value for key, value in (known or {}).items() if key in analyses}
+    known.update(
+        (key, previous_results[key]) for key in analyses
+        if key in previous_results and previous_keys.get(key) == result_keys[key]
+    )
+    section_keys = [key for key in analyses if key in SECTION_ANALYSES and key not in known]
+    chunked_similarity = "similarity" in analyses and "similarity" not in known and similarity_mode == "chunked"
+    whole = [key for key in analyses if key not in section_keys and not (key == "similarity" and chunked_similarity)]
+
+    results = {}
+    previous_section_results = previous.get("section_results", {})
+    section_results = {}
+    chunk_vectors = previous.get("chunk_vectors")
+
+    def report(key, value):
+        results[key] = value
+        if on_result is not None:
+            on_result(key, value)
+
+    async def run_section_analysis(key):
+        targets = [section for section in sections if section["kind"] in SECTION_ANALYSES[key]] or sections
+
+        async def run_one(section):
+            result_key = _section_result_key(key, section, job_description, language)
+            text = previous_section_results.get(result_key)
+            if text is None:
+                stats["section_calls"] += 1
+                prompts = _analysis_prompts(key, section["text"], job_description, language)
+                text = await _run_prompts_async(prompts, analysis=key)
+            else:
+                stats["section_calls_reused"] += 1
+            section_results[result_key] = text
+            return text
+
+        texts = await asyncio.gather(*(run_one(section) for section in targets))
+        report(key, _merge_section_results(targets, texts))
+
+    async def run_chunked_similarity():
+        nonlocal chunk_vectors
+        loop = asyncio.get_running_loop()
+        with metrics.analysis_scope("similarity"):
+            score, chunk_vectors, reused, encoded = await loop.run_in_executor(
+                get_blocking_executor(), contextvars.copy_context().run,
+                _incremental_chunked_similarity, cv_text, job_description, chunk_vectors
+            )
+        stats["vectors_reused"] += reused
+        stats["vectors_encoded"] += encoded
+        report("similarity", score)
+
+    async def run_whole():
+        results.update(await run_report_async(
+            cv_text, job_description, whole, language, on_result=on_result, on_delta=on_delta,
+            similarity_mode=similarity_mode, timings=timings, mode=mode, keyword_engine=keyword_engine, known=known
+        ))
+
+    tasks = [run_whole()] + [run_section_analysis(key) for key in section_keys]
+    if chunked_similarity:
+        tasks.append(run_chunked_similarity())
+    await asyncio.gather(*tasks)
+
+    # Keep per-section work for sections still in the CV, including analyses not run this time
+    for key in SECTION_ANALYSES:
+        for section in sections:
+            result_key = _section_result_key(key, section, job_description, language)
+            if result_key not in section_results and result_key in previous_section_results:
+                section_results[result_key] = previous_section_results[result_key]
+
+    return {
+        "results": {key: results[key] for key in REPORT_ANALYSES if key in results},
+        "result_keys": result_keys,
+        "sections": [{field: section[field] for field in ("id", "kind", "title", "digest")} for section in sections],
+        "section_results": section_results,
+        "chunk_vectors": chunk_vectors,
+        "diff": diff,
+        "stats": stats,
+    }
+
+
+def analyze_cv_incremental(cv_text, job_description, analyses=REPORT_ANALYSES, language="es", previous=None, on_result=None):
+    """Blocking wrapper around analyze_cv_incremental_async for scripts and the CLI."""
+    async def _run():
+        try:
+            return await analyze_cv_incremental_async(cv_text, job_description, analyses, language, previous, on_result)
+        finally:
+            await close_async_http_client()
+    return asyncio.run(_run())
+
+
+# ---------------- MULTI-POSTING REPORT ----------------
+
+def _multi_similarity(cv_text, job_descriptions, mode=None):
+    """Scores one CV against every posting with a single encode pass over all their texts/chunks."""
+    if (mode or SIMILARITY_MODE) != "chunked":
+        return [round(float(score), 2) for score in calculate_similarity_matrix([cv_text], job_descriptions)[0]]
+    cv_chunks = split_chunks(cv_text, SIMILARITY_CHUNK_WORDS)
+    jd_chunks = [split_chunks(text, SIMILARITY_CHUNK_WORDS) for text in job_descriptions]
+    texts = cv_chunks + [chunk for chunks in jd_chunks for chunk in chunks]
+    model = get_embedding_model()
+    started = time.perf_counter()
+    embeddings = encode_normalized(model, model.cache_name, texts, embedding_cache, EMBEDDING_BATCH_SIZE)
+    metrics.record_encode(len(texts), time.perf_counter() - started)
+    cv_vectors, offset, scores = embeddings[:len(cv_chunks)], len(cv_chunks), []
+    for chunks in jd_chunks:
+        pair_scores = cv_vectors @ embeddings[offset:offset + len(chunks)].T
+        scores.append(round(aggregate_chunk_scores(pair_scores, SIMILARITY_CHUNK_AGGREGATE) * 100, 2))
+        offset += len(chunks)
+    return scores
+
+
+async def run_multi_report_async(cv_text, job_descriptions, analyses=REPORT_ANALYSES, language="es", on_result=None,
+                                 concurrency=None, similarity_mode=None, mode="separate", keyword_engine=None):
+    """Runs one CV against many postings without repeating the work that does not depend on them.
+
+    job_descriptions is a {job_id: text} dict or a list (ids "1", "2", ...). CV_ONLY_ANALYSES run
+    once, without a posting; similarity encodes the CV and every posting in one batched pass; the
+    other analyses run as one run_report_async per posting, at most `concurrency`
+    (MULTI_REPORT_CONCURRENCY) at a time, so N postings cost 1 + k*N calls instead of (k+1)*N.
+    on_result(job_id, key, value) is called as results arrive, with job_id None for the shared ones.
+
+    Returns {"shared": {key: value}, "reports": {job_id: results}, "errors": {job_id or
+    "shared:<key>": message}, "ranking": [...]}: the ranking lists every posting best first, by similarity when it was
+    computed and then by local keyword coverage, with both scores and the rank.
+    """
+    if not isinstance(job_descriptions, dict):
+        job_descriptions = {str(number): text for number, text in enumerate(job_descriptions, start=1)}
+    shared_keys = [key for key in analyses if key in CV_ONLY_ANALYSES]
+    per_job = [key for key in analyses if key not in CV_ONLY_ANALYSES]
+    semaphore = asyncio.Semaphore(concurrency or MULTI_REPORT_CONCURRENCY)
+    shared, reports, errors = {}, {}, {}
+
+    def report(job_id, key, value):
+        if on_result is not None:
+            on_result(job_id, key, value)
+
+    async def run_shared(key):
+        # Without a posting in the prompt, so the one answer holds for all of them
+        prompts = _analysis_prompts(key, cv_text, None, language)
+        try:
+            shared[key] = await _run_prompts_async(prompts, analysis=key)
+        except Exception as e:
+            errors[f"shared:{key}"] = str(e)
+            return
+        report(None, key, shared[key])
+
+    loop = asyncio.get_running_loop()
+    known = {job_id: {} for job_id in job_descriptions}
+    if "similarity" in per_job and job_descriptions:
+        try:
+            with metrics.analysis_scope("similarity"):
+                scores = await loop.run_in_executor(
+                    get_blocking_executor(), contextvars.copy_context().run,
+                    _multi_similarity, cv_text, list(job_descriptions.values()), similarity_mode
+                )
+        except Exception as e:
+            # Each posting's report then computes its own similarity
+            errors["shared:similarity"] = str(e)
+        else:
+            for job_id, score in zip(job_descriptions, scores):
+                known[job_id]["similarity"] = score
+
+    async def run_job(job_id, job_description):
+        async with semaphore:
+            try:
+                reports[job_id] = await run_report_async(
+                    cv_text, job_description, per_job, language,
+                    on_result=lambda key, value: report(job_id, key, value),
+                    similarity_mode=similarity_mode, mode=mode, keyword_engine=keyword_engine, known=known[job_id]
+                )
+            except Exception as e:
+                errors[job_id] = str(e)
+
+    await asyncio.gather(
+        *(run_shared(key) for key in shared_keys),
+        *(run_job(job_id, text) for job_id, text in job_descriptions.items())
+    )
+    for results in reports.values():
+        results.update(shared)
+
+    # TF-IDF over every posting is CPU work too: keep it off the event loop
+    coverages = await loop.run_in_executor(
+        get_blocking_executor(),
+        lambda: [keyword_coverage(cv_text, job_description)["score"] for job_description in job_descriptions.values()]
+    )
+    ranking = [
+        {
+            "job_id": job_id,
+            "similarity": reports.get(job_id, known[job_id]).get("similarity"),
+            "keyword_coverage": coverage,
+        }
+        for job_id, coverage in zip(job_descriptions, coverages)
+    ]
+    ranking.sort(key=lambda row: (row["similarity"] or 0.0, row["keyword_coverage"]), reverse=True)
+    for rank, row in enumerate(ranking, start=1):
+        row["rank"] = rank
+    return {"shared": shared, "reports": reports, "errors": errors, "ranking": ranking}
+
+
+def run_multi_report(cv_text, job_descriptions, analyses=REPORT_ANALYSES, language="es", on_result=None, concurrency=None):
+    """Blocking wrapper around run_multi_report_async for scripts and the CLI."""
+    async def _run():
+        try:
+            return await run_multi_report_async(cv_text, job_descriptions, analyses, language, on_result, concurrency)
+        finally:
+            await close_async_http_client()
+    return asyncio.run(_run())
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+# ---------------- TOKEN BUCKET ----------------
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1.0))
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def reserve(self):
+        """Takes one token and returns the seconds to wait before using it (0.0 when one is available).
+
+        Tokens may go negative: each caller reserves the next free one, so waiters are served in order.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+# ---------------- ADAPTIVE CONCURRENCY LIMITER ----------------
+
+LIMITER_OUTCOMES = ("ok", "throttled", "error")
+
+
+class AdaptiveLimiter:
+    """Process-wide cap on in-flight requests, shared by threads and event loops alike.
+
+    The limit adapts AIMD-style: every "ok" release adds increase/limit (about +increase per
+    round of requests) up to max_limit, and a "throttled" release (429/5xx) multiplies it by
+    decrease, at most once per cooldown seconds so one burst of 429s only counts once.
+    Waiters are served first come, first served. Optionally a TokenBucket caps the start rate,
+    and pause() holds every new request back, e.g. for a Retry-After.
+    """
+
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, increase=1.0, decrease=0.5,
+                 rate=None, burst=None, cooldown=1.0):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Se requiere 1 <= min_limit <= initial_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._lock = threading.Lock()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters = deque()  # grant callbacks of queued acquirers, oldest first
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._counters = {
+            "acquired": 0, "ok": 0, "throttled": 0, "errors": 0,
+            "limit_increases": 0, "limit_decreases": 0, "max_queue_depth": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        """Blocks the calling thread until a slot is free and returns the seconds waited; pair it with release()."""
+        started = time.monotonic()
+        event = None
+        with self._lock:
+            if not self._take_locked():
+                event = threading.Event()
+                self._enqueue_locked(lambda: event.set() or True)
+        if event is not None:
+            event.wait()
+        delay = self._start_delay()
+        if delay > 0:
+            time.sleep(delay)
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    async def acquire_async(self):
+        """Awaits a free slot without blocking the loop and returns the seconds waited; pair it with release()."""
+        started = time.monotonic()
+        future = None
+        with self._lock:
+            if not self._take_locked():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                grant = _loop_grant(loop, future)
+                self._enqueue_locked(grant)
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(grant)
+                        granted = False
+                    except ValueError:
+                        granted = True
+                if granted:
+                    # The slot was handed over while we were being cancelled: pass it on
+                    self.release("error")
+                raise
+        delay = self._start_delay()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.release("error")
+                raise
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    def release(self, outcome="ok", pause_seconds=None):
+        """Frees a slot and adapts the limit; outcome is one of LIMITER_OUTCOMES."""
+        if outcome not in LIMITER_OUTCOMES:
+            raise ValueError(f"Resultado desconocido: {outcome!r} (opciones: {', '.join(LIMITER_OUTCOMES)})")
+        with self._lock:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if outcome == "ok":
+                self._counters["ok"] += 1
+                if self._limit < self.max_limit:
+                    before = int(self._limit)
+                    self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+                    if int(self._limit) > before:
+                        self._counters["limit_increases"] += 1
+            elif outcome == "throttled":
+                self._counters["throttled"] += 1
+                if now - self._last_decrease >= self.cooldown:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+                    self._counters["limit_decreases"] += 1
+            else:
+                self._counters["errors"] += 1
+            if pause_seconds:
+                self._paused_until = max(self._paused_until, now + pause_seconds)
+            self._wake_locked()
+
+    def pause(self, seconds):
+        """Delays the start of every request for the next `seconds` (e.g. a Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        """Current limit, in-flight and queued requests, outcome counters and queue wait times."""
+        with self._lock:
+            stats = dict(self._counters)
+            acquired = stats["acquired"]
+            stats.update(
+                limit=self.limit,
+                in_flight=self._in_flight,
+                queue_depth=len(self._waiters),
+                paused_seconds=round(max(self._paused_until - time.monotonic(), 0.0), 3),
+                wait_seconds_total=round(self._wait_total, 3),
+                wait_seconds_mean=round(self._wait_total / acquired, 4) if acquired else 0.0,
+                wait_seconds_max=round(self._wait_max, 3),
+            )
+        return stats
+
+    # Callers below must hold self._lock
+
+    def _take_locked(self):
+        if self._waiters or self._in_flight >= self.limit:
+            return False
+        self._in_flight += 1
+        return True
+
+    def _enqueue_locked(self, grant):
+        self._waiters.append(grant)
+        self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], len(self._waiters))
+
+    def _wake_locked(self):
+        while self._waiters and self._in_flight < self.limit:
+            grant = self._waiters.popleft()
+            self._in_flight += 1
+            if not grant():
+                self._in_flight -= 1
+
+    # Helpers below take self._lock themselves
+
+    def _start_delay(self):
+        delay = self.bucket.reserve() if self.bucket is not None else 0.0
+        with self._lock:
+            return max(delay, self._paused_until - time.monotonic())
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self._counters["acquired"] += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+
+def _loop_grant(loop, future):
+    """Grant callback resolving `future` on its own loop; returns False if that loop is gone."""
+
+    def resolve():
+        if not future.done():
+            future.set_result(None)
+
+    def grant():
+        try:
+            loop.call_soon_threadsafe(resolve)
+        except RuntimeError:
+            return False
+        return True
+
+    return grant
+
+
+# ---------------- LATENCY TRACKING ----------------
+
+class LatencyTracker:
+    """Thread-safe sliding window of recent request latencies, used to pick hedging delays."""
+
+    def __init__(self, window=512, min_samples=20):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """Returns the q-th percentile (0-100) of the window, or None with fewer than min_samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, round(q / 100 * (len(samples) - 1)))]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+# ---------------- DEPENDENCY-GRAPH SCHEDULER ----------------
+
+class TaskGraph:
+    """Runs async tasks as soon as the tasks they depend on have finished.
+
+    Each task is an async callable receiving a dict with its dependencies' results.
+    Unlike a phase barrier, a task never waits for work it does not consume.
+    """
+
+    def __init__(self):
+        self._tasks = {}  # name -> (fn, deps)
+
+    def add(self, name, fn, deps=()):
+        if name in self._tasks:
+            raise ValueError(f"Tarea duplicada: {name!r}")
+        self._tasks[name] = (fn, tuple(deps))
+        return self
+
+    def __contains__(self, name):
+        return name in self._tasks
+
+    def _validate(self):
+        for name, (_, deps) in self._tasks.items():
+            for dep in deps:
+                if dep not in self._tasks:
+                    raise ValueError(f"La tarea {name!r} depende de {dep!r}, que no está en el grafo")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependencia circular en {name!r}")
+            visiting.add(name)
+            for dep in self._tasks[name][1]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self._tasks:
+            visit(name)
+
+    async def run(self, on_result=None):
+        """Runs the graph on the running loop and returns a GraphRun.
+
+        on_result(name, value) is called on the loop as each task finishes. The first
+        failure cancels every other task and is re-raised as RuntimeError naming the task.
+        """
+        self._validate()
+        run = GraphRun(self._tasks)
+        futures = {}
+
+        async def run_task(name):
+            fn, deps = self._tasks[name]
+            inputs = {}
+            for dep in deps:
+                inputs[dep] = await futures[dep]
+            run.started[name] = time.perf_counter() - run.origin
+            try:
+                value = await fn(inputs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Error en {name}: {e}") from e
+            run.finished[name] = time.perf_counter() - run.origin
+            run.results[name] = value
+            if on_result is not None:
+                on_result(name, value)
+            return value
+
+        for name in self._tasks:
+            futures[name] = asyncio.ensure_future(run_task(name))
+        try:
+            # Dependents re-raise their dependency's error unchanged, so any failure is a root cause
+            done, _ = await asyncio.wait(futures.values(), return_when=asyncio.FIRST_EXCEPTION)
+            for future in done:
+                if not future.cancelled() and future.exception() is not None:
+                    raise future.exception()
+        finally:
+            for future in futures.values():
+                if not future.done():
+                    future.cancel()
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+        run.wall_seconds = time.perf_counter() - run.origin
+        return run
+
+
+class GraphRun:
+    """Results and timings of one TaskGraph run; times are seconds since the run started."""
+
+    def __init__(self, tasks):
+        self._deps = {name: deps for name, (_, deps) in tasks.items()}
+        self.origin = time.perf_counter()
+        self.results = {}
+        self.started = {}
+        self.finished = {}
+        self.wall_seconds = 0.0
+
+    def critical_path(self):
+        """Returns the chain of tasks that determined the finish time, first to last."""
+        if not self.finished:
+            return []
+        name = max(self.finished, key=self.finished.get)
+        path = [name]
+        while self._deps.get(name):
+            # The dependency that finished last is the one that held this task back
+            name = max(self._deps[name], key=lambda dep: self.finished.get(dep, 0.0))
+            path.append(name)
+        return path[::-1]
+
+    def summary(self):
+        """Per-task start/duration, the critical path and what a two-phase barrier would have cost."""
+        tasks = {
+            name: {
+                "start": round(self.started[name], 3),
+                "seconds": round(self.finished[name] - self.started[name], 3),
+            }
+            for name in self.finished
+        }
+        path = self.critical_path()
+        # Two-phase equivalent: every root task first, then the dependent ones after the slowest root
+        roots = [name for name in self.finished if not self._deps.get(name)]
+        barrier = max((self.finished[name] for name in roots), default=0.0)
+        barrier += max(
+            (tasks[name]["seconds"] for name in self.finished if self._deps.get(name)), default=0.0
+        )
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "critical_path": path,
+            "critical_path_seconds": round(self.finished[path[-1]], 3) if path else 0.0,
+            "two_phase_estimate_seconds": round(barrier, 3),
+            "tasks": tasks,
+        }
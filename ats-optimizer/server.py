@@ -0,0 +1,468 @@
+"""Local HTTP service exposing the analyses behind an async job queue.
+
+    python server.py --port 8000 --workers 4 --queue-size 32
+
+One long-lived process keeps the embedding model, the HTTP pools and the request limiter
+warm for every client. Endpoints (JSON in and out):
+
+    POST   /jobs              submit {"analysis": "report", "cv_text": ..., "job_description": ...}
+                              -> 202 {"id": ..., "status": "queued"}; 503 + Retry-After when the queue is full
+    GET    /jobs/<id>         status, results so far, error and timings
+    GET    /jobs/<id>/stream  server-sent events: "result" per finished analysis, "delta" text
+                              chunks (when submitted with "stream": true) and a final "status"
+    DELETE /jobs/<id>         cancels a queued or running job
+    GET    /health            queue depth, running jobs and request limiter stats
+    GET    /metrics           per-analysis latency, queue wait, tokens, retries and cost (Prometheus text)
+    GET    /metrics.json      the same metrics as a JSON snapshot
+
+"analysis" is one of JOB_ANALYSES; "report" accepts an "analyses" list to run a subset.
+Optional fields: "language" ("es"/"en"), "mode" ("separate"/"combined"), "similarity_mode",
+"keyword_engine" ("llm"/"local").
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import optimizer
+
+# Job kinds and the report analyses each one runs
+JOB_ANALYSES = {
+    "keywords": ("keywords",),
+    "similarity": ("similarity",),
+    "gaps": ("gaps",),
+    "rewrite": ("gaps", "optimized_cv"),
+    "report": optimizer.REPORT_ANALYSES,
+}
+
+JOB_STATUSES = ("queued", "running", "done", "error", "cancelled")
+FINISHED_STATUSES = ("done", "error", "cancelled")
+
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+# Seconds between keep-alive comments on an idle event stream
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+class QueueFullError(RuntimeError):
+    """The job queue is at capacity; the client should retry later."""
+
+
+# ---------------- JOBS ----------------
+
+class Job:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = "queued"
+        self.results = {}
+        self.error = None
+        self.timings = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []  # (event name, data) in emission order, replayed by every stream reader
+        self.task = None  # asyncio task while running
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "analysis": self.request["analysis"],
+            "status": self.status,
+            "results": dict(self.results),
+            "error": self.error,
+            "timings": self.timings,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def validate_request(body):
+    """Returns the normalized job request, or raises ValueError with a client-facing message."""
+    if not isinstance(body, dict):
+        raise ValueError("El cuerpo debe ser un objeto JSON")
+    analysis = body.get("analysis", "report")
+    if not isinstance(analysis, str) or analysis not in JOB_ANALYSES:
+        raise ValueError(f"Análisis desconocido: {analysis!r} (opciones: {', '.join(JOB_ANALYSES)})")
+    analyses = JOB_ANALYSES[analysis]
+    if analysis == "report" and body.get("analyses") is not None:
+        if not isinstance(body["analyses"], list) or not all(isinstance(key, str) for key in body["analyses"]):
+            raise ValueError("'analyses' debe ser una lista de nombres de análisis")
+        unknown = [key for key in body["analyses"] if key not in optimizer.REPORT_ANALYSES]
+        if unknown:
+            raise ValueError(f"Análisis desconocidos: {', '.join(unknown)}")
+        if body["analyses"]:
+            analyses = tuple(key for key in optimizer.REPORT_ANALYSES if key in body["analyses"])
+    job_description = body.get("job_description")
+    cv_text = body.get("cv_text")
+    if not isinstance(job_description, str) or not job_description.strip():
+        raise ValueError("Falta 'job_description'")
+    if analyses != ("keywords",) and (not isinstance(cv_text, str) or not cv_text.strip()):
+        raise ValueError("Falta 'cv_text'")
+    language = body.get("language", "es")
+    if language not in ("es", "en"):
+        raise ValueError("'language' debe ser 'es' o 'en'")
+    mode = body.get("mode", "separate")
+    if mode not in ("separate", "combined"):
+        raise ValueError("'mode' debe ser 'separate' o 'combined'")
+    similarity_mode = body.get("similarity_mode")
+    if similarity_mode not in (None, "full", "chunked"):
+        raise ValueError("'similarity_mode' debe ser 'full' o 'chunked'")
+    keyword_engine = body.get("keyword_engine")
+    if keyword_engine is not None:
+        optimizer._check_keyword_engine(keyword_engine)
+    return {
+        "analysis": analysis, "analyses": analyses, "cv_text": cv_text or "", "job_description": job_description,
+        "language": language, "mode": mode, "similarity_mode": similarity_mode, "keyword_engine": keyword_engine,
+        "stream": bool(body.get("stream")),
+    }
+
+
+class JobService:
+    """Bounded job queue drained by `workers` coroutines on a background event loop.
+
+    Job state is shared between that loop and the HTTP handler threads under one condition
+    variable, which also wakes stream readers whenever a job emits an event.
+    """
+
+    def __init__(self, workers=4, queue_size=32, retention_seconds=3600):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention_seconds = retention_seconds
+        self._changed = threading.Condition()
+        self._jobs = {}
+        self._queued = 0
+        self._running = 0
+        self._counters = {"submitted": 0, "rejected": 0, "done": 0, "error": 0, "cancelled": 0}
+        self._loop = None
+        self._queue = None
+        self._thread = None
+
+    @property
+    def loop(self):
+        """The event loop jobs run on, once started."""
+        return self._loop
+
+    def start(self):
+        ready = threading.Event()
+
+        def run_loop():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._queue = asyncio.Queue()
+            for _ in range(self.workers):
+                self._loop.create_task(self._worker())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run_loop, name="ats-jobs", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self, timeout=10):
+        async def shutdown():
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+            await optimizer.close_async_http_client()
+
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+    def submit(self, request):
+        """Queues a validated request and returns its Job; raises QueueFullError at capacity."""
+        job = Job(request)
+        with self._changed:
+            self._prune_locked()
+            if self._queued >= self.queue_size:
+                self._counters["rejected"] += 1
+                raise QueueFullError(f"Cola llena ({self.queue_size} trabajos en espera)")
+            self._queued += 1
+            self._counters["submitted"] += 1
+            self._jobs[job.id] = job
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job):
+        with self._changed:
+            return job.to_dict()
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job; returns the job, or None if unknown."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            if job.status == "queued":
+                # The worker that dequeues it will skip it
+                self._finish_locked(job, "cancelled")
+                return job
+            task = job.task
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+        return job
+
+    def wait_events(self, job, start, timeout):
+        """Returns (events after index start, finished) once there are any, or after timeout."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(job.events) > start or job.finished, timeout)
+            return job.events[start:], job.finished
+
+    def stats(self):
+        with self._changed:
+            return dict(
+                self._counters, queued=self._queued, running=self._running,
+                workers=self.workers, queue_size=self.queue_size, jobs=len(self._jobs)
+            )
+
+    # ---- Loop side ----
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            with self._changed:
+                self._queued -= 1
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                self._running += 1
+                job.task = asyncio.ensure_future(self._execute(job))
+                self._changed.notify_all()
+            try:
+                # wait() rather than await: a cancelled job must not cancel the worker
+                await asyncio.wait({job.task})
+            finally:
+                with self._changed:
+                    self._running -= 1
+                    job.task = None
+
+    async def _execute(self, job):
+        request = job.request
+        timings = {}
+        on_delta = (lambda key, delta: self._emit(job, "delta", {"key": key, "text": delta})) if request["stream"] else None
+
+        def on_result(key, value):
+            with self._changed:
+                job.results[key] = value
+            self._emit(job, "result", {"key": key, "value": value})
+
+        try:
+            await optimizer.run_report_async(
+                request["cv_text"], request["job_description"], request["analyses"], request["language"],
+                on_result=on_result, on_delta=on_delta, similarity_mode=request["similarity_mode"],
+                timings=timings, mode=request["mode"], keyword_engine=request["keyword_engine"]
+            )
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            raise
+        except Exception as e:
+            self._finish(job, "error", error=str(e))
+        else:
+            self._finish(job, "done", timings=timings)
+
+    def _emit(self, job, name, data):
+        with self._changed:
+            job.events.append((name, data))
+            self._changed.notify_all()
+
+    def _finish(self, job, status, error=None, timings=None):
+        with self._changed:
+            self._finish_locked(job, status, error, timings)
+
+    # Callers below must hold self._changed
+
+    def _finish_locked(self, job, status, error=None, timings=None):
+        job.status = status
+        job.error = error
+        job.timings = timings
+        job.finished_at = time.time()
+        self._counters[status] += 1
+        job.events.append(("status", {"status": status, "error": error}))
+        self._changed.notify_all()
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+# ---------------- HTTP ----------------
+
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/stream)?$")
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ats-optimizer"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "jobs": self.service.stats(),
+                "llm_limiter": optimizer.get_llm_limiter_stats(),
+            })
+            return
+        if self.path == "/metrics":
+            self._send_text(200, optimizer.get_metrics_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if self.path == "/metrics.json":
+            self._send_json(200, optimizer.get_metrics_snapshot())
+            return
+        job, stream = self._job_from_path()
+        if job is None:
+            return
+        if stream:
+            self._stream(job)
+        else:
+            self._send_json(200, self.service.snapshot(job))
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "Ruta no encontrada"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_REQUEST_BYTES:
+            # The body is left unread, so this connection cannot carry another request
+            self.close_connection = True
+            if length < 0:
+                self._send_json(400, {"error": "Content-Length inválido"})
+            else:
+                self._send_json(413, {"error": f"Solicitud mayor a {MAX_REQUEST_BYTES} bytes"})
+            return
+        try:
+            request = validate_request(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, UnicodeDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        try:
+            job = self.service.submit(request)
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "5"})
+            return
+        self._send_json(202, {"id": job.id, "status": "queued"}, {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        job, stream = self._job_from_path()
+        if job is None:
+            return
+        self.service.cancel(job.id)
+        self._send_json(202, {"id": job.id, "status": self.service.snapshot(job)["status"]})
+
+    def _job_from_path(self):
+        match = _JOB_PATH.match(self.path)
+        job = self.service.get(match.group(1)) if match else None
+        if job is None:
+            self._send_json(404, {"error": "Trabajo no encontrado"})
+            return None, False
+        return job, bool(match.group(2))
+
+    def _stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sent = 0
+        try:
+            while True:
+                events, finished = self.service.wait_events(job, sent, STREAM_KEEPALIVE_SECONDS)
+                for name, data in events:
+                    self.wfile.write(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+                sent += len(events)
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                if finished and not events:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, body, headers=None):
+        self._send_text(status, json.dumps(body, ensure_ascii=False), "application/json; charset=utf-8", headers)
+
+    def _send_text(self, status, text, content_type, headers=None):
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class JobHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, JobRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="jobs run at the same time")
+    parser.add_argument("--queue-size", type=int, default=32, help="jobs waiting before new ones get 503")
+    parser.add_argument("--retention-seconds", type=int, default=3600, help="how long finished jobs stay pollable")
+    parser.add_argument("--password", default=os.getenv("ATS_PASSWORD"))
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        optimizer.initialize_api_key(args.password)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    service = JobService(args.workers, args.queue_size, args.retention_seconds).start()
+    print("⏳ Cargando modelo de embeddings...", file=sys.stderr, flush=True)
+    # Jobs call the API from the service's loop, so that is the client worth connecting
+    optimizer.warm_up(loop=service.loop)
+    server = JobHTTPServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"🚀 Servicio en http://{args.host}:{server.server_address[1]}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# ---------------- SINGLE-FLIGHT ----------------
+
+
+class FlightAbandoned(Exception):
+    """The call being waited on stopped without a result (its caller went away); start over."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one execution.
+
+    The first caller for a key runs the work; callers arriving while it is in flight wait for
+    its result (or exception) instead of running their own. Keys are forgotten as soon as the
+    call finishes, so this only dedupes simultaneous work, not later repeats (that is the
+    caches' job). Waiters block on, or await, a concurrent.futures.Future, so threads and
+    separate event loops coalesce with each other. Sync (do) and async (do_async) callers are
+    kept apart: a blocking waiter on an event loop's thread could otherwise wait forever on a
+    coroutine of that same loop. on_coalesced() is called once for every caller that waited.
+    """
+
+    def __init__(self, on_coalesced=None):
+        self.on_coalesced = on_coalesced
+        self._lock = threading.Lock()
+        self._flights = {}  # (style, key) -> Future of the running call
+        self._counters = {"calls": 0, "executions": 0, "coalesced": 0, "abandoned": 0}
+
+    def _join(self, flight):
+        """Returns (future, leader); the leader must settle the future with _finish or _abandon."""
+        with self._lock:
+            self._counters["calls"] += 1
+            future = self._flights.get(flight)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                future = self._flights[flight] = Future()
+                self._counters["executions"] += 1
+                leader = True
+        if not leader and self.on_coalesced is not None:
+            self.on_coalesced()
+        return future, leader
+
+    def _finish(self, flight, future, result=None, error=None):
+        with self._lock:
+            if self._flights.get(flight) is future:
+                del self._flights[flight]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _abandon(self, flight, future):
+        with self._lock:
+            self._counters["abandoned"] += 1
+        self._finish(flight, future, error=FlightAbandoned())
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns fn(*args, **kwargs), or the result of the identical call already in flight."""
+        flight = ("sync", key)
+        while True:
+            future, leader = self._join(flight)
+            if not leader:
+                try:
+                    return future.result()
+                except FlightAbandoned:
+                    continue
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._finish(flight, future, error=e)
+                raise
+            except BaseException:
+                self._abandon(flight, future)
+                raise
+            self._finish(flight, future, result)
+            return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Async do(): fn is a coroutine function; waiters do not hold up their event loop."""
+        flight = ("async", key)
+        while True:
+            future, leader = self._join(flight)
+            if not leader:
+                try:
+                    # shield: a waiter being cancelled must not cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except FlightAbandoned:
+                    continue
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                self._finish(flight, future, error=e)
+                raise
+            except BaseException:
+                # Cancelled: the waiters make their own call
+                self._abandon(flight, future)
+                raise
+            self._finish(flight, future, result)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._flights))
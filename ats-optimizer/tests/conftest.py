@@ -0,0 +1,7 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, PACKAGE_DIR)
+sys.path.insert(0, os.path.join(PACKAGE_DIR, "benchmarks"))
@@ -0,0 +1,28 @@
+import pytest
+
+import optimizer
+from mock_server import MockOptions, start_mock_server
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    server = start_mock_server(options=MockOptions(latency=0.005, jitter=0.0))
+    monkeypatch.setattr(optimizer, "OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setattr(optimizer, "HEADERS", {"Content-Type": "application/json", "Authorization": "Bearer mock"})
+    optimizer.disable_response_cache()
+    optimizer.configure_http_pool()
+    yield server
+    optimizer.configure_http_pool()
+    server.shutdown()
+    server.server_close()
+
+
+def test_sequential_calls_reuse_one_connection(mock_api):
+    calls = 5
+    for number in range(calls):
+        assert optimizer.call_llm("system", f"prompt {number}")
+
+    stats = optimizer.get_connection_stats()
+    assert stats["connections_opened"] == 1
+    assert stats["requests_sent"] == calls
+    assert stats["connections_reused"] == calls - 1
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pytest
+
+from bench_embeddings import build_corpus
+from embeddings import MAX_SCORE_DRIFT, create_embedding_backend, normalize
+
+pytest.importorskip("onnxruntime")
+
+# Hub id or local path of the model to compare; it must be available (downloaded) to run
+MODEL_NAME = os.getenv("ATS_TEST_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+
+def _scores(backend, texts):
+    # CVs are the even texts, JDs the odd ones: the full CV x JD score matrix, in 0-100 points
+    vectors = normalize(backend.encode(texts, batch_size=16))
+    return vectors[0::2] @ vectors[1::2].T * 100
+
+
+@pytest.fixture(scope="module")
+def reference():
+    texts = build_corpus(32, seed=7)
+    try:
+        backend = create_embedding_backend("torch", MODEL_NAME)
+    except OSError as e:
+        pytest.skip(f"modelo {MODEL_NAME!r} no disponible: {e}")
+    return texts, _scores(backend, texts)
+
+
+@pytest.mark.parametrize("name", ["onnx", "onnx-int8"])
+def test_onnx_scores_stay_within_drift_bound(reference, name):
+    texts, expected = reference
+    scores = _scores(create_embedding_backend(name, MODEL_NAME), texts)
+    assert float(np.abs(scores - expected).max()) <= MAX_SCORE_DRIFT[name]
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("sklearn")
+
+from keywords import extract_keywords_local, keyword_coverage  # noqa: E402
+
+JOB_DESCRIPTIONS = [
+    "Buscamos Scrum Master con inglés avanzado y experiencia en Jira.\n"
+    "Requisitos: liderazgo de equipos, gestión de proyectos ágiles y manejo de KPIs.",
+    "We are looking for a Data Analyst with strong SQL, Power BI and Python skills.\n"
+    "Master's degree in Statistics preferred. Experience with Amazon Web Services is a plus.",
+    "Analista de Nómina y Relaciones Laborales. Manejo de HRIS, Excel avanzado y atención al cliente interno.",
+]
+
+
+@pytest.mark.parametrize("job_description", JOB_DESCRIPTIONS)
+def test_posting_fully_covers_itself(job_description):
+    coverage = keyword_coverage(job_description, job_description)
+    assert coverage["missing"] == []
+    assert coverage["score"] == 100.0
+
+
+def test_scrum_master_is_not_a_degree():
+    keywords = [keyword["keyword"] for keyword in extract_keywords_local(JOB_DESCRIPTIONS[0])]
+    assert "Agile" in keywords
+    assert "Master's Degree" not in keywords
+    assert not any("agile " in keyword or " english" in keyword for keyword in keywords)
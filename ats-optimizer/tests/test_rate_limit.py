@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_limit import AdaptiveLimiter, LatencyTracker, TokenBucket
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+# ---------------- AIMD ----------------
+
+def test_throttled_release_halves_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=8, max_limit=16, cooldown=0.0)
+    limiter.acquire()
+    limiter.release("throttled")
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release("throttled")
+    assert limiter.limit == 2
+    assert limiter.stats()["limit_decreases"] == 2
+
+
+def test_burst_of_throttles_counts_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial_limit=8, max_limit=16, cooldown=60.0)
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release("throttled")
+    assert limiter.limit == 4
+    assert limiter.stats()["throttled"] == 3
+
+
+def test_limit_never_drops_below_min_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=2, max_limit=8, cooldown=0.0)
+    limiter.acquire()
+    limiter.release("throttled")
+    assert limiter.limit == 2
+
+
+def test_ok_releases_grow_the_limit_back():
+    limiter = AdaptiveLimiter(initial_limit=8, max_limit=16, cooldown=0.0)
+    limiter.acquire()
+    limiter.release("throttled")
+    assert limiter.limit == 4
+    # About +1 per round of `limit` successful requests (each adds 1/limit)
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release("ok")
+    assert limiter.limit == 5
+    for _ in range(200):
+        limiter.acquire()
+        limiter.release("ok")
+    assert limiter.limit == 16
+
+
+def test_errors_leave_the_limit_alone():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=8)
+    limiter.acquire()
+    limiter.release("error")
+    assert limiter.limit == 4
+    assert limiter.stats()["errors"] == 1
+
+
+def test_unknown_outcome_is_rejected():
+    limiter = AdaptiveLimiter()
+    limiter.acquire()
+    with pytest.raises(ValueError):
+        limiter.release("maybe")
+
+
+# ---------------- QUEUEING ----------------
+
+def test_thread_waiters_are_served_in_arrival_order():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+    limiter.acquire()
+    order = []
+
+    def worker(number):
+        limiter.acquire()
+        order.append(number)
+        limiter.release("ok")
+
+    threads = []
+    for number in range(5):
+        thread = threading.Thread(target=worker, args=(number,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: limiter.stats()["queue_depth"] == number + 1)
+    limiter.release("ok")
+    for thread in threads:
+        thread.join(5)
+    assert order == list(range(5))
+
+
+def test_async_waiters_are_served_in_arrival_order():
+    async def main():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        await limiter.acquire_async()
+        order = []
+
+        async def worker(number):
+            await limiter.acquire_async()
+            order.append(number)
+            limiter.release("ok")
+
+        tasks = []
+        for number in range(5):
+            tasks.append(asyncio.ensure_future(worker(number)))
+            while limiter.stats()["queue_depth"] < number + 1:
+                await asyncio.sleep(0)
+        limiter.release("ok")
+        await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        return order
+
+    assert asyncio.run(main()) == list(range(5))
+
+
+def test_cancelled_async_waiter_gives_up_its_place():
+    async def main():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release("ok")
+        await asyncio.wait_for(limiter.acquire_async(), 1)
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 0
+
+
+# ---------------- PAUSES ----------------
+
+def test_retry_after_pauses_new_requests():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=4)
+    limiter.acquire()
+    limiter.release("throttled", pause_seconds=0.2)
+    assert limiter.stats()["paused_seconds"] > 0
+    waited = limiter.acquire()
+    assert waited >= 0.18
+
+
+def test_pause_delays_async_acquires():
+    async def main():
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=4)
+        limiter.pause(0.2)
+        return await limiter.acquire_async()
+
+    assert asyncio.run(main()) >= 0.18
+
+
+# ---------------- TOKEN BUCKET ----------------
+
+def test_token_bucket_allows_a_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+# ---------------- LATENCY TRACKER ----------------
+
+def test_latency_percentile_needs_min_samples():
+    tracker = LatencyTracker(window=100, min_samples=5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.record(seconds)
+    assert tracker.percentile(95) is None
+    tracker.record(0.5)
+    assert tracker.percentile(0) == 0.1
+    assert tracker.percentile(50) == 0.3
+    assert tracker.percentile(100) == 0.5
+
+
+def test_latency_window_keeps_recent_samples():
+    tracker = LatencyTracker(window=3, min_samples=1)
+    for seconds in (9.0, 1.0, 2.0, 3.0):
+        tracker.record(seconds)
+    assert len(tracker) == 3
+    assert tracker.percentile(100) == 3.0
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Interrupted(BaseException):
+    """Stands in for KeyboardInterrupt / SystemExit tearing a leader down."""
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _run_threads(target, count):
+    results, errors = [None] * count, [None] * count
+
+    def worker(number):
+        try:
+            results[number] = target()
+        except BaseException as e:
+            errors[number] = e
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+# ---------------- SYNC ----------------
+
+def test_concurrent_identical_calls_run_once():
+    coalesced = []
+    flights = SingleFlight(on_coalesced=lambda: coalesced.append(1))
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, results, errors = _run_threads(lambda: flights.do("key", work), 8)
+    _wait_for(lambda: flights.stats()["calls"] == 8)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["answer"] * 8
+    assert errors == [None] * 8
+    assert len(executions) == 1
+    assert len(coalesced) == 7
+    assert flights.stats() == {"calls": 8, "executions": 1, "coalesced": 7, "abandoned": 0, "in_flight": 0}
+
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, results, errors = _run_threads(lambda: flights.do("key", work), 4)
+    _wait_for(lambda: flights.stats()["calls"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(error, ValueError) and str(error) == "boom" for error in errors)
+    assert flights.stats()["executions"] == 1
+
+
+def test_finished_calls_are_not_reused():
+    flights = SingleFlight()
+    calls = []
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == 2
+
+
+def test_waiters_retry_when_the_leader_is_abandoned():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader_started = threading.Event()
+    executions = []
+
+    def leader_work():
+        executions.append("leader")
+        leader_started.set()
+        release.wait(5)
+        raise Interrupted()
+
+    leader, _, leader_errors = _run_threads(lambda: flights.do("key", leader_work), 1)
+    leader_started.wait(5)
+    waiters, results, errors = _run_threads(
+        lambda: flights.do("key", lambda: executions.append("retry") or "answer"), 3
+    )
+    _wait_for(lambda: flights.stats()["calls"] == 4)
+    release.set()
+    for thread in leader + waiters:
+        thread.join(5)
+
+    assert isinstance(leader_errors[0], Interrupted)
+    assert results == ["answer"] * 3
+    assert errors == [None] * 3
+    assert executions[0] == "leader" and "retry" in executions
+    assert flights.stats()["abandoned"] == 1
+
+
+# ---------------- ASYNC ----------------
+
+def test_concurrent_identical_async_calls_run_once():
+    async def main():
+        flights = SingleFlight()
+        executions = []
+
+        async def work():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do_async("key", work) for _ in range(8)))
+        return results, executions, flights.stats()
+
+    results, executions, stats = asyncio.run(main())
+    assert results == ["answer"] * 8
+    assert len(executions) == 1
+    assert stats["coalesced"] == 7
+
+
+def test_async_error_reaches_every_waiter():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flights.do_async("key", work) for _ in range(4)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) and str(error) == "boom" for error in errors)
+
+
+def test_cancelled_async_leader_hands_over_to_a_waiter():
+    async def main():
+        flights = SingleFlight()
+        executions = []
+
+        async def work():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do_async("key", work))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(flights.do_async("key", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters), executions, flights.stats()
+
+    results, executions, stats = asyncio.run(main())
+    assert results == ["answer"] * 3
+    assert len(executions) == 2
+    assert stats["abandoned"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_leader():
+    async def main():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do_async("key", work))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(flights.do_async("key", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_sync_and_async_calls_are_kept_apart():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def blocking():
+        release.wait(5)
+        return "sync"
+
+    threads, results, _ = _run_threads(lambda: flights.do("key", blocking), 1)
+    _wait_for(lambda: flights.stats()["in_flight"] == 1)
+
+    async def work():
+        return "async"
+
+    # Would hang on the blocked sync call if both shared one flight
+    assert asyncio.run(flights.do_async("key", work)) == "async"
+    release.set()
+    threads[0].join(5)
+    assert results == ["sync"]